@@ -0,0 +1,299 @@
+import json
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+from hmac import compare_digest
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.http import HttpResponse
+from django.views.decorators.http import require_GET
+
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+PHASES = ('auth', 'db', 'serialize', 'render', 'view')
+UNMATCHED_VIEW = 'unmatched'
+
+METRICS = {
+    'api_requests_total': ('counter', 'Requests answered, by URL name, method and status code.'),
+    'api_request_duration_seconds': ('histogram', 'Time to answer a request, by URL name.'),
+    'api_request_phase_seconds': (
+        'histogram', 'Time spent authenticating, in SQL queries, serializing, rendering and in the view, by URL name.',
+    ),
+    'api_db_queries_total': ('counter', 'SQL queries run, by URL name.'),
+}
+
+_timings = ContextVar('request_timings', default=None)
+
+
+class RequestTimings:
+    """
+    What the current request spent its time on, in seconds. Filled by `timed()` and by the SQL query recorder.
+    """
+    def __init__(self):
+        self.started_at = time.perf_counter()
+        self.render_started_at = None
+        self.durations = dict.fromkeys(PHASES, 0.0)
+        self.queries = 0
+
+    def add(self, phase, seconds):
+        self.durations[phase] += seconds
+
+    def finish(self):
+        """
+        Close the request: `view` is the time until rendering started (the middleware below and the view, auth,
+        queries and serialization included).
+        :returns: the total time of the request.
+        """
+        now = time.perf_counter()
+        self.durations['view'] = (self.render_started_at or now) - self.started_at
+        return now - self.started_at
+
+    def get_server_timing(self, total):
+        entries = [
+            f'{phase};dur={seconds * 1000:.1f}' + (f';desc="{self.queries} queries"' if phase == 'db' else '')
+            for phase, seconds in self.durations.items() if seconds or phase in ('db', 'view')
+        ]
+        entries.append(f'total;dur={total * 1000:.1f}')
+        return ', '.join(entries)
+
+
+@contextmanager
+def timed(phase):
+    """
+    Add the time spent in the block to `phase` of the current request, if it is measured.
+    """
+    timings = _timings.get()
+    if timings is None:
+        yield
+        return
+    if phase == 'render' and timings.render_started_at is None:
+        timings.render_started_at = time.perf_counter()
+    started_at = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings.add(phase, time.perf_counter() - started_at)
+
+
+def record_query(execute, sql, params, many, context):
+    timings = _timings.get()
+    if timings is None:
+        return execute(sql, params, many, context)
+    started_at = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        timings.add('db', time.perf_counter() - started_at)
+        timings.queries += 1
+
+
+def install_query_recorder(connection, **kwargs):
+    """
+    Time the queries of `connection`. Installed on every connection, also those of the writer thread and of the
+    async ORM's thread, which run their queries in the requests' context.
+    """
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+connection_created.connect(install_query_recorder)
+
+
+class MetricsRegistry:
+    """
+    The metrics of this process: counters and histograms keyed by metric name and labels.
+    - **Several workers**: with `METRICS_DIR`, every process writes its metrics to its own file there, at most every
+      `METRICS_FLUSH_INTERVAL` seconds, and `collect()` adds up the files of all processes. Files of stopped workers
+      are kept so the counters never go down; clear the directory when deploying.
+    - Without `METRICS_DIR`, `collect()` only returns this process' metrics.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pid = None
+        self._reset()
+
+    def _reset(self):
+        self._pid = os.getpid()
+        self._token = uuid.uuid4().hex[:12]
+        self._counters = {}
+        self._histograms = {}
+        self._flushed_at = 0.0
+
+    def _check_pid(self):
+        # A forked worker starts from zero and writes its own file.
+        if self._pid != os.getpid():
+            self._reset()
+
+    def inc(self, name, labels, value=1):
+        key = (name, labels)
+        self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name, labels, value):
+        key = (name, labels)
+        histogram = self._histograms.get(key)
+        if histogram is None:
+            histogram = self._histograms[key] = [0] * (len(BUCKETS) + 1) + [0.0]
+        index = next((i for i, bound in enumerate(BUCKETS) if value <= bound), len(BUCKETS))
+        histogram[index] += 1
+        histogram[-1] += value
+
+    def record(self, view, method, status, timings, total):
+        with self._lock:
+            self._check_pid()
+            self.inc('api_requests_total', (('view', view), ('method', method), ('status', str(status))))
+            self.inc('api_db_queries_total', (('view', view),), timings.queries)
+            self.observe('api_request_duration_seconds', (('view', view),), total)
+            for phase, seconds in timings.durations.items():
+                self.observe('api_request_phase_seconds', (('view', view), ('phase', phase)), seconds)
+        self.flush()
+
+    def snapshot(self):
+        with self._lock:
+            self._check_pid()
+            return {
+                'counters': [[name, list(labels), value] for (name, labels), value in self._counters.items()],
+                'histograms': [[name, list(labels), list(values)] for (name, labels), values in self._histograms.items()],
+            }
+
+    def get_path(self):
+        return os.path.join(settings.METRICS_DIR, f'{os.getpid()}-{self._token}.json')
+
+    def flush(self, force=False):
+        if not settings.METRICS_DIR or (not force and time.monotonic() - self._flushed_at < settings.METRICS_FLUSH_INTERVAL):
+            return
+        self._flushed_at = time.monotonic()
+        snapshot = self.snapshot()
+        os.makedirs(settings.METRICS_DIR, exist_ok=True)
+        path = self.get_path()
+        temporary_path = f'{path}.{threading.get_ident()}.tmp'
+        with open(temporary_path, 'w') as file:
+            json.dump(snapshot, file, separators=(',', ':'))
+        os.replace(temporary_path, path)
+
+    def collect(self):
+        """
+        :returns: `(counters, histograms)` of every process, keyed by `(name, labels)`.
+        """
+        if not settings.METRICS_DIR:
+            snapshots = [self.snapshot()]
+        else:
+            self.flush(force=True)
+            snapshots = []
+            for filename in sorted(os.listdir(settings.METRICS_DIR)):
+                if filename.endswith('.json'):
+                    with open(os.path.join(settings.METRICS_DIR, filename)) as file:
+                        snapshots.append(json.load(file))
+
+        counters, histograms = {}, {}
+        for snapshot in snapshots:
+            for name, labels, value in snapshot['counters']:
+                key = (name, tuple(map(tuple, labels)))
+                counters[key] = counters.get(key, 0) + value
+            for name, labels, values in snapshot['histograms']:
+                key = (name, tuple(map(tuple, labels)))
+                total = histograms.setdefault(key, [0] * len(values))
+                for i, value in enumerate(values):
+                    total[i] += value
+        return counters, histograms
+
+
+registry = MetricsRegistry()
+
+
+def format_labels(labels, **extra):
+    pairs = [*labels, *extra.items()]
+    escaped = (
+        (key, str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')) for key, value in pairs
+    )
+    return '{' + ','.join(f'{key}="{value}"' for key, value in escaped) + '}'
+
+
+def render_prometheus(counters, histograms):
+    """
+    :returns: the metrics in the Prometheus text exposition format.
+    """
+    lines = []
+    for name, (metric_type, help_text) in METRICS.items():
+        lines += [f'# HELP {name} {help_text}', f'# TYPE {name} {metric_type}']
+        if metric_type == 'counter':
+            for (key_name, labels), value in sorted(counters.items()):
+                if key_name == name:
+                    lines.append(f'{name}{format_labels(labels)} {value}')
+            continue
+        for (key_name, labels), values in sorted(histograms.items()):
+            if key_name != name:
+                continue
+            cumulative = 0
+            for bound, count in zip([*BUCKETS, '+Inf'], values):
+                cumulative += count
+                lines.append(f'{name}_bucket{format_labels(labels, le=bound)} {cumulative}')
+            lines.append(f'{name}_sum{format_labels(labels)} {values[-1]}')
+            lines.append(f'{name}_count{format_labels(labels)} {cumulative}')
+    return '\n'.join(lines) + '\n'
+
+
+@require_GET
+def metrics_view(request):
+    """
+    Serve the metrics of every worker to Prometheus. With `METRICS_TOKEN`, scrapers send it as a bearer token;
+    staff users can always read them.
+    """
+    header = request.headers.get('Authorization', '')
+    authorized = bool(settings.METRICS_TOKEN) and compare_digest(header, f'Bearer {settings.METRICS_TOKEN}')
+    if not authorized and not (request.user.is_authenticated and request.user.is_staff):
+        return HttpResponse('Forbidden', status=403, content_type='text/plain')
+    return HttpResponse(render_prometheus(*registry.collect()), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+class MetricsMiddleware:
+    """
+    Measure every request: SQL query count and time, authentication, view, serialization and rendering time.
+    - Sends them in a `Server-Timing` header with `METRICS_SERVER_TIMING`, to every client, e.g.
+      `auth;dur=0.4, db;dur=3.1;desc="4 queries", serialize;dur=1.2, render;dur=0.3, view;dur=6.0, total;dur=6.5`.
+    - Aggregates them per URL name in `registry`, served by `metrics_view`.
+    Place it first, so `total` covers the whole middleware stack.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+        for connection in connections.all(initialized_only=True):
+            install_query_recorder(connection)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        timings = RequestTimings()
+        token = _timings.set(timings)
+        try:
+            response = self.get_response(request)
+        finally:
+            _timings.reset(token)
+        return self.finish(request, response, timings)
+
+    async def __acall__(self, request):
+        timings = RequestTimings()
+        token = _timings.set(timings)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _timings.reset(token)
+        return self.finish(request, response, timings)
+
+    def finish(self, request, response, timings):
+        total = timings.finish()
+        resolver_match = getattr(request, 'resolver_match', None)
+        view = (resolver_match.url_name if resolver_match else None) or UNMATCHED_VIEW
+        registry.record(view, request.method, response.status_code, timings, total)
+        if settings.METRICS_SERVER_TIMING:
+            response['Server-Timing'] = timings.get_server_timing(total)
+        return response
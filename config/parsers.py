@@ -0,0 +1,34 @@
+import codecs
+import io
+
+from django.conf import settings
+from rest_framework.parsers import JSONParser
+
+from config.renderers import FastJSONRenderer, orjson
+
+# orjson reads integers beyond 64 bits as floats, bodies with a run of 19 digits are left to the stdlib parser.
+# Mapping every digit to 0 and looking for the run is several times faster than a regular expression.
+DIGITS_TO_ZERO = bytes.maketrans(b'123456789', b'000000000')
+LONG_NUMBER = b'0' * 19
+
+
+class FastJSONParser(JSONParser):
+    """
+    `JSONParser` decoding UTF-8 bodies with orjson.
+    Bodies orjson rejects, or may read differently (integers beyond 64 bits), are parsed by `JSONParser`, which
+    accepts what it always accepted and words the errors as before.
+    """
+    renderer_class = FastJSONRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        parser_context = parser_context or {}
+        encoding = parser_context.get('encoding', settings.DEFAULT_CHARSET)
+        if orjson is None or codecs.lookup(encoding).name != 'utf-8':
+            return super().parse(stream, media_type, parser_context)
+        body = stream.read()
+        if LONG_NUMBER in body.translate(DIGITS_TO_ZERO):
+            return super().parse(io.BytesIO(body), media_type, parser_context)
+        try:
+            return orjson.loads(body)
+        except orjson.JSONDecodeError:
+            return super().parse(io.BytesIO(body), media_type, parser_context)
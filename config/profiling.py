@@ -0,0 +1,181 @@
+import cProfile
+import json
+import os
+import time
+import uuid
+from contextvars import ContextVar
+from datetime import datetime
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.signing import BadSignature, TimestampSigner
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+PROFILE_HEADER = 'X-Profile'
+PROFILE_QUERY_PARAM = 'profile'
+PROFILE_ID_HEADER = 'X-Profile-Id'
+SIGNING_SALT = 'config.profiling'
+SIGNED_VALUE = 'profile'
+MAX_PARAM_LENGTH = 200
+
+_profiled_queries = ContextVar('profiled_queries', default=None)
+
+
+def get_profile_token():
+    """
+    :returns: a value for the `X-Profile` header, valid for `PROFILER_TOKEN_MAX_AGE` seconds.
+    """
+    return TimestampSigner(salt=SIGNING_SALT).sign(SIGNED_VALUE)
+
+
+def is_valid_token(value):
+    try:
+        return TimestampSigner(salt=SIGNING_SALT).unsign(value, max_age=settings.PROFILER_TOKEN_MAX_AGE) == SIGNED_VALUE
+    except BadSignature:
+        return False
+
+
+def capture_query(execute, sql, params, many, context):
+    queries = _profiled_queries.get()
+    if queries is None:
+        return execute(sql, params, many, context)
+    started_at = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        queries.append({
+            'sql': sql,
+            'params': [repr(param)[:MAX_PARAM_LENGTH] for param in params] if params and not many else [],
+            'many': many,
+            'duration_ms': (time.perf_counter() - started_at) * 1000,
+        })
+
+
+def install_query_capture(connection, **kwargs):
+    if capture_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(capture_query)
+
+
+connection_created.connect(install_query_capture)
+
+
+def list_profiles(directory=None):
+    """
+    :returns: the metadata of the saved profiles, newest first.
+    """
+    directory = directory or settings.PROFILER_DIR
+    if not os.path.isdir(directory):
+        return []
+    profiles = []
+    for filename in sorted(os.listdir(directory), reverse=True):
+        if filename.endswith('.json'):
+            with open(os.path.join(directory, filename)) as file:
+                profiles.append(json.load(file))
+    return profiles
+
+
+def save_profile(request, response, profiler, queries, duration):
+    """
+    Write the call graph (`<id>.prof`, a pstats file) and the request with its SQL (`<id>.json`) to `PROFILER_DIR`,
+    then drop the oldest profiles beyond `PROFILER_KEEP`.
+    :returns: the id of the profile.
+    """
+    directory = settings.PROFILER_DIR
+    os.makedirs(directory, exist_ok=True)
+    # Ids sort by time, the rotation drops the first ones.
+    profile_id = f'{datetime.now().strftime("%Y%m%d-%H%M%S-%f")}-{uuid.uuid4().hex[:4]}'
+    resolver_match = getattr(request, 'resolver_match', None)
+    profiler.dump_stats(os.path.join(directory, f'{profile_id}.prof'))
+    with open(os.path.join(directory, f'{profile_id}.json'), 'w') as file:
+        json.dump({
+            'id': profile_id,
+            'method': request.method,
+            'path': request.get_full_path(),
+            'view': resolver_match.url_name if resolver_match else None,
+            'status': response.status_code,
+            'duration_ms': duration * 1000,
+            'queries': queries,
+        }, file, indent=1)
+
+    profile_ids = sorted(filename[:-5] for filename in os.listdir(directory) if filename.endswith('.json'))
+    for old_id in profile_ids[:-settings.PROFILER_KEEP]:
+        for extension in ('.json', '.prof'):
+            try:
+                os.remove(os.path.join(directory, old_id + extension))
+            except FileNotFoundError:
+                pass
+    return profile_id
+
+
+class RequestProfilerMiddleware:
+    """
+    Run a request under cProfile on demand, and save its call graph and SQL queries (see `save_profile()`).
+    - **Signed header**: `X-Profile: <token>`, the token comes from `manage.py request_profiles --header`.
+    - **Query flag**: `?profile=1`, for staff users logged in with a session (the browsable API, the admin).
+    The response gets the id of the profile in `X-Profile-Id`; read it with `manage.py request_profiles <id>`.
+    Other requests only pay a header and a query parameter lookup. Under ASGI, cProfile only sees the event loop
+    thread: the queries are captured, but the sync code run in threads is not in the call graph.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+        for connection in connections.all(initialized_only=True):
+            install_query_capture(connection)
+
+    @staticmethod
+    def is_requested(request):
+        return PROFILE_HEADER in request.headers or PROFILE_QUERY_PARAM in request.GET
+
+    @staticmethod
+    def is_allowed(request, user):
+        if PROFILE_HEADER in request.headers:
+            return is_valid_token(request.headers[PROFILE_HEADER])
+        return user.is_staff
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        if not self.is_requested(request) or not self.is_allowed(request, request.user):
+            return self.get_response(request)
+        profiler, queries, token = self.start()
+        try:
+            response = self.get_response(request)
+        finally:
+            duration = self.stop(profiler, token)
+        response[PROFILE_ID_HEADER] = save_profile(request, response, profiler, queries, duration)
+        return response
+
+    async def __acall__(self, request):
+        if not self.is_requested(request):
+            return await self.get_response(request)
+        user = None if PROFILE_HEADER in request.headers else await request.auser()
+        if not self.is_allowed(request, user):
+            return await self.get_response(request)
+        profiler, queries, token = self.start()
+        try:
+            response = await self.get_response(request)
+        finally:
+            duration = self.stop(profiler, token)
+        response[PROFILE_ID_HEADER] = await sync_to_async(save_profile)(request, response, profiler, queries, duration)
+        return response
+
+    @staticmethod
+    def start():
+        queries = []
+        token = _profiled_queries.set(queries)
+        profiler = cProfile.Profile()
+        profiler.started_at = time.perf_counter()
+        profiler.enable()
+        return profiler, queries, token
+
+    @staticmethod
+    def stop(profiler, token):
+        profiler.disable()
+        _profiled_queries.reset(token)
+        return time.perf_counter() - profiler.started_at
@@ -0,0 +1,155 @@
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+
+from django.conf import settings
+from django.contrib.auth import SESSION_KEY
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+
+PIN_CACHE_KEY_PREFIX = 'replicas:pinned'
+
+_request_state = ContextVar('replica_request_state', default=None)
+
+
+class RequestState:
+    """
+    What the router knows about the current request: who makes it, whether it wrote and whether it read from a replica.
+    """
+    def __init__(self, user_id=None):
+        self.user_id = user_id
+        self.wrote = False
+        self.used_replica = False
+        self._pinned = None
+
+    def is_pinned(self):
+        if self._pinned is None:
+            self._pinned = self.user_id is not None and cache.get(get_pin_cache_key(self.user_id)) is not None
+        return self._pinned
+
+
+def get_pin_cache_key(user_id):
+    return f'{PIN_CACHE_KEY_PREFIX}:{user_id}'
+
+
+def pin(user_id):
+    """
+    Send the reads of `user_id` to the primary for `DB_REPLICA_PIN_SECONDS`, so they see their own writes
+    even if the replicas lag behind. Needs a cache shared by the worker processes.
+    """
+    cache.set(get_pin_cache_key(user_id), True, settings.DB_REPLICA_PIN_SECONDS)
+
+
+def get_request_state():
+    return _request_state.get()
+
+
+def set_request_user(user_id):
+    """
+    Record who makes the current request, once the API authentication identified them.
+    """
+    state = _request_state.get()
+    if state is not None and state.user_id != user_id:
+        state.user_id = user_id
+        state._pinned = None
+
+
+@contextmanager
+def request_state(user_id=None):
+    state = RequestState(user_id)
+    token = _request_state.set(state)
+    try:
+        yield state
+    finally:
+        _request_state.reset(token)
+
+
+class ReplicaRouter:
+    """
+    Send the reads of the `projects` and `users` apps to a random replica of `DATABASE_REPLICAS`, and every write
+    to the primary (`default`).
+    - **Read your writes**: once a request writes, its later reads go to the primary, and its user is pinned to
+      the primary for `DB_REPLICA_PIN_SECONDS` (see `ReplicaPinningMiddleware`).
+    - Outside of a request (management commands, the shell) everything reads from the primary.
+    - Without replicas the router changes nothing.
+    Replicas are copies of the primary, they are never migrated.
+    """
+    route_app_labels = {'projects', 'users'}
+
+    def db_for_read(self, model, **hints):
+        replicas = settings.DATABASE_REPLICAS
+        if not replicas or model._meta.app_label not in self.route_app_labels:
+            return None
+        state = _request_state.get()
+        if state is None or state.wrote or state.is_pinned():
+            return DEFAULT_DB_ALIAS
+        state.used_replica = True
+        return random.choice(replicas)
+
+    def db_for_write(self, model, **hints):
+        state = _request_state.get()
+        if state is not None:
+            state.wrote = True
+        # Explicitly: without an answer Django would write to the database an instance was read from.
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {DEFAULT_DB_ALIAS, *settings.DATABASE_REPLICAS}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db in settings.DATABASE_REPLICAS:
+            return False
+        return None
+
+
+class ReplicaPinningMiddleware:
+    """
+    Track the database use of every request for `ReplicaRouter`, and pin the user to the primary after a write.
+    The user is taken from the session here, API requests set it once the JWT is authenticated.
+    Works in sync and async stacks, so it does not force async views into a thread.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        with request_state(self.get_session_user_id(request)) as state:
+            response = self.get_response(request)
+            if state.wrote:
+                self.pin_user(request, state)
+        return response
+
+    async def __acall__(self, request):
+        user_id = await sync_to_async(self.get_session_user_id)(request) if self.has_session(request) else None
+        with request_state(user_id) as state:
+            response = await self.get_response(request)
+            if state.wrote:
+                await sync_to_async(self.pin_user)(request, state)
+        return response
+
+    @staticmethod
+    def has_session(request):
+        session = getattr(request, 'session', None)
+        return session is not None and session.session_key is not None
+
+    def get_session_user_id(self, request):
+        return request.session.get(SESSION_KEY) if self.has_session(request) else None
+
+    @staticmethod
+    def pin_user(request, state):
+        # Requests authenticated some other way (e.g. forced in tests) only set `request.user`.
+        user_id = state.user_id if state.user_id is not None else getattr(getattr(request, 'user', None), 'pk', None)
+        if user_id is not None:
+            pin(user_id)
@@ -56,12 +56,15 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'config.metrics.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'config.routers.ReplicaPinningMiddleware',
+    'config.profiling.RequestProfilerMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -98,10 +101,49 @@ WSGI_APPLICATION = 'config.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.0/ref/settings/#databases
 
+# `config.sqlite3` is the SQLite backend with a connection profile, see `config/sqlite3/base.py`.
+# Connections are kept for CONN_MAX_AGE seconds (0 closes them after every request) and checked before reuse.
+
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
+        'ENGINE': 'config.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'CONN_MAX_AGE': int(os.getenv('DB_CONN_MAX_AGE', 60)),
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            'transaction_mode': os.getenv('SQLITE_TRANSACTION_MODE', 'IMMEDIATE'),
+            'pragmas': {
+                'journal_mode': os.getenv('SQLITE_JOURNAL_MODE', 'WAL'),
+                'synchronous': os.getenv('SQLITE_SYNCHRONOUS', 'NORMAL'),
+                'busy_timeout': int(os.getenv('SQLITE_BUSY_TIMEOUT', 5000)),
+                'mmap_size': int(os.getenv('SQLITE_MMAP_SIZE', 256 * 1024 * 1024)),
+                # Negative values are KiB: 64 MiB of page cache per connection
+                'cache_size': int(os.getenv('SQLITE_CACHE_SIZE', -64000)),
+                'temp_store': os.getenv('SQLITE_TEMP_STORE', 'MEMORY'),
+            },
+        },
+    }
+}
+# Read replicas: comma separated SQLite files (relative to BASE_DIR) that receive the reads of the API, kept up to
+# date by real replication or `manage.py sync_replicas`. A user who writes reads from the primary for
+# DB_REPLICA_PIN_SECONDS afterwards.
+
+for index, name in enumerate(filter(None, os.getenv('DB_REPLICAS', '').split(',')), start=1):
+    DATABASES[f'replica{index}'] = {**DATABASES['default'], 'NAME': BASE_DIR / name.strip(), 'TEST': {'MIRROR': 'default'}}
+
+DATABASE_REPLICAS = [alias for alias in DATABASES if alias != 'default']
+DATABASE_ROUTERS = ['config.routers.ReplicaRouter']
+DB_REPLICA_PIN_SECONDS = int(os.getenv('DB_REPLICA_PIN_SECONDS', 10))
+
+# Cache
+# https://docs.djangoproject.com/en/5.0/topics/cache/
+# Local memory by default. Use a shared backend (e.g. `django.core.cache.backends.filebased.FileBasedCache`
+# with a directory as `CACHE_LOCATION`) when running several worker processes.
+
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.getenv('CACHE_LOCATION', ''),
     }
 }
 
@@ -133,9 +175,19 @@ REST_FRAMEWORK = {
         'rest_framework.permissions.IsAuthenticated',
     ),
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'users.authentication.CachedJWTAuthentication',
     ),
     'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',
+    # Same JSON as DRF's renderer and parser, encoded and decoded with orjson.
+    'DEFAULT_RENDERER_CLASSES': (
+        'config.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ),
+    'DEFAULT_PARSER_CLASSES': (
+        'config.parsers.FastJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ),
 }
 
 SPECTACULAR_SETTINGS = {
@@ -147,6 +199,47 @@ SPECTACULAR_SETTINGS = {
 
 API_VERSION = 'v1'
 
+# How long a user's `{project: role}` access map stays cached. Project and membership changes invalidate it right away.
+PROJECT_ACCESS_CACHE_TIMEOUT = int(os.getenv('PROJECT_ACCESS_CACHE_TIMEOUT', 300))
+
+# Seconds a cached project or task list response is kept. Writes invalidate it right away, 0 disables the cache.
+PROJECT_RESPONSE_CACHE_TIMEOUT = int(os.getenv('PROJECT_RESPONSE_CACHE_TIMEOUT', 300))
+
+# Seconds a user snapshot used by the JWT authentication stays cached. Saving or deleting a user only clears the
+# snapshot in the cache of the worker that saved it: with a per-process cache (the default LocMemCache), other workers
+# would accept the tokens of a deactivated user until their copy expires, so snapshots are then kept at most
+# USER_SNAPSHOT_LOCAL_CACHE_TIMEOUT seconds. Use a shared CACHE_BACKEND (Redis, Memcached) for the longer timeout.
+USER_SNAPSHOT_CACHE_TIMEOUT = int(os.getenv('USER_SNAPSHOT_CACHE_TIMEOUT', 300))
+USER_SNAPSHOT_LOCAL_CACHE_TIMEOUT = int(os.getenv('USER_SNAPSHOT_LOCAL_CACHE_TIMEOUT', 5))
+
+# Serve the project, task and comment endpoints with async views (see projects/async_views.py), for ASGI servers
+PROJECT_ASYNC_VIEWS = os.getenv('PROJECT_ASYNC_VIEWS', 'false').lower() in ('1', 'true', 'yes')
+
+# Serve the pages of the project, task and comment lists with `values()` and compiled serializers (projects/projections.py)
+PROJECT_COMPILED_LISTS = os.getenv('PROJECT_COMPILED_LISTS', 'true').lower() in ('1', 'true', 'yes')
+
+# Per-request metrics (config/metrics.py): send `Server-Timing` headers, and where the workers write their metrics
+# for the Prometheus endpoint `/metrics` (empty: only the answering worker's metrics). Scrapers send METRICS_TOKEN.
+# `Server-Timing` shows every client the query count and phase timings: keep it off in production.
+METRICS_SERVER_TIMING = os.getenv('METRICS_SERVER_TIMING', 'false').lower() in ('1', 'true', 'yes')
+METRICS_DIR = os.getenv('METRICS_DIR', '')
+METRICS_FLUSH_INTERVAL = float(os.getenv('METRICS_FLUSH_INTERVAL', 5))
+METRICS_TOKEN = os.getenv('METRICS_TOKEN', '')
+
+# On-demand request profiler (config/profiling.py): where the profiles are written, how many are kept, and how long
+# the `X-Profile` tokens printed by `manage.py request_profiles --header` stay valid, in seconds
+PROFILER_DIR = os.getenv('PROFILER_DIR', str(BASE_DIR / 'profiles'))
+PROFILER_KEEP = int(os.getenv('PROFILER_KEEP', 50))
+PROFILER_TOKEN_MAX_AGE = int(os.getenv('PROFILER_TOKEN_MAX_AGE', 3600))
+
+# Database writes from the views: 'direct' runs them in the request thread, 'queue' sends them to one writer thread
+# per process that commits them in groups (see config/writer.py)
+DB_WRITE_MODE = os.getenv('DB_WRITE_MODE', 'direct')
+DB_WRITE_TIMEOUT = float(os.getenv('DB_WRITE_TIMEOUT', 10))
+DB_WRITE_MAX_BATCH = int(os.getenv('DB_WRITE_MAX_BATCH', 50))
+DB_WRITE_GROUP_WINDOW = float(os.getenv('DB_WRITE_GROUP_WINDOW', 0))
+DB_WRITE_QUEUE_SIZE = int(os.getenv('DB_WRITE_QUEUE_SIZE', 1000))
+
 
 # Internationalization
 # https://docs.djangoproject.com/en/5.0/topics/i18n/
@@ -184,3 +277,13 @@ EMAIL_PORT = int(os.getenv('EMAIL_PORT', 587))
 EMAIL_HOST_USER = os.getenv('EMAIL_HOST_USER', None)
 EMAIL_HOST_PASSWORD = os.getenv('EMAIL_HOST_PASSWORD', None)
 EMAIL_USE_TLS = os.getenv('EMAIL_USE_TLS', True)
+
+# Email outbox: verification emails are queued in the database and delivered by `manage.py send_outbox_emails`
+EMAIL_OUTBOX_BATCH_SIZE = int(os.getenv('EMAIL_OUTBOX_BATCH_SIZE', 100))
+EMAIL_OUTBOX_MAX_ATTEMPTS = int(os.getenv('EMAIL_OUTBOX_MAX_ATTEMPTS', 5))
+EMAIL_OUTBOX_RETRY_DELAY = int(os.getenv('EMAIL_OUTBOX_RETRY_DELAY', 60))
+EMAIL_OUTBOX_MAX_RETRY_DELAY = int(os.getenv('EMAIL_OUTBOX_MAX_RETRY_DELAY', 3600))
+
+# Last login timestamps: 'sync' writes on every login, 'buffered' batches the writes every LAST_LOGIN_FLUSH_INTERVAL seconds
+LAST_LOGIN_WRITE_MODE = os.getenv('LAST_LOGIN_WRITE_MODE', 'buffered')
+LAST_LOGIN_FLUSH_INTERVAL = float(os.getenv('LAST_LOGIN_FLUSH_INTERVAL', 5))
@@ -0,0 +1,61 @@
+import re
+
+from django.db.backends.sqlite3 import base
+
+# Applied in this order on every new connection, `journal_mode` first since it decides how the file is opened for
+# writing. Values are settings, not user input, but they still end up in SQL: only plain words and numbers are allowed.
+PRAGMA_ORDER = ['journal_mode', 'synchronous', 'busy_timeout', 'mmap_size', 'cache_size', 'temp_store']
+PRAGMA_VALUE_RE = re.compile(r'^-?\w+$')
+TRANSACTION_MODES = ('DEFERRED', 'IMMEDIATE', 'EXCLUSIVE')
+
+
+def apply_pragmas(conn, pragmas):
+    '''
+    Run `PRAGMA name = value` for every item of `pragmas` on a DB-API connection.
+    :returns: `{name: value}` as reported by SQLite afterwards.
+    '''
+    names = [name for name in PRAGMA_ORDER if name in pragmas] + [name for name in pragmas if name not in PRAGMA_ORDER]
+    applied = {}
+    for name in names:
+        value = str(pragmas[name])
+        if not name.isidentifier() or not PRAGMA_VALUE_RE.match(value):
+            raise ValueError(f'Invalid SQLite pragma {name} = {value!r}.')
+        conn.execute(f'PRAGMA {name} = {value}')
+        # Some pragmas report nothing, e.g. `mmap_size` on an in-memory database.
+        row = conn.execute(f'PRAGMA {name}').fetchone()
+        applied[name] = row[0] if row else None
+    return applied
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    '''
+    SQLite with a production connection profile, configured in `OPTIONS`:
+    - `pragmas`: `{name: value}` applied on connect, e.g. WAL journal, `synchronous = NORMAL` and a `busy_timeout`
+      so concurrent writers wait for the lock instead of failing with "database is locked".
+    - `transaction_mode`: `DEFERRED`, `IMMEDIATE` or `EXCLUSIVE`. `atomic()` blocks start with `BEGIN IMMEDIATE` by
+      default, a deferred transaction that reads then writes cannot wait for the lock and fails right away in WAL mode.
+    Persistent connections (`CONN_MAX_AGE`) are checked with a `SELECT 1` when `CONN_HEALTH_CHECKS` is enabled.
+    '''
+    def get_connection_params(self):
+        kwargs = super().get_connection_params()
+        kwargs.pop('pragmas', None)
+        kwargs.pop('transaction_mode', None)
+        return kwargs
+
+    def get_new_connection(self, conn_params):
+        conn = super().get_new_connection(conn_params)
+        apply_pragmas(conn, self.settings_dict['OPTIONS'].get('pragmas', {}))
+        return conn
+
+    def is_usable(self):
+        try:
+            self.connection.execute('SELECT 1')
+        except self.Database.Error:
+            return False
+        return True
+
+    def _start_transaction_under_autocommit(self):
+        mode = (self.settings_dict['OPTIONS'].get('transaction_mode') or 'DEFERRED').upper()
+        if mode not in TRANSACTION_MODES:
+            raise ValueError(f'Invalid SQLite transaction mode {mode!r}, expected one of {", ".join(TRANSACTION_MODES)}.')
+        self.cursor().execute(f'BEGIN {mode}')
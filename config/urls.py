@@ -17,6 +17,7 @@ Including another URLconf
 from django.contrib import admin
 from django.urls import path, include
 from config import settings
+from config.metrics import metrics_view
 from drf_spectacular.views import (
     SpectacularAPIView,
     SpectacularRedocView,
@@ -33,4 +34,7 @@ urlpatterns = [
     path(f'api/{settings.API_VERSION}/schema/', SpectacularAPIView.as_view(), name='schema'),
     path(f'api/{settings.API_VERSION}/schema/swagger-ui/', SpectacularSwaggerView.as_view(url_name='schema'), name='swagger-ui'),
     path(f'api/{settings.API_VERSION}/schema/redoc', SpectacularRedocView.as_view(url_name='schema'), name='redoc'),
+
+    # Prometheus scrape endpoint, see config/metrics.py
+    path('metrics', metrics_view, name='metrics'),
 ]
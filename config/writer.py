@@ -0,0 +1,226 @@
+import contextvars
+import logging
+import os
+import queue
+import threading
+import time
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils.translation import gettext_lazy as _
+
+from config.exceptions import ServiceUnavailable
+
+WRITE_MODE_DIRECT = 'direct'
+WRITE_MODE_QUEUE = 'queue'
+
+JOB_PENDING = 'pending'
+JOB_RUNNING = 'running'
+JOB_CANCELLED = 'cancelled'
+JOB_DONE = 'done'
+
+logger = logging.getLogger(__name__)
+
+
+class WriteTimeout(ServiceUnavailable):
+    default_detail = _('The database is busy, please try again later.')
+    default_code = 'write_timeout'
+
+
+class WriteJob:
+    """
+    One unit of write work queued by a request thread and run by the writer thread.
+    """
+    def __init__(self, func, args, kwargs):
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+        # Run in the caller's context, e.g. so the database router knows which request wrote.
+        self.context = contextvars.copy_context()
+        self.state = JOB_PENDING
+        self.result = None
+        self.error = None
+        self.done = threading.Event()
+        self._lock = threading.Lock()
+
+    def start(self):
+        """
+        Move the job to running, unless its caller already gave up on it.
+        :returns: whether the job should run.
+        """
+        with self._lock:
+            if self.state != JOB_PENDING:
+                return False
+            self.state = JOB_RUNNING
+            return True
+
+    def cancel(self):
+        """
+        Give up on a job that has not started yet. A running job cannot be cancelled, its write may commit.
+        :returns: whether the job was cancelled.
+        """
+        with self._lock:
+            if self.state != JOB_PENDING:
+                return False
+            self.state = JOB_CANCELLED
+            return True
+
+    def finish(self, result=None, error=None):
+        self.result, self.error = result, error
+        self.state = JOB_DONE
+        self.done.set()
+
+
+class WriteQueue:
+    """
+    Serializes the writes of every thread of a process through one writer thread, so request threads never compete
+    for SQLite's single write lock.
+    - **Group commit**: the writer takes every job queued while it was busy (up to `DB_WRITE_MAX_BATCH`, waiting up
+      to `DB_WRITE_GROUP_WINDOW` seconds for more) and runs them in one transaction, one savepoint per job. A failing
+      job is rolled back to its savepoint and gets its exception back, the others commit together.
+    - **Fairness**: jobs run in arrival order, and a batch is bounded, so no request waits behind an unbounded group.
+    - **Timeouts**: a caller waits `DB_WRITE_TIMEOUT` seconds for its job to start; a job that has not started by then
+      is dropped and the caller gets a 503. A full queue (`DB_WRITE_QUEUE_SIZE`) is rejected right away the same way.
+    Callers get the job's return value or exception once its transaction has committed.
+    """
+    def __init__(self):
+        self._queue = None
+        self._thread = None
+        self._pid = None
+        self._lock = threading.Lock()
+        self.stats = {'jobs': 0, 'batches': 0, 'timeouts': 0, 'rejected': 0}
+
+    def in_writer_thread(self):
+        return self._thread is not None and threading.current_thread() is self._thread
+
+    def submit(self, func, *args, **kwargs):
+        """
+        Run `func(*args, **kwargs)` in the writer thread and wait for it.
+        :returns: the return value of `func`, its exception is raised in the caller.
+        """
+        job = WriteJob(func, args, kwargs)
+        try:
+            self._ensure_started().put_nowait(job)
+        except queue.Full:
+            self.stats['rejected'] += 1
+            raise WriteTimeout()
+        if not job.done.wait(settings.DB_WRITE_TIMEOUT) and job.cancel():
+            self.stats['timeouts'] += 1
+            raise WriteTimeout()
+        # A job that started before the timeout is always waited for, it may have committed.
+        job.done.wait()
+        if job.error is not None:
+            raise job.error
+        return job.result
+
+    def stop(self, timeout=None):
+        """
+        Let the writer finish the queued jobs and exit.
+        """
+        with self._lock:
+            thread, self._thread = self._thread, None
+            if thread is not None:
+                self._queue.put(None)
+        if thread is not None:
+            thread.join(timeout)
+
+    def _ensure_started(self):
+        # Started lazily, and again in a forked worker process, where the parent's thread does not exist.
+        with self._lock:
+            if self._thread is None or self._pid != os.getpid():
+                self._queue = queue.Queue(settings.DB_WRITE_QUEUE_SIZE)
+                self._pid = os.getpid()
+                self._start_thread()
+            elif not self._thread.is_alive():
+                # The writer died (its exception is logged by `_run()`): a new one takes over the queued jobs.
+                logger.warning('Restarting the database writer thread.')
+                self._start_thread()
+            return self._queue
+
+    def _start_thread(self):
+        self._thread = threading.Thread(target=self._run, args=(self._queue,), name='db-writer', daemon=True)
+        self._thread.start()
+
+    def _run(self, jobs):
+        try:
+            while True:
+                batch, stopping = self._next_batch(jobs)
+                if batch:
+                    self._execute(batch)
+                if stopping:
+                    return
+                # Honour CONN_MAX_AGE and the health checks between batches, like between requests.
+                connection.close_if_unusable_or_obsolete()
+        except Exception:
+            logger.exception('The database writer thread stopped.')
+        finally:
+            connection.close()
+
+    def _next_batch(self, jobs):
+        job = jobs.get()
+        if job is None:
+            return [], True
+        batch = [job]
+        deadline = time.monotonic() + settings.DB_WRITE_GROUP_WINDOW
+        while len(batch) < settings.DB_WRITE_MAX_BATCH:
+            try:
+                job = jobs.get(timeout=max(deadline - time.monotonic(), 0)) if settings.DB_WRITE_GROUP_WINDOW else jobs.get_nowait()
+            except queue.Empty:
+                break
+            if job is None:
+                return batch, True
+            batch.append(job)
+        return batch, False
+
+    def _execute(self, batch):
+        batch = [job for job in batch if job.start()]
+        if not batch:
+            return
+        results = {}
+        try:
+            with transaction.atomic():
+                for job in batch:
+                    try:
+                        with transaction.atomic():
+                            results[job] = (job.context.run(job.func, *job.args, **job.kwargs), None)
+                    except Exception as exc:
+                        results[job] = (None, exc)
+        except Exception as exc:
+            # The commit itself failed: nothing of the batch was written.
+            results = {job: (None, exc) for job in batch}
+        self.stats['jobs'] += len(batch)
+        self.stats['batches'] += 1
+        for job in batch:
+            job.finish(*results[job])
+
+
+write_queue = WriteQueue()
+
+
+def run_write(func, *args, **kwargs):
+    """
+    Run the write `func(*args, **kwargs)` through the writer thread when `DB_WRITE_MODE` is `queue`, directly otherwise.
+    Writes already inside a transaction (or inside the writer itself) run directly: the writer could not join the
+    caller's transaction.
+    """
+    if (
+        settings.DB_WRITE_MODE != WRITE_MODE_QUEUE
+        or write_queue.in_writer_thread()
+        or connection.in_atomic_block
+    ):
+        return func(*args, **kwargs)
+    return write_queue.submit(func, *args, **kwargs)
+
+
+class SerializedWriteMixin:
+    """
+    Route `perform_create`, `perform_update` and `perform_destroy` of a generic view through `run_write`.
+    """
+    def perform_create(self, serializer):
+        return run_write(super().perform_create, serializer)
+
+    def perform_update(self, serializer):
+        return run_write(super().perform_update, serializer)
+
+    def perform_destroy(self, instance):
+        return run_write(super().perform_destroy, instance)
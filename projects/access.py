@@ -0,0 +1,131 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, transaction
+from rest_framework.exceptions import NotFound
+
+from .models import Project, ProjectMember
+
+ROLE_MEMBER = 'Member'
+ROLE_ADMIN = 'Admin'
+ROLE_OWNER = 'Owner'
+
+# A role grants everything the roles ranked below it can do.
+ROLE_RANKS = {ROLE_MEMBER: 1, ROLE_ADMIN: 2, ROLE_OWNER: 3}
+
+
+class ProjectAccessResolver:
+    '''
+    Answers "can user U act on project P with role R" from a precomputed `{project_id: role}` map.
+    - The owner of a project has the `Owner` role, members have the role of their `ProjectMember` row.
+    - The map is built with two indexed queries, memoized on the request and cached across requests in
+      Django's cache for `PROJECT_ACCESS_CACHE_TIMEOUT` seconds.
+    - `Project` and `ProjectMember` signals drop the cached map of every affected user (see `signals.py`).
+    '''
+    cache_key_prefix = 'projects:access'
+
+    def __init__(self, user):
+        self.user = user
+        self._roles = None
+
+    @classmethod
+    def for_request(cls, request):
+        '''
+        Return the resolver of the request's user, creating it on first use.
+        '''
+        resolver = getattr(request, '_project_access', None)
+        if resolver is None:
+            resolver = cls(request.user)
+            request._project_access = resolver
+        return resolver
+
+    @classmethod
+    def get_cache_key(cls, user_id):
+        return f'{cls.cache_key_prefix}:{user_id}'
+
+    @classmethod
+    def invalidate(cls, *user_ids):
+        '''
+        Drop the cached maps of `user_ids`, now and again once the current transaction commits,
+        so a request that read the old rows before the commit cannot keep a stale map cached.
+        '''
+        keys = [cls.get_cache_key(user_id) for user_id in set(user_ids) if user_id is not None]
+        if keys:
+            cache.delete_many(keys)
+            transaction.on_commit(lambda: cache.delete_many(keys))
+
+    @property
+    def roles(self):
+        if self._roles is None:
+            if not self.user.is_authenticated:
+                self._roles = {}
+            else:
+                key = self.get_cache_key(self.user.pk)
+                self._roles = cache.get(key)
+                if self._roles is None:
+                    self._roles = self.load_roles()
+                    cache.set(key, self._roles, settings.PROJECT_ACCESS_CACHE_TIMEOUT)
+        return self._roles
+
+    async def aload(self):
+        '''
+        Load the map for async views without blocking the event loop, the other methods then use it as is.
+        '''
+        if self._roles is None and self.user.is_authenticated:
+            key = self.get_cache_key(self.user.pk)
+            roles = cache.get(key)
+            if roles is None:
+                members, projects = self.get_role_querysets()
+                roles = {project_id: role async for project_id, role in members}
+                roles.update({project_id: ROLE_OWNER async for project_id in projects})
+                cache.set(key, roles, settings.PROJECT_ACCESS_CACHE_TIMEOUT)
+            self._roles = roles
+        return self
+
+    def load_roles(self):
+        members, projects = self.get_role_querysets()
+        roles = dict(members)
+        roles.update((project_id, ROLE_OWNER) for project_id in projects)
+        return roles
+
+    def get_role_querysets(self):
+        # From the primary database: the map is cached, a lagging replica would keep a revoked access alive.
+        members, projects = ProjectMember.objects.using(DEFAULT_DB_ALIAS), Project.objects.using(DEFAULT_DB_ALIAS)
+        return (
+            members.filter(user=self.user).values_list('project_id', 'role'),
+            projects.filter(owner=self.user).values_list('id', flat=True),
+        )
+
+    def get_role(self, project_id):
+        return self.roles.get(int(project_id))
+
+    def has_role(self, project_id, role=ROLE_MEMBER):
+        current = self.get_role(project_id)
+        return current is not None and ROLE_RANKS[current] >= ROLE_RANKS[role]
+
+    def get_project_ids(self, role=ROLE_MEMBER):
+        return [project_id for project_id, current in self.roles.items() if ROLE_RANKS[current] >= ROLE_RANKS[role]]
+
+    def check(self, project_id, role=ROLE_MEMBER, message="Project not found or you do not have permission."):
+        '''
+        Raise `NotFound` unless the user has at least `role` on the project. Missing and forbidden projects
+        are reported the same way so the API does not reveal which projects exist.
+        '''
+        if not self.has_role(project_id, role):
+            raise NotFound(message)
+
+
+class ProjectAccessMixin:
+    '''
+    View mixin giving access to the request's `ProjectAccessResolver`.
+    `required_roles` maps an HTTP method to the minimum role it needs; unlisted methods need `Member`.
+    '''
+    required_roles = {}
+
+    def get_access(self):
+        return ProjectAccessResolver.for_request(self.request)
+
+    def get_required_role(self):
+        return self.required_roles.get(self.request.method, ROLE_MEMBER)
+
+    def check_project_access(self, project_id, message="Project not found or you do not have permission."):
+        self.get_access().check(project_id, self.get_required_role(), message)
@@ -5,4 +5,5 @@ from .models import *
 admin.site.register(Project)
 admin.site.register(ProjectMember)
 admin.site.register(Task)
-admin.site.register(Comment)
\ No newline at end of file
+admin.site.register(Comment)
+admin.site.register(ProjectTaskStat)
@@ -0,0 +1,185 @@
+import inspect
+
+from asgiref.sync import sync_to_async
+from django.db.models import F
+from django.shortcuts import aget_object_or_404
+from rest_framework.exceptions import APIException, NotFound
+
+from .access import ROLE_MEMBER
+from .models import Comment, Project, Task
+from .views import (
+    CommentsListCreateView,
+    ProjectsListCreateView,
+    RetrieveCommentView,
+    RetrieveProjectView,
+    RetrieveTaskView,
+    TaskListCreateView,
+)
+
+
+class AsyncAPIViewMixin:
+    """
+    Serve a DRF generic view natively under ASGI, without a thread per request.
+    - **Dispatch**: `dispatch()` is a coroutine. Content negotiation, permissions and rendering are unchanged; the
+      authentication classes are awaited through their `aauthenticate()` when they have one.
+    - **Reads**: the GET handlers load the access map, the ETag version, the page and the object with the async ORM
+      (`aload()`, `aaggregate()`, `async for`, `aget()`).
+    - **Writes**: POST, PUT, PATCH and DELETE run the unchanged sync handlers in a thread.
+    Responses, status codes and headers are the same as the sync views'. Everything the serializers read must be
+    loaded by the async queries (relations come from `select_related()`), lazy loading is not allowed in async code.
+    """
+    async def dispatch(self, request, *args, **kwargs):
+        self.args = args
+        self.kwargs = kwargs
+        request = self.initialize_request(request, *args, **kwargs)
+        self.request = request
+        self.headers = self.default_response_headers
+
+        try:
+            await self.ainitial(request, *args, **kwargs)
+            method = request.method.lower()
+            handler = getattr(self, method, None) if method in self.http_method_names else None
+            response = (handler or self.http_method_not_allowed)(request, *args, **kwargs)
+            if inspect.isawaitable(response):
+                response = await response
+        except Exception as exc:
+            response = self.handle_exception(exc)
+
+        self.response = self.finalize_response(request, response, *args, **kwargs)
+        return self.response
+
+    async def ainitial(self, request, *args, **kwargs):
+        self.format_kwarg = self.get_format_suffix(**kwargs)
+        request.accepted_renderer, request.accepted_media_type = self.perform_content_negotiation(request)
+        request.version, request.versioning_scheme = self.determine_version(request, *args, **kwargs)
+        await self.aperform_authentication(request)
+        self.check_permissions(request)
+        self.check_throttles(request)
+
+    async def aperform_authentication(self, request):
+        """
+        Same as DRF's `Request._authenticate()`, awaiting `aauthenticate()` or running `authenticate()` in a thread.
+        """
+        for authenticator in request.authenticators:
+            aauthenticate = getattr(authenticator, 'aauthenticate', None)
+            try:
+                if aauthenticate is not None:
+                    user_auth_tuple = await aauthenticate(request)
+                else:
+                    user_auth_tuple = await sync_to_async(authenticator.authenticate)(request)
+            except APIException:
+                request._not_authenticated()
+                raise
+            if user_auth_tuple is not None:
+                request._authenticator = authenticator
+                request.user, request.auth = user_auth_tuple
+                return
+        request._not_authenticated()
+
+    @staticmethod
+    async def run_sync(handler, request, *args, **kwargs):
+        return await sync_to_async(handler)(request, *args, **kwargs)
+
+
+class AsyncProjectsListCreateView(AsyncAPIViewMixin, ProjectsListCreateView):
+    async def get(self, request, *args, **kwargs):
+        await self.get_access().aload()
+        return await self.alist(request, *args, **kwargs)
+
+    async def post(self, request, *args, **kwargs):
+        return await self.run_sync(super().post, request, *args, **kwargs)
+
+
+class AsyncRetrieveProjectView(AsyncAPIViewMixin, RetrieveProjectView):
+    async def get(self, request, *args, **kwargs):
+        await self.get_access().aload()
+        return await self.aretrieve(request, *args, **kwargs)
+
+    async def aget_object(self):
+        project_id = self.kwargs['pk']
+        self.check_project_access(project_id)
+        queryset = self.get_serializer_class().expand_queryset(Project.objects.all(), self.request)
+        return await aget_object_or_404(queryset, id=project_id)
+
+    async def put(self, request, *args, **kwargs):
+        return await self.run_sync(super().put, request, *args, **kwargs)
+
+    async def patch(self, request, *args, **kwargs):
+        return await self.run_sync(super().patch, request, *args, **kwargs)
+
+    async def delete(self, request, *args, **kwargs):
+        return await self.run_sync(super().delete, request, *args, **kwargs)
+
+
+class AsyncTaskListCreateView(AsyncAPIViewMixin, TaskListCreateView):
+    async def get(self, request, *args, **kwargs):
+        await self.get_access().aload()
+        return await self.alist(request, *args, **kwargs)
+
+    async def post(self, request, *args, **kwargs):
+        return await self.run_sync(super().post, request, *args, **kwargs)
+
+
+class AsyncRetrieveTaskView(AsyncAPIViewMixin, RetrieveTaskView):
+    async def get(self, request, *args, **kwargs):
+        await self.get_access().aload()
+        return await self.aretrieve(request, *args, **kwargs)
+
+    async def aget_object(self):
+        queryset = self.get_serializer_class().expand_queryset(Task.objects.all(), self.request)
+        try:
+            task = await queryset.aget(id=self.kwargs['pk'])
+        except Task.DoesNotExist:
+            raise NotFound("Task not found or you do not have permission.")
+        self.check_project_access(task.project_id, "Task not found or you do not have permission.")
+        return task
+
+    async def put(self, request, *args, **kwargs):
+        return await self.run_sync(super().put, request, *args, **kwargs)
+
+    async def patch(self, request, *args, **kwargs):
+        return await self.run_sync(super().patch, request, *args, **kwargs)
+
+    async def delete(self, request, *args, **kwargs):
+        return await self.run_sync(super().delete, request, *args, **kwargs)
+
+
+class AsyncCommentsListCreateView(AsyncAPIViewMixin, CommentsListCreateView):
+    async def get(self, request, *args, **kwargs):
+        await self.get_access().aload()
+        self.task_project_id = await Task.objects.filter(id=self.kwargs['task_id']).values_list('project_id', flat=True).afirst()
+        return await self.alist(request, *args, **kwargs)
+
+    def get_task_project_id(self):
+        # Loaded by `get()`, writes look it up in their thread.
+        if hasattr(self, 'task_project_id'):
+            return self.task_project_id
+        return super().get_task_project_id()
+
+    async def post(self, request, *args, **kwargs):
+        return await self.run_sync(super().post, request, *args, **kwargs)
+
+
+class AsyncRetrieveCommentView(AsyncAPIViewMixin, RetrieveCommentView):
+    async def get(self, request, *args, **kwargs):
+        await self.get_access().aload()
+        return await self.aretrieve(request, *args, **kwargs)
+
+    async def aget_object(self):
+        queryset = self.get_serializer_class().expand_queryset(Comment.objects.all(), self.request)
+        try:
+            comment = await queryset.annotate(task_project_id=F('task__project_id')).aget(id=self.kwargs.get('id'))
+        except Comment.DoesNotExist:
+            raise NotFound("Comment not found or you do not have permission.")
+        role = ROLE_MEMBER if comment.user_id == self.request.user.pk else self.get_required_role()
+        self.get_access().check(comment.task_project_id, role, "Comment not found or you do not have permission.")
+        return comment
+
+    async def put(self, request, *args, **kwargs):
+        return await self.run_sync(super().put, request, *args, **kwargs)
+
+    async def patch(self, request, *args, **kwargs):
+        return await self.run_sync(super().patch, request, *args, **kwargs)
+
+    async def delete(self, request, *args, **kwargs):
+        return await self.run_sync(super().delete, request, *args, **kwargs)
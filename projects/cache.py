@@ -0,0 +1,158 @@
+import time
+from hashlib import md5
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from rest_framework.response import Response
+
+from config.routers import get_request_state
+
+GENERATION_KEY_PREFIX = 'projects:generation'
+USERS_GENERATION_KEY = 'projects:generation:users'
+RESPONSE_KEY_PREFIX = 'projects:response'
+HITS_KEY = 'projects:response_cache:hits'
+MISSES_KEY = 'projects:response_cache:misses'
+
+
+def get_generation_key(project_id):
+    return f'{GENERATION_KEY_PREFIX}:{project_id}'
+
+
+def get_generations(keys):
+    '''
+    Return the current value of the generation counters `keys`. A missing (never bumped or evicted) counter starts
+    from the current time in nanoseconds, so it can never come back to a value an older cached response was stored under.
+    '''
+    generations = cache.get_many(keys)
+    for key in keys:
+        if key not in generations:
+            cache.add(key, time.time_ns(), None)
+            generations[key] = cache.get(key)
+    return [generations[key] for key in keys]
+
+
+def _bump(keys):
+    for key in keys:
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, time.time_ns(), None)
+
+
+def bump_generations(keys):
+    '''
+    Bump the generation counters `keys`, now and again once the current transaction commits, so a request
+    that read the old rows before the commit cannot keep its response cached under the new generation.
+    '''
+    keys = list(set(keys))
+    if keys:
+        _bump(keys)
+        transaction.on_commit(lambda: _bump(keys))
+
+
+def bump_project_generations(*project_ids):
+    '''
+    Mark every cached response built from the data of `project_ids` as stale.
+    '''
+    bump_generations(get_generation_key(int(project_id)) for project_id in project_ids if project_id is not None)
+
+
+def bump_users_generation():
+    '''
+    Mark every cached response embedding a user (through `expand`) as stale.
+    '''
+    bump_generations([USERS_GENERATION_KEY])
+
+
+def get_stats():
+    '''
+    Return the hit and miss counters of the response cache, shared by every process using the same cache.
+    '''
+    stats = cache.get_many([HITS_KEY, MISSES_KEY])
+    return {'hits': stats.get(HITS_KEY, 0), 'misses': stats.get(MISSES_KEY, 0)}
+
+
+def reset_stats():
+    cache.delete_many([HITS_KEY, MISSES_KEY])
+
+
+def _count(key):
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, 1, None)
+
+
+class CachedListMixin:
+    '''
+    View mixin caching the GET responses of a list endpoint per user in Django's cache.
+    - The key covers the user, the absolute URL with its query string, the negotiated media type and the generation
+      counters of every project the response is built from, plus the users generation when `expand` is used.
+      Writes bump those counters (see `signals.py`), so a write makes every older entry unreachable.
+    - **Projects**: the project in the URL keyword argument `cache_project_kwarg`, or every project the user can
+      access when it is `None`. Needs `ProjectAccessMixin`.
+    - Access is checked before the lookup, so a cached page is never served to a user who lost access.
+    - Responses carry an `X-Cache: HIT|MISS` header, and the counters are available from `get_stats()`.
+    Entries expire after `PROJECT_RESPONSE_CACHE_TIMEOUT` seconds; `0` disables the cache.
+    '''
+    cache_project_kwarg = None
+
+    def get_cache_project_ids(self):
+        if self.cache_project_kwarg is None:
+            return self.get_access().get_project_ids()
+        project_id = self.kwargs[self.cache_project_kwarg]
+        self.check_project_access(project_id)
+        return [project_id]
+
+    def get_response_cache_key(self):
+        generation_keys = [get_generation_key(project_id) for project_id in sorted(self.get_cache_project_ids())]
+        if 'expand' in self.request.query_params:
+            generation_keys.append(USERS_GENERATION_KEY)
+        parts = [
+            self.request.user.pk, self.request.build_absolute_uri(), self.request.accepted_media_type,
+            get_generations(generation_keys),
+        ]
+        return f'{RESPONSE_KEY_PREFIX}:{md5(repr(parts).encode()).hexdigest()}'
+
+    def list(self, request, *args, **kwargs):
+        if not settings.PROJECT_RESPONSE_CACHE_TIMEOUT:
+            return super().list(request, *args, **kwargs)
+        key = self.get_response_cache_key()
+        response = self.get_cached_response(key)
+        if response is None:
+            response = self.store_response(key, super().list(request, *args, **kwargs))
+        return response
+
+    async def alist(self, request, *args, **kwargs):
+        # Django's cache backends have no native async implementation: their `a*` methods only run the sync ones
+        # in a thread, so the lookups stay synchronous here.
+        if not settings.PROJECT_RESPONSE_CACHE_TIMEOUT:
+            return await super().alist(request, *args, **kwargs)
+        key = self.get_response_cache_key()
+        response = self.get_cached_response(key)
+        if response is None:
+            response = self.store_response(key, await super().alist(request, *args, **kwargs))
+        return response
+
+    def get_cached_response(self, key):
+        cached = cache.get(key)
+        if cached is None:
+            _count(MISSES_KEY)
+            return None
+        _count(HITS_KEY)
+        etag, data = cached
+        response = self.get_conditional_response(etag, lambda: Response(data))
+        response['X-Cache'] = 'HIT'
+        return response
+
+    def store_response(self, key, response):
+        if response.status_code == 200:
+            timeout = settings.PROJECT_RESPONSE_CACHE_TIMEOUT
+            state = get_request_state()
+            if state is not None and state.used_replica:
+                # Read from a replica that may lag behind the generation bump, keep it no longer than a pin lasts.
+                timeout = min(timeout, settings.DB_REPLICA_PIN_SECONDS)
+            cache.set(key, (response['ETag'], response.data), timeout)
+        response['X-Cache'] = 'MISS'
+        return response
\ No newline at end of file
@@ -0,0 +1,151 @@
+from hashlib import md5
+
+from django.db.models import Count, Max
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+from rest_framework.response import Response
+
+from config.metrics import timed
+
+from .cache import USERS_GENERATION_KEY, get_generations
+
+
+class ConditionalGetMixin:
+    '''
+    View mixin answering GET requests with a weak `ETag` and `304 Not Modified` when the client's copy is current.
+    - **Detail views**: the version is the `updated_at` of the fetched object, so a no-change poll costs only
+      the object lookup and also gets a `Last-Modified` header.
+    - **List views**: the version is `Max('updated_at')` and `Count('pk')` of the filtered queryset, from one
+      aggregate query run before pagination and serialization. The count catches deleted rows, which is also why
+      lists do not send `Last-Modified`.
+    - **Expanded relations** (`?expand=`): the version also covers the `updated_at` of every embedded row (their
+      `Max()` for lists), and the users generation counter when users are embedded, since users have no `updated_at`.
+    The ETag also covers the user, the full path with its query string and the negotiated media type.
+    Async views use the `a`-prefixed versions of the same methods (see `async_views.py`).
+    '''
+    version_field = 'updated_at'
+
+    def get_etag(self, *version):
+        parts = [self.request.user.pk, self.request.get_full_path(), self.request.accepted_media_type, *version]
+        return f'W/"{md5(repr(parts).encode()).hexdigest()}"'
+
+    def get_conditional_response(self, etag, get_response, last_modified=None):
+        '''
+        Return `304 Not Modified` if the request's preconditions match `etag`/`last_modified`,
+        otherwise build the response with `get_response()` and add the validators to it.
+        '''
+        response = self.check_preconditions(etag, last_modified)
+        if response is None:
+            response = get_response()
+        return self.add_validators(response, etag, last_modified)
+
+    async def aget_conditional_response(self, etag, get_response, last_modified=None):
+        '''
+        `get_conditional_response()` for async views, where `get_response()` returns an awaitable.
+        '''
+        response = self.check_preconditions(etag, last_modified)
+        if response is None:
+            response = await get_response()
+        return self.add_validators(response, etag, last_modified)
+
+    def check_preconditions(self, etag, last_modified=None):
+        timestamp = int(last_modified.timestamp()) if last_modified else None
+        return get_conditional_response(self.request, etag=etag, last_modified=timestamp)
+
+    def add_validators(self, response, etag, last_modified=None):
+        if response.status_code not in (200, 304):
+            return response
+        response['ETag'] = etag
+        if last_modified:
+            response['Last-Modified'] = http_date(int(last_modified.timestamp()))
+        return response
+
+    def get_expanded_versions(self):
+        '''
+        :returns: `(lookups, has_users)`, the lookups of the relations embedded through `?expand=` that have a
+            `version_field`, and whether users, which have none, are embedded too.
+        '''
+        serializer_class = self.get_serializer_class()
+        if not hasattr(serializer_class, 'get_expanded_relations'):
+            return [], False
+        lookups, has_users = [], False
+        for lookup, model in serializer_class.get_expanded_relations(serializer_class.get_request_trees(self.request)[1]):
+            if any(field.name == self.version_field for field in model._meta.concrete_fields):
+                lookups.append(lookup)
+            else:
+                has_users = True
+        return lookups, has_users
+
+    def get_object_version(self, instance):
+        lookups, has_users = self.get_expanded_versions()
+        version = [getattr(instance, self.version_field)]
+        for lookup in lookups:
+            # The relations are joined by `expand_queryset()`, reading them runs no query.
+            related = instance
+            for name in lookup.split('__'):
+                related = getattr(related, name) if related is not None else None
+            version.append(getattr(related, self.version_field, None))
+        return version + (get_generations([USERS_GENERATION_KEY]) if has_users else [])
+
+    def get_list_aggregates(self):
+        '''
+        :returns: `(aggregates, has_users)`, the aggregates of the version of a list and whether users are embedded.
+        '''
+        lookups, has_users = self.get_expanded_versions()
+        aggregates = {'last_modified': Max(self.version_field), 'count': Count('pk')}
+        for lookup in lookups:
+            aggregates[f'{lookup}__last_modified'] = Max(f'{lookup}__{self.version_field}')
+        return aggregates, has_users
+
+    def get_list_etag(self, version, has_users):
+        return self.get_etag(*version.values(), *(get_generations([USERS_GENERATION_KEY]) if has_users else []))
+
+    def retrieve(self, request, *args, **kwargs):
+        instance = self.get_object()
+        last_modified = getattr(instance, self.version_field)
+        return self.get_conditional_response(
+            self.get_etag(*self.get_object_version(instance)), lambda: Response(self.serialize(instance)), last_modified,
+        )
+
+    async def aretrieve(self, request, *args, **kwargs):
+        instance = await self.aget_object()
+        last_modified = getattr(instance, self.version_field)
+
+        async def get_response():
+            return Response(self.serialize(instance))
+        return await self.aget_conditional_response(
+            self.get_etag(*self.get_object_version(instance)), get_response, last_modified,
+        )
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        aggregates, has_users = self.get_list_aggregates()
+        version = queryset.aggregate(**aggregates)
+        return self.get_conditional_response(
+            self.get_list_etag(version, has_users), lambda: self.get_list_response(queryset),
+        )
+
+    async def alist(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        aggregates, has_users = self.get_list_aggregates()
+        version = await queryset.aaggregate(**aggregates)
+        return await self.aget_conditional_response(
+            self.get_list_etag(version, has_users), lambda: self.aget_list_response(queryset),
+        )
+
+    def get_list_response(self, queryset):
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(self.serialize(page, many=True))
+        return Response(self.serialize(queryset, many=True))
+
+    async def aget_list_response(self, queryset):
+        if self.paginator is not None:
+            page = await self.paginator.apaginate_queryset(queryset, self.request, view=self)
+            if page is not None:
+                return self.get_paginated_response(self.serialize(page, many=True))
+        return Response(self.serialize([row async for row in queryset], many=True))
+
+    def serialize(self, instance, many=False):
+        with timed('serialize'):
+            return self.get_serializer(instance, many=many).data
@@ -0,0 +1,108 @@
+import csv
+import io
+import json
+import zlib
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+from .models import Comment, Task
+
+FORMAT_NDJSON = 'ndjson'
+FORMAT_CSV = 'csv'
+FORMATS = {FORMAT_NDJSON: 'application/x-ndjson', FORMAT_CSV: 'text/csv'}
+
+TASK_FIELDS = ['id', 'title', 'description', 'status', 'priority', 'assigned_to_id', 'due_date', 'created_at', 'updated_at']
+COMMENT_FIELDS = ['id', 'task_id', 'user_id', 'content', 'created_at', 'updated_at']
+
+# One CSV header covering both record types, the columns of the other type are left empty.
+CSV_COLUMNS = [
+    'type', 'id', 'task', 'title', 'description', 'status', 'priority', 'assigned_to', 'due_date',
+    'user', 'content', 'created_at', 'updated_at',
+]
+
+# Rows fetched per database round trip, and bytes buffered before a chunk is sent.
+CHUNK_SIZE = 2000
+BUFFER_SIZE = 64 * 1024
+
+
+def to_record(kind, row):
+    '''
+    Turn a `values()` row into an export record: the `type` first, and foreign keys without their `_id` suffix.
+    '''
+    record = {'type': kind}
+    for field, value in row.items():
+        record[field[:-3] if field.endswith('_id') and field != 'id' else field] = value
+    return record
+
+
+def iter_records(project_id, chunk_size=CHUNK_SIZE):
+    '''
+    Yield every task of the project in id order, each one followed by its comments in creation order.
+    Tasks and comments are read with two server-side cursors (`iterator()`), `chunk_size` rows at a time,
+    and merged on the task id, so memory does not depend on the size of the project.
+    '''
+    tasks = Task.objects.filter(project_id=project_id).order_by('id').values(*TASK_FIELDS)
+    comments = (
+        Comment.objects.filter(task__project_id=project_id)
+        .order_by('task_id', 'created_at', 'id').values(*COMMENT_FIELDS)
+    )
+    comments = comments.iterator(chunk_size=chunk_size)
+    comment = next(comments, None)
+    for task in tasks.iterator(chunk_size=chunk_size):
+        # Skip the comments of tasks created after the task query started.
+        while comment is not None and comment['task_id'] < task['id']:
+            comment = next(comments, None)
+        yield to_record('task', task)
+        while comment is not None and comment['task_id'] == task['id']:
+            yield to_record('comment', comment)
+            comment = next(comments, None)
+
+
+def iter_ndjson(records):
+    encoder = DjangoJSONEncoder(separators=(',', ':'), ensure_ascii=False)
+    for record in records:
+        yield encoder.encode(record) + '\n'
+
+
+def iter_csv(records):
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=CSV_COLUMNS, extrasaction='ignore')
+    writer.writeheader()
+    for record in records:
+        writer.writerow({key: value.isoformat() if hasattr(value, 'isoformat') else value for key, value in record.items()})
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+
+
+def iter_chunks(lines, compress=False):
+    '''
+    Encode `lines` and join them into chunks of about `BUFFER_SIZE` bytes, gzip compressed if `compress`.
+    '''
+    compressor = zlib.compressobj(wbits=zlib.MAX_WBITS | 16) if compress else None
+    buffer, size = [], 0
+    for line in lines:
+        data = line.encode()
+        buffer.append(data)
+        size += len(data)
+        if size >= BUFFER_SIZE:
+            chunk = b''.join(buffer)
+            buffer, size = [], 0
+            chunk = compressor.compress(chunk) if compressor else chunk
+            if chunk:
+                yield chunk
+    chunk = b''.join(buffer)
+    if compressor:
+        chunk = compressor.compress(chunk) + compressor.flush()
+    if chunk:
+        yield chunk
+
+
+def export_project(project_id, fmt=FORMAT_NDJSON, compress=False, chunk_size=CHUNK_SIZE):
+    '''
+    Stream a project's tasks and comments as NDJSON or CSV bytes.
+    :returns: an iterator of byte chunks.
+    '''
+    records = iter_records(project_id, chunk_size)
+    lines = iter_csv(records) if fmt == FORMAT_CSV else iter_ndjson(records)
+    return iter_chunks(lines, compress)
@@ -0,0 +1,91 @@
+from django.utils.translation import gettext_lazy as _
+from rest_framework import serializers
+from rest_framework.exceptions import ValidationError
+from rest_framework.filters import BaseFilterBackend
+from .models import Task
+
+
+class TaskFilterBackend(BaseFilterBackend):
+    '''
+    Server-side filtering for task lists. Every filter is backed by one of the composite indexes on `Task`.
+    - **status**, **priority**: one value or a comma separated list, e.g. `?status=To Do,In Progress`.
+    - **assigned_to**: a user id, or `none` for unassigned tasks.
+    - **due_after**, **due_before**: ISO 8601 datetimes, both inclusive.
+    '''
+    choice_filters = {
+        'status': [value for value, label in Task._meta.get_field('status').choices],
+        'priority': [value for value, label in Task._meta.get_field('priority').choices],
+    }
+    range_filters = {
+        'due_after': 'due_date__gte',
+        'due_before': 'due_date__lte',
+    }
+
+    @classmethod
+    def get_filter_names(cls):
+        return [*cls.choice_filters, 'assigned_to', *cls.range_filters]
+
+    def filter_queryset(self, request, queryset, view):
+        return self.filter_tasks(queryset, request.query_params)
+
+    def filter_tasks(self, queryset, params):
+        '''
+        Apply the filters found in `params`, any mapping of filter name to string value.
+        Invalid values raise a `ValidationError` listing every offending filter.
+        '''
+        lookups, errors = self.get_lookups(params)
+        if errors:
+            raise ValidationError(errors)
+        return queryset.filter(**lookups)
+
+    def get_lookups(self, params):
+        lookups, errors = {}, {}
+
+        for name, choices in self.choice_filters.items():
+            value = params.get(name)
+            if not value:
+                continue
+            values = [item.strip() for item in str(value).split(',') if item.strip()]
+            invalid = [item for item in values if item not in choices]
+            if invalid:
+                errors[name] = [_('"%(value)s" is not a valid choice.') % {'value': item} for item in invalid]
+            elif len(values) == 1:
+                lookups[name] = values[0]
+            else:
+                lookups[name + '__in'] = values
+
+        assigned_to = params.get('assigned_to')
+        if assigned_to:
+            if str(assigned_to).lower() == 'none':
+                lookups['assigned_to__isnull'] = True
+            elif str(assigned_to).isdigit():
+                lookups['assigned_to'] = int(assigned_to)
+            else:
+                errors['assigned_to'] = [_('A valid user id or "none" is required.')]
+
+        for name, lookup in self.range_filters.items():
+            value = params.get(name)
+            if not value:
+                continue
+            try:
+                lookups[lookup] = serializers.DateTimeField().to_internal_value(value)
+            except serializers.ValidationError as exc:
+                errors[name] = exc.detail
+
+        return lookups, errors
+
+    def get_schema_operation_parameters(self, view):
+        parameters = [
+            {'name': name, 'required': False, 'in': 'query', 'schema': {'type': 'string', 'enum': choices},
+             'description': str(_('One value or a comma separated list.'))}
+            for name, choices in self.choice_filters.items()
+        ]
+        parameters.append({
+            'name': 'assigned_to', 'required': False, 'in': 'query', 'schema': {'type': 'string'},
+            'description': str(_('A user id, or "none" for unassigned tasks.')),
+        })
+        parameters.extend(
+            {'name': name, 'required': False, 'in': 'query', 'schema': {'type': 'string', 'format': 'date-time'}}
+            for name in self.range_filters
+        )
+        return parameters
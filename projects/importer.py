@@ -0,0 +1,330 @@
+import csv
+import gzip
+import json
+import time
+from contextlib import contextmanager
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import identify_hasher, make_password
+from django.db import connection, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from . import search, stats
+from .access import ProjectAccessResolver
+from .cache import bump_project_generations, bump_users_generation
+from .models import Comment, Project, ProjectMember, Task
+
+User = get_user_model()
+
+TYPE_USER = 'user'
+TYPE_PROJECT = 'project'
+TYPE_MEMBER = 'member'
+TYPE_TASK = 'task'
+TYPE_COMMENT = 'comment'
+# Parents come first, a batch of every type is written after the batches of the types it refers to.
+TYPES = [TYPE_USER, TYPE_PROJECT, TYPE_MEMBER, TYPE_TASK, TYPE_COMMENT]
+
+
+class ImportDataError(ValueError):
+    pass
+
+
+def open_records(path, record_type=None):
+    '''
+    Read a `.jsonl`/`.ndjson` or `.csv` file (optionally `.gz` compressed) as a stream of dicts.
+    Every record needs a `type`, taken from `record_type` when the file has no `type` field.
+    :returns: iterator of `(path, line number, record)`.
+    '''
+    opener = gzip.open if path.endswith('.gz') else open
+    name = path[:-3] if path.endswith('.gz') else path
+    with opener(path, 'rt', encoding='utf-8', newline='') as source:
+        if name.endswith('.csv'):
+            # Empty CSV cells are missing values.
+            rows = ({key: value for key, value in row.items() if value != ''} for row in csv.DictReader(source))
+            for line, row in enumerate(rows, start=2):
+                yield path, line, _with_type(row, record_type, path, line)
+        else:
+            for line, text in enumerate(source, start=1):
+                if text.strip():
+                    yield path, line, _with_type(json.loads(text), record_type, path, line)
+
+
+def _with_type(record, record_type, path, line):
+    record.setdefault('type', record_type)
+    if record['type'] not in TYPES:
+        raise ImportDataError(f'{path}:{line}: unknown record type {record["type"]!r}, expected one of {", ".join(TYPES)}.')
+    return record
+
+
+@contextmanager
+def preserve_timestamps(*models):
+    '''
+    Keep the imported `created_at`/`updated_at`/`date_joined` values instead of letting `auto_now` and
+    `auto_now_add` overwrite them with the import time.
+    '''
+    fields = [
+        (field, field.auto_now, field.auto_now_add)
+        for model in models for field in model._meta.concrete_fields if getattr(field, 'auto_now_add', False) or getattr(field, 'auto_now', False)
+    ]
+    for field, _, _ in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, auto_now, auto_now_add in fields:
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+@contextmanager
+def deferred_indexes(*models):
+    '''
+    Drop the `Meta.indexes` of `models` and create them again at the end, so rows are not inserted into
+    every secondary index one by one.
+    '''
+    indexes = [(model, index) for model in models for index in model._meta.indexes]
+    # The editor only renders the statements: entering it is not allowed inside a transaction on SQLite.
+    schema_editor = connection.schema_editor()
+    with connection.cursor() as cursor:
+        for model, index in indexes:
+            cursor.execute(str(index.remove_sql(model, schema_editor)))
+    try:
+        yield
+    finally:
+        with connection.cursor() as cursor:
+            for model, index in indexes:
+                cursor.execute(str(index.create_sql(model, schema_editor)))
+
+
+def insert_rows(model, field_names, rows):
+    '''
+    Insert `rows`, tuples of database-ready values in the order of `field_names`, with a single `executemany()`.
+    '''
+    quote = connection.ops.quote_name
+    columns = ', '.join(quote(model._meta.get_field(name).column) for name in field_names)
+    placeholders = ', '.join(['%s'] * len(field_names))
+    with connection.cursor() as cursor:
+        cursor.executemany(f'INSERT INTO {quote(model._meta.db_table)} ({columns}) VALUES ({placeholders})', rows)
+
+
+class Importer:
+    '''
+    Loads users, projects, members, tasks and comments exported from another tracker.
+    - Records keep the ids of the source system; foreign keys are resolved through in-memory `{source id: new id}`
+      maps, so parents must appear before their children (e.g. users and projects before tasks).
+    - Records are buffered per type and written every `batch_size` records, parents first, in transactions of about
+      `transaction_size` records: with `bulk_create()` for the types whose ids are needed, with raw rows for comments.
+    - Users whose email already exists are mapped to the existing row instead of being created.
+    - Signals are not sent, the derived data (task stats, search index, caches) is rebuilt by `finish()`.
+    '''
+    def __init__(self, batch_size=1000, transaction_size=100000, progress=None):
+        self.batch_size = batch_size
+        self.transaction_size = transaction_size
+        self.progress = progress
+        self.ids = {record_type: {} for record_type in TYPES}
+        self.buffers = {record_type: [] for record_type in TYPES}
+        self.counts = {record_type: 0 for record_type in TYPES}
+        # Projects whose rows were written by this run, and the project of every task comments were written for.
+        self.project_ids = set()
+        self.task_projects = {}
+        self.pending = 0
+        self.uncommitted = 0
+        self.atomic = None
+        self.started_at = time.monotonic()
+
+    @property
+    def total(self):
+        return sum(self.counts.values())
+
+    def load_ids(self, path):
+        '''
+        Load the id maps saved by a previous run, so its rows can be referenced (e.g. comments imported separately).
+        '''
+        with open(path, encoding='utf-8') as source:
+            for record_type, ids in json.load(source).items():
+                self.ids[record_type].update(ids)
+
+    def save_ids(self, path):
+        with open(path, 'w', encoding='utf-8') as output:
+            json.dump(self.ids, output)
+
+    def add(self, record, source='', line=0):
+        self.buffers[record['type']].append((source, line, record))
+        self.pending += 1
+        if self.pending >= self.batch_size:
+            self.flush()
+
+    def run(self, records):
+        for source, line, record in records:
+            self.add(record, source, line)
+        self.flush()
+
+    def flush(self):
+        if self.atomic is None:
+            self.atomic = transaction.atomic()
+            self.atomic.__enter__()
+        for record_type in TYPES:
+            buffer, self.buffers[record_type] = self.buffers[record_type], []
+            if buffer:
+                getattr(self, f'write_{record_type}s')(buffer)
+                self.counts[record_type] += len(buffer)
+        self.uncommitted += self.pending
+        self.pending = 0
+        if self.uncommitted >= self.transaction_size:
+            self.commit()
+        if self.progress:
+            self.progress(self)
+
+    def commit(self):
+        if self.atomic is not None:
+            self.atomic.__exit__(None, None, None)
+            self.atomic = None
+        self.uncommitted = 0
+
+    def rollback(self, exc):
+        if self.atomic is not None:
+            self.atomic.__exit__(type(exc), exc, exc.__traceback__)
+            self.atomic = None
+
+    def get_rate(self):
+        elapsed = time.monotonic() - self.started_at
+        return self.total / elapsed if elapsed else 0.0
+
+    def resolve(self, record_type, source_id, source, line, required=True):
+        if source_id in (None, ''):
+            if required:
+                raise ImportDataError(f'{source}:{line}: missing {record_type} reference.')
+            return None
+        try:
+            return self.ids[record_type][str(source_id)]
+        except KeyError:
+            raise ImportDataError(f'{source}:{line}: unknown {record_type} {source_id!r}, import it before the rows that refer to it.')
+
+    @staticmethod
+    def get_datetime(value, default=None):
+        if value in (None, ''):
+            return default
+        parsed = parse_datetime(value) if isinstance(value, str) else value
+        if parsed is None:
+            raise ImportDataError(f'invalid date time {value!r}.')
+        return timezone.make_aware(parsed) if timezone.is_naive(parsed) else parsed
+
+    def create(self, model, buffer, objects):
+        objects = model.objects.bulk_create(objects, batch_size=self.batch_size)
+        for (_, _, record), obj in zip(buffer, objects):
+            if 'id' in record:
+                self.ids[record['type']][str(record['id'])] = obj.pk
+        return objects
+
+    def write_users(self, buffer):
+        existing = dict(User.objects.filter(email__in=[record['email'] for _, _, record in buffer]).values_list('email', 'pk'))
+        now = timezone.now()
+        new, new_emails, duplicates = [], set(), []
+        for source, line, record in buffer:
+            if record['email'] in existing:
+                self.ids[TYPE_USER][str(record.get('id'))] = existing[record['email']]
+                continue
+            if record['email'] in new_emails:
+                duplicates.append(record)
+                continue
+            new_emails.add(record['email'])
+            password = record.get('password') or ''
+            try:
+                identify_hasher(password)
+            except ValueError:
+                # Only keep hashes Django can verify, other users have to reset their password.
+                password = make_password(None)
+            new.append(((source, line, record), User(
+                email=record['email'], username=record.get('username') or None,
+                first_name=record.get('first_name', ''), last_name=record.get('last_name', ''),
+                is_active=str(record.get('is_active', True)).lower() not in ('0', 'false', 'no'),
+                date_joined=self.get_datetime(record.get('date_joined'), now), password=password,
+            )))
+        users = self.create(User, [item for item, _ in new], [user for _, user in new])
+        created = {user.email: user.pk for user in users}
+        for record in duplicates:
+            self.ids[TYPE_USER][str(record.get('id'))] = created[record['email']]
+
+    def write_projects(self, buffer):
+        now = timezone.now()
+        projects = []
+        for source, line, record in buffer:
+            created_at = self.get_datetime(record.get('created_at'), now)
+            projects.append(Project(
+                name=record['name'], description=record.get('description', ''),
+                owner_id=self.resolve(TYPE_USER, record.get('owner'), source, line),
+                created_at=created_at, updated_at=self.get_datetime(record.get('updated_at'), created_at),
+            ))
+        self.project_ids.update(project.pk for project in self.create(Project, buffer, projects))
+
+    def write_members(self, buffer):
+        members = self.create(ProjectMember, buffer, [
+            ProjectMember(
+                project_id=self.resolve(TYPE_PROJECT, record.get('project'), source, line),
+                user_id=self.resolve(TYPE_USER, record.get('user'), source, line),
+                role=record.get('role', 'Member'),
+            )
+            for source, line, record in buffer
+        ])
+        self.project_ids.update(member.project_id for member in members)
+
+    def write_tasks(self, buffer):
+        now = timezone.now()
+        tasks = []
+        for source, line, record in buffer:
+            created_at = self.get_datetime(record.get('created_at'), now)
+            tasks.append(Task(
+                title=record['title'], description=record.get('description', ''),
+                status=record.get('status', 'To Do'), priority=record.get('priority', 'Medium'),
+                assigned_to_id=self.resolve(TYPE_USER, record.get('assigned_to'), source, line, required=False),
+                project_id=self.resolve(TYPE_PROJECT, record.get('project'), source, line),
+                due_date=self.get_datetime(record.get('due_date'), created_at),
+                created_at=created_at, updated_at=self.get_datetime(record.get('updated_at'), created_at),
+            ))
+        for task in self.create(Task, buffer, tasks):
+            self.task_projects[task.pk] = task.project_id
+            self.project_ids.add(task.project_id)
+
+    def write_comments(self, buffer):
+        # Comments are the bulk of an export and nothing refers to them: skip the model instances and the ORM
+        # compiler, and send plain rows with one `executemany()`.
+        adapt = connection.ops.adapt_datetimefield_value
+        now = adapt(timezone.now())
+        rows = []
+        for source, line, record in buffer:
+            created_at = adapt(self.get_datetime(record.get('created_at'))) if record.get('created_at') else now
+            updated_at = adapt(self.get_datetime(record.get('updated_at'))) if record.get('updated_at') else created_at
+            rows.append((
+                record['content'],
+                self.resolve(TYPE_TASK, record.get('task'), source, line),
+                self.resolve(TYPE_USER, record.get('user'), source, line),
+                created_at, updated_at,
+            ))
+        insert_rows(Comment, ['content', 'task', 'user', 'created_at', 'updated_at'], rows)
+        self.add_task_projects({row[1] for row in rows})
+
+    def add_task_projects(self, task_ids):
+        '''
+        Add the projects of `task_ids` to `project_ids`, looking up the tasks imported by an earlier run.
+        '''
+        missing = [task_id for task_id in task_ids if task_id not in self.task_projects]
+        for start in range(0, len(missing), self.batch_size):
+            self.task_projects.update(
+                Task.objects.filter(pk__in=missing[start:start + self.batch_size]).values_list('pk', 'project_id')
+            )
+        self.project_ids.update(self.task_projects[task_id] for task_id in task_ids)
+
+    def finish(self):
+        '''
+        Commit, then rebuild the data the skipped signals would have maintained.
+        '''
+        self.commit()
+        if self.project_ids:
+            # Recount everything rather than filter on a huge list of project ids.
+            stats.rebuild(self.project_ids if len(self.project_ids) <= 1000 else None)
+            bump_project_generations(*self.project_ids)
+        if search.is_enabled() and (self.counts[TYPE_TASK] or self.counts[TYPE_COMMENT]):
+            search.reindex()
+        if self.counts[TYPE_USER] or self.counts[TYPE_MEMBER]:
+            ProjectAccessResolver.invalidate(*self.ids[TYPE_USER].values())
+            bump_users_generation()
@@ -0,0 +1,93 @@
+import io
+import time
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+
+from config.parsers import FastJSONParser
+from config.renderers import FastJSONRenderer
+from projects.models import Project, Task
+from projects.serializers import TaskSerializer, parse_field_tree
+
+User = get_user_model()
+
+USERS = 20
+PROJECTS = 5
+
+
+class Command(BaseCommand):
+    '''
+    Time DRF's JSON renderer and parser against the orjson ones on task pages as the task list returns them
+    (`?expand=assigned_to,project.owner`). The tasks are built in memory, no database is needed:
+        python manage.py benchmark_json --page-size 1000 --repeat 50
+    '''
+    help = 'Compare the stdlib and orjson JSON renderers and parsers on realistic task pages.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--page-size', type=int, default=100, help='Tasks per page.')
+        parser.add_argument('--repeat', type=int, default=100, help='Renders and parses per class.')
+
+    def handle(self, *args, **options):
+        data = {'next': None, 'previous': None, 'results': build_page(options['page_size'])}
+        repeat = options['repeat']
+        body = JSONRenderer().render(data)
+        self.stdout.write(f"Page of {options['page_size']} tasks, {len(body):,} bytes.")
+
+        render_times = [
+            (renderer_class.__name__, measure(lambda: renderer.render(data), repeat))
+            for renderer_class in [JSONRenderer, FastJSONRenderer]
+            for renderer in [renderer_class()]
+        ]
+        parse_times = [
+            (parser_class.__name__, measure(lambda: parser.parse(io.BytesIO(body)), repeat))
+            for parser_class in [JSONParser, FastJSONParser]
+            for parser in [parser_class()]
+        ]
+        for times in [render_times, parse_times]:
+            (_, baseline), _ = times
+            for name, elapsed in times:
+                self.stdout.write(f'{name:<17} {elapsed * 1000:8.2f}ms per page  x{baseline / elapsed:5.1f}')
+
+
+def build_page(size):
+    '''
+    :returns: `size` serialized tasks with their assignee and project owner expanded.
+    '''
+    now = timezone.now()
+    users = [
+        User(
+            id=i, username=f'user{i}', email=f'user{i}@example.com', first_name='Zoë', last_name=f'User {i}',
+            date_joined=now - timedelta(days=i), is_active=True, last_login=now,
+        )
+        for i in range(1, USERS + 1)
+    ]
+    projects = [
+        Project(id=i, name=f'Project {i}', description='A project — with a longer description. ' * 3,
+                owner=users[i % USERS], created_at=now, updated_at=now)
+        for i in range(1, PROJECTS + 1)
+    ]
+    tasks = [
+        Task(
+            id=i, title=f'Task {i}', description='Steps to reproduce:\n1. Open the page\n2. Click "Save"',
+            status='In Progress', priority='High', assigned_to=users[i % USERS], project=projects[i % PROJECTS],
+            created_at=now, updated_at=now, due_date=now + timedelta(days=i % 30),
+        )
+        for i in range(1, size + 1)
+    ]
+    return TaskSerializer(tasks, many=True, fields={}, expand=parse_field_tree('assigned_to,project.owner')).data
+
+
+def measure(func, repeat):
+    '''
+    :returns: the best time of `func()` in seconds over `repeat` runs.
+    '''
+    best = float('inf')
+    for _ in range(repeat):
+        started_at = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - started_at)
+    return best
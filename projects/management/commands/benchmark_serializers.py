@@ -0,0 +1,93 @@
+import os
+import tempfile
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.utils import timezone
+
+from projects.models import Comment, Project, Task
+from projects.projections import get_projection
+from projects.serializers import CommentSerializer, TaskSerializer, parse_field_tree
+from .benchmark_json import measure
+
+User = get_user_model()
+
+USERS = 20
+
+CASES = [
+    ('tasks', Task, TaskSerializer, ''),
+    ('tasks?expand=assigned_to,project.owner', Task, TaskSerializer, 'assigned_to,project.owner'),
+    ('comments?expand=user,task.project.owner', Comment, CommentSerializer, 'user,task.project.owner'),
+]
+
+
+class Command(BaseCommand):
+    '''
+    Time list pages read with model instances and the serializers against `values()` and the compiled projections,
+    on a scratch copy of the schema:
+        python manage.py benchmark_serializers --rows 1000 --repeat 20
+    Each line shows the query plus representation time, and the representation time alone.
+    '''
+    help = 'Compare the serializers and the compiled projections on list pages.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=1000, help='Rows per page.')
+        parser.add_argument('--repeat', type=int, default=20, help='Runs per case, the best is kept.')
+
+    def handle(self, *args, **options):
+        rows, repeat = options['rows'], options['repeat']
+        with tempfile.TemporaryDirectory() as directory:
+            connection.settings_dict['TEST']['NAME'] = os.path.join(directory, 'benchmark.sqlite3')
+            old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+            try:
+                seed(rows)
+                for label, model, serializer_class, expand in CASES:
+                    self.run_case(label, model, serializer_class, expand, rows, repeat)
+            finally:
+                connection.creation.destroy_test_db(old_name, verbosity=0)
+
+    def run_case(self, label, model, serializer_class, expand, rows, repeat):
+        queryset = serializer_class.get_select_related(parse_field_tree(expand))
+        queryset = model.objects.select_related(*queryset) if queryset else model.objects.all()
+        queryset = queryset.order_by('-created_at', '-id')[:rows]
+        projection = get_projection(serializer_class, None, expand)
+
+        def serialize(instances):
+            return serializer_class(instances, many=True, fields={}, expand=parse_field_tree(expand)).data
+
+        instances, values = list(queryset), list(queryset.values(*projection.paths))
+        assert serialize(instances) == projection.represent(values)
+        timings = [
+            measure(lambda: serialize(list(queryset.all())), repeat),
+            measure(lambda: serialize(instances), repeat),
+            measure(lambda: projection.represent(list(queryset.values(*projection.paths))), repeat),
+            measure(lambda: projection.represent(values), repeat),
+        ]
+        self.stdout.write(label)
+        self.stdout.write(f'  serializer  {timings[0] * 1000:8.2f}ms  (representation {timings[1] * 1000:7.2f}ms)')
+        self.stdout.write(
+            f'  compiled    {timings[2] * 1000:8.2f}ms  (representation {timings[3] * 1000:7.2f}ms)  '
+            f'x{timings[0] / timings[2]:.1f} (x{timings[1] / timings[3]:.1f})'
+        )
+
+
+def seed(rows):
+    now = timezone.now()
+    users = User.objects.bulk_create(
+        User(username=f'user{i}', email=f'user{i}@example.com', first_name='Zoë', last_name=f'User {i}', last_login=now)
+        for i in range(USERS)
+    )
+    projects = Project.objects.bulk_create(
+        Project(name=f'Project {i}', description='A project.', owner=users[i]) for i in range(USERS)
+    )
+    tasks = Task.objects.bulk_create(
+        Task(
+            title=f'Task {i}', description='Steps to reproduce:\n1. Open the page\n2. Click "Save"',
+            status='In Progress', priority='High', assigned_to=users[i % USERS] if i % 4 else None,
+            project=projects[i % USERS], due_date=now + timedelta(days=i % 30),
+        )
+        for i in range(rows)
+    )
+    Comment.objects.bulk_create(Comment(task=tasks[i], user=users[i % USERS], content=f'Comment {i}') for i in range(rows))
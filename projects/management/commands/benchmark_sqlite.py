@@ -0,0 +1,142 @@
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from config.sqlite3.base import apply_pragmas
+
+PROFILE_BASELINE = 'baseline'
+PROFILE_CONFIGURED = 'configured'
+
+SEED_ROWS = 10000
+PROJECTS = 100
+
+
+class Command(BaseCommand):
+    '''
+    Measure SQLite read/write throughput under concurrent threads, with the plain defaults (rollback journal,
+    a new connection per operation, deferred transactions) and with the connection profile of `DATABASES['default']`
+    (pragmas, one persistent connection per thread, its transaction mode). Runs on a scratch database file:
+        python manage.py benchmark_sqlite --readers 8 --writers 4 --duration 10
+    '''
+    help = 'Compare SQLite throughput with the default settings and with the configured connection profile.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--readers', type=int, default=4, help='Reading threads.')
+        parser.add_argument('--writers', type=int, default=4, help='Writing threads.')
+        parser.add_argument('--duration', type=float, default=5, help='Seconds per profile.')
+        parser.add_argument('--profile', choices=[PROFILE_BASELINE, PROFILE_CONFIGURED], help='Only run one profile.')
+
+    def handle(self, *args, **options):
+        profiles = [options['profile']] if options['profile'] else [PROFILE_BASELINE, PROFILE_CONFIGURED]
+        for profile in profiles:
+            with tempfile.TemporaryDirectory() as directory:
+                result = Benchmark(os.path.join(directory, 'benchmark.sqlite3'), profile).run(
+                    options['readers'], options['writers'], options['duration'],
+                )
+            self.stdout.write(
+                f"{profile:<11} reads: {result['reads'] / result['elapsed']:>9,.0f}/s, p99 {result['read_p99']:6.1f}ms  "
+                f"writes: {result['writes'] / result['elapsed']:>8,.0f}/s, p99 {result['write_p99']:6.1f}ms  "
+                f"errors: {result['errors']}"
+            )
+
+
+class Benchmark:
+    '''
+    Readers count and page through the rows of a random project, writers insert and update rows in small transactions,
+    the way the task endpoints do.
+    '''
+    def __init__(self, path, profile):
+        self.path = path
+        self.profile = profile
+        options = settings.DATABASES['default'].get('OPTIONS', {})
+        self.pragmas = options.get('pragmas', {}) if profile == PROFILE_CONFIGURED else {}
+        self.begin = f"BEGIN {options.get('transaction_mode') or 'DEFERRED'}" if profile == PROFILE_CONFIGURED else 'BEGIN'
+        self.lock = threading.Lock()
+        self.results = {'reads': 0, 'writes': 0, 'errors': 0, 'read_times': [], 'write_times': []}
+
+    def connect(self):
+        conn = sqlite3.connect(self.path, isolation_level=None, check_same_thread=False)
+        apply_pragmas(conn, self.pragmas)
+        return conn
+
+    def setup(self):
+        conn = self.connect()
+        conn.execute('CREATE TABLE task (id INTEGER PRIMARY KEY, project INTEGER, title TEXT, status TEXT, updated_at REAL)')
+        conn.execute('CREATE INDEX task_project ON task (project, id)')
+        conn.execute('BEGIN')
+        conn.executemany(
+            'INSERT INTO task (project, title, status, updated_at) VALUES (?, ?, ?, ?)',
+            [(i % PROJECTS, f'Task {i}', 'To Do', time.time()) for i in range(SEED_ROWS)],
+        )
+        conn.execute('COMMIT')
+        conn.close()
+
+    def run(self, readers, writers, duration):
+        self.setup()
+        self.deadline = time.monotonic() + duration
+        threads = [threading.Thread(target=self.work, args=(self.read, 'read', i)) for i in range(readers)]
+        threads += [threading.Thread(target=self.work, args=(self.write, 'write', i)) for i in range(writers)]
+        started_at = time.monotonic()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        results = self.results
+        return {
+            'reads': results['reads'], 'writes': results['writes'], 'errors': results['errors'],
+            'elapsed': time.monotonic() - started_at,
+            'read_p99': percentile(results['read_times'], 0.99), 'write_p99': percentile(results['write_times'], 0.99),
+        }
+
+    def work(self, operation, kind, seed):
+        # The baseline opens a connection per operation, like a request with `CONN_MAX_AGE = 0`.
+        persistent = self.connect() if self.profile == PROFILE_CONFIGURED else None
+        count, errors, times = 0, 0, []
+        while time.monotonic() < self.deadline:
+            conn = persistent or self.connect()
+            started_at = time.perf_counter()
+            try:
+                operation(conn, (seed * 7919 + count) % PROJECTS)
+            except sqlite3.OperationalError:
+                errors += 1
+                if conn.in_transaction:
+                    conn.execute('ROLLBACK')
+            else:
+                count += 1
+                times.append(time.perf_counter() - started_at)
+            finally:
+                if persistent is None:
+                    conn.close()
+        if persistent is not None:
+            persistent.close()
+        with self.lock:
+            self.results[f'{kind}s'] += count
+            self.results['errors'] += errors
+            self.results[f'{kind}_times'] += times
+
+    def read(self, conn, project):
+        conn.execute('SELECT COUNT(*) FROM task WHERE project = ?', [project]).fetchone()
+        conn.execute('SELECT * FROM task WHERE project = ? ORDER BY id DESC LIMIT 20', [project]).fetchall()
+
+    def write(self, conn, project):
+        # Read then write in one transaction: a deferred transaction cannot wait for the lock when it upgrades.
+        conn.execute(self.begin)
+        row = conn.execute('SELECT MAX(id) FROM task WHERE project = ?', [project]).fetchone()
+        conn.execute('INSERT INTO task (project, title, status, updated_at) VALUES (?, ?, ?, ?)', [project, 'New', 'To Do', time.time()])
+        conn.execute('UPDATE task SET status = ?, updated_at = ? WHERE id = ?', ['Done', time.time(), row[0]])
+        conn.execute('COMMIT')
+
+
+def percentile(values, fraction):
+    '''
+    :returns: the `fraction` percentile of `values` (seconds) in milliseconds, 0 without values.
+    '''
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))] * 1000
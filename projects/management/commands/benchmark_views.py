@@ -0,0 +1,144 @@
+import asyncio
+import os
+import tempfile
+import time
+from datetime import timedelta
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import AsyncRequestFactory, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.module_loading import import_string
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from projects import async_views, views
+from projects.models import Comment, Project, Task
+from .benchmark_sqlite import percentile
+
+User = get_user_model()
+
+MODE_SYNC = 'sync'
+MODE_ASYNC = 'async'
+
+PROJECTS = 20
+TASKS_PER_PROJECT = 100
+COMMENTS_PER_TASK = 3
+
+ENDPOINTS = {
+    'projects': (views.ProjectsListCreateView, async_views.AsyncProjectsListCreateView),
+    'tasks': (views.TaskListCreateView, async_views.AsyncTaskListCreateView),
+    'task': (views.RetrieveTaskView, async_views.AsyncRetrieveTaskView),
+    'comments': (views.CommentsListCreateView, async_views.AsyncCommentsListCreateView),
+}
+
+
+class Command(BaseCommand):
+    '''
+    Load test the sync and the async project views under concurrent requests, on a scratch copy of the schema:
+        python manage.py benchmark_views --concurrency 64 --requests 5000 --endpoint tasks
+    Requests are JWT authenticated and bypass the response cache. Sync views are run the way Django's ASGI handler
+    runs them (`sync_to_async`, one shared thread), async views on the event loop. The middleware is not part of the
+    measure: a sync-only middleware runs every request, async views included, through that same thread.
+    '''
+    help = 'Compare the throughput and latency of the sync and async project views under concurrent requests.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=32, help='Concurrent clients.')
+        parser.add_argument('--requests', type=int, default=2000, help='Requests per mode.')
+        parser.add_argument('--endpoint', choices=sorted(ENDPOINTS), default='tasks', help='Endpoint to call.')
+        parser.add_argument('--mode', choices=[MODE_SYNC, MODE_ASYNC], help='Only run one mode.')
+
+    def handle(self, *args, **options):
+        for name in settings.MIDDLEWARE:
+            if not getattr(import_string(name), 'async_capable', False):
+                self.stderr.write(self.style.WARNING(
+                    f'{name} is sync-only: under ASGI every request goes through a thread, async views included.'
+                ))
+
+        modes = [options['mode']] if options['mode'] else [MODE_SYNC, MODE_ASYNC]
+        with tempfile.TemporaryDirectory() as directory:
+            connection.settings_dict['TEST']['NAME'] = os.path.join(directory, 'benchmark.sqlite3')
+            old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+            try:
+                with override_settings(PROJECT_RESPONSE_CACHE_TIMEOUT=0):
+                    benchmark = ViewBenchmark(options['endpoint'])
+                    for mode in modes:
+                        result = asyncio.run(benchmark.run(mode, options['concurrency'], options['requests']))
+                        self.stdout.write(
+                            f"{mode:<5} {result['requests'] / result['elapsed']:>8,.0f} requests/s  "
+                            f"p50 {result['p50']:6.1f}ms  p99 {result['p99']:6.1f}ms  errors: {result['errors']}"
+                        )
+            finally:
+                connection.creation.destroy_test_db(old_name, verbosity=0)
+
+
+class ViewBenchmark:
+    '''
+    Seeds projects with tasks and comments, then calls one endpoint from concurrent coroutines.
+    '''
+    def __init__(self, endpoint):
+        self.sync_view, self.async_view = (view.as_view() for view in ENDPOINTS[endpoint])
+        self.endpoint = endpoint
+        self.factory = AsyncRequestFactory()
+        self.seed()
+
+    def seed(self):
+        self.user = User.objects.create_user(email='benchmark@example.com', password='benchmark', username='benchmark')
+        self.token = str(RefreshToken.for_user(self.user).access_token)
+        due_date = timezone.now() + timedelta(days=7)
+        projects = Project.objects.bulk_create(
+            Project(name=f'Project {i}', description='Benchmark', owner=self.user) for i in range(PROJECTS)
+        )
+        tasks = Task.objects.bulk_create(
+            Task(project=project, title=f'Task {i}', description='Benchmark', due_date=due_date, assigned_to=self.user)
+            for project in projects for i in range(TASKS_PER_PROJECT)
+        )
+        Comment.objects.bulk_create(
+            Comment(task=task, user=self.user, content=f'Comment {i}') for task in tasks for i in range(COMMENTS_PER_TASK)
+        )
+        self.projects = [project.id for project in projects]
+        self.tasks = [task.id for task in tasks]
+
+    def get_call(self, index):
+        '''
+        :returns: the path and the view kwargs of request number `index`.
+        '''
+        if self.endpoint == 'projects':
+            return reverse('project-list'), {}
+        if self.endpoint == 'tasks':
+            project_id = self.projects[index % len(self.projects)]
+            return reverse('project-tasks', args=[project_id]) + '?expand=assigned_to', {'project_id': project_id}
+        task_id = self.tasks[index % len(self.tasks)]
+        if self.endpoint == 'task':
+            return reverse('task-detail', args=[task_id]), {'pk': task_id}
+        return reverse('comments-list', args=[task_id]), {'task_id': task_id}
+
+    async def run(self, mode, concurrency, total):
+        view = self.async_view if mode == MODE_ASYNC else sync_to_async(self.sync_view)
+        requests = iter(range(total))
+        times, errors = [], 0
+
+        async def client():
+            nonlocal errors
+            for index in requests:
+                path, kwargs = self.get_call(index)
+                request = self.factory.get(path, headers={'Authorization': f'Bearer {self.token}'})
+                started_at = time.perf_counter()
+                response = await view(request, **kwargs)
+                # Like Django's handler, for either kind of view.
+                await sync_to_async(response.render)()
+                if response.status_code == 200:
+                    times.append(time.perf_counter() - started_at)
+                else:
+                    errors += 1
+
+        started_at = time.monotonic()
+        await asyncio.gather(*(client() for _ in range(concurrency)))
+        return {
+            'requests': len(times), 'errors': errors, 'elapsed': time.monotonic() - started_at,
+            'p50': percentile(times, 0.5), 'p99': percentile(times, 0.99),
+        }
@@ -0,0 +1,36 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from projects import export
+from projects.models import Project
+
+
+class Command(BaseCommand):
+    '''
+    Dump the tasks and comments of a project to a file (or stdout), the same way the export endpoint streams them:
+        python manage.py export_project 1 --format csv --gzip --output project-1.csv.gz
+    '''
+    help = "Export a project's tasks and comments as NDJSON or CSV."
+
+    def add_arguments(self, parser):
+        parser.add_argument('project_id', type=int)
+        parser.add_argument('--format', choices=list(export.FORMATS), default=export.FORMAT_NDJSON)
+        parser.add_argument('--gzip', action='store_true', help='Compress the output with gzip.')
+        parser.add_argument('--output', help='File to write, stdout by default.')
+        parser.add_argument('--chunk-size', type=int, default=export.CHUNK_SIZE, help='Rows fetched per query round trip.')
+
+    def handle(self, *args, **options):
+        if not Project.objects.filter(pk=options['project_id']).exists():
+            raise CommandError(f"Project {options['project_id']} does not exist.")
+
+        chunks = export.export_project(options['project_id'], options['format'], options['gzip'], options['chunk_size'])
+        if options['output']:
+            with open(options['output'], 'wb') as output:
+                for chunk in chunks:
+                    output.write(chunk)
+        else:
+            output = getattr(self.stdout, 'buffer', None) or sys.stdout.buffer
+            for chunk in chunks:
+                output.write(chunk)
+            output.flush()
@@ -0,0 +1,74 @@
+import os
+import time
+from itertools import chain
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import IntegrityError
+
+from projects import importer
+from projects.models import Comment, Project, Task
+
+
+class Command(BaseCommand):
+    '''
+    Bulk load users, projects, members, tasks and comments from JSONL or CSV files (optionally gzip compressed).
+    Files are read in the given order as one stream, parents must come before the rows that refer to them:
+        python manage.py import_data users.csv projects.jsonl tasks.jsonl.gz comments.jsonl.gz --defer-indexes
+    A record's type comes from its `type` field, or from `--type` for files without one. Keep the id maps in a
+    file to import the rows that refer to them in a later run:
+        python manage.py import_data users.csv projects.jsonl --id-map ids.json
+        python manage.py import_data comments.csv --type comment --id-map ids.json
+    '''
+    help = 'Bulk import users, projects, members, tasks and comments from JSONL/CSV files.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('files', nargs='+', help='JSONL (.jsonl, .ndjson) or CSV (.csv) files, optionally .gz.')
+        parser.add_argument('--type', choices=importer.TYPES, help='Record type of rows without a `type` field.')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Rows per bulk INSERT.')
+        parser.add_argument('--transaction-size', type=int, default=100000, help='Rows per committed transaction.')
+        parser.add_argument('--defer-indexes', action='store_true', help='Drop the task and comment indexes during the import.')
+        parser.add_argument('--id-map', help='JSON file of source to new ids, read at the start (if it exists) and written on success.')
+        parser.add_argument('--progress-every', type=float, default=5, help='Seconds between progress lines.')
+
+    def handle(self, *args, **options):
+        self.last_progress = time.monotonic()
+        self.progress_every = options['progress_every']
+        loader = importer.Importer(options['batch_size'], options['transaction_size'], progress=self.report_progress)
+        if options['id_map'] and os.path.exists(options['id_map']):
+            loader.load_ids(options['id_map'])
+        records = chain.from_iterable(importer.open_records(path, options['type']) for path in options['files'])
+
+        with importer.preserve_timestamps(importer.User, Project, Task, Comment):
+            if options['defer_indexes']:
+                with importer.deferred_indexes(Task, Comment):
+                    self.load(loader, records)
+            else:
+                self.load(loader, records)
+            self.stdout.write('Rebuilding task stats and the search index...')
+            loader.finish()
+        if options['id_map']:
+            loader.save_ids(options['id_map'])
+
+        counts = ', '.join(f'{count} {record_type}(s)' for record_type, count in loader.counts.items() if count)
+        self.stdout.write(self.style.SUCCESS(
+            f'Imported {counts or "nothing"} in {time.monotonic() - loader.started_at:.1f}s '
+            f'({loader.get_rate():,.0f} rows/s).'
+        ))
+
+    def load(self, loader, records):
+        try:
+            loader.run(records)
+        except (importer.ImportDataError, IntegrityError, KeyError, ValueError, OSError) as exc:
+            loader.rollback(exc)
+            loader.finish()
+            message = f'missing field {exc}' if isinstance(exc, KeyError) else str(exc)
+            raise CommandError(
+                f'Import stopped after {loader.total} row(s): {message.rstrip(".")}. Rows of already committed transactions are kept.'
+            )
+        loader.commit()
+
+    def report_progress(self, loader):
+        now = time.monotonic()
+        if now - self.last_progress >= self.progress_every:
+            self.last_progress = now
+            self.stdout.write(f'{loader.total:,} rows, {loader.get_rate():,.0f} rows/s')
@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from projects import stats
+
+
+class Command(BaseCommand):
+    '''
+    Recount the task stats counters of the project dashboards from the tasks, or only check them with `--check`:
+        python manage.py rebuild_task_stats --check
+        python manage.py rebuild_task_stats --project 1 --project 2
+    '''
+    help = 'Rebuild (or check) the per-project task counters used by the stats endpoint.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--project', type=int, action='append', dest='projects', help='Only this project (repeatable).')
+        parser.add_argument('--check', action='store_true', help='Report counters that differ from the tasks, without writing.')
+
+    def handle(self, *args, **options):
+        project_ids = options['projects']
+        if not options['check']:
+            written = stats.rebuild(project_ids)
+            self.stdout.write(f'Rebuilt {written} counter(s).')
+            return
+
+        tasks = stats.Task.objects.all()
+        if project_ids is not None:
+            tasks = tasks.filter(project_id__in=project_ids)
+        expected = {key: count for key, count in stats.count_tasks(tasks).items() if count}
+        stored = stats.get_stored_counts(project_ids)
+        mismatches = sorted(key for key in expected.keys() | stored.keys() if expected.get(key, 0) != stored.get(key, 0))
+        for project_id, dimension, value in mismatches:
+            key = (project_id, dimension, value)
+            self.stdout.write(
+                f'Project {project_id} {dimension}={value!r}: stored {stored.get(key, 0)}, expected {expected.get(key, 0)}'
+            )
+        if mismatches:
+            raise CommandError(f'{len(mismatches)} counter(s) out of date, run rebuild_task_stats to fix them.')
+        self.stdout.write(f'All {len(expected)} counter(s) are up to date.')
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from projects import search
+
+
+class Command(BaseCommand):
+    '''
+    Rebuild the full-text search index of tasks and comments from scratch:
+        python manage.py reindex_search
+    '''
+    help = 'Rebuild the full-text search index of tasks and comments.'
+
+    def handle(self, *args, **options):
+        if not search.is_enabled():
+            raise CommandError('Full-text search needs the SQLite database (FTS5).')
+        indexed = search.reindex()
+        self.stdout.write(f'Indexed {indexed} task(s) and comment(s).')
@@ -0,0 +1,83 @@
+import io
+import os
+import pstats
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from config.profiling import PROFILE_HEADER, get_profile_token, list_profiles
+
+SQL_WIDTH = 120
+
+
+class Command(BaseCommand):
+    '''
+    List the requests saved by the request profiler (`config/profiling.py`), or summarize one: its hottest functions,
+    its SQL time, slowest queries and repeated statements.
+        python manage.py request_profiles --header
+        python manage.py request_profiles
+        python manage.py request_profiles --last --sort tottime --limit 30
+    '''
+    help = 'List and summarize the saved request profiles.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('profile_id', nargs='?', help='Profile to summarize (the X-Profile-Id response header).')
+        parser.add_argument('--last', action='store_true', help='Summarize the newest profile.')
+        parser.add_argument('--sort', choices=['cumulative', 'tottime'], default='cumulative', help='Order of the functions.')
+        parser.add_argument('--limit', type=int, default=20, help='Functions and queries to show.')
+        parser.add_argument('--header', action='store_true', help='Print an X-Profile header to profile a request.')
+
+    def handle(self, *args, **options):
+        if options['header']:
+            self.stdout.write(f'{PROFILE_HEADER}: {get_profile_token()}')
+            return
+        profiles = list_profiles()
+        if options['last']:
+            if not profiles:
+                raise CommandError(f'No profiles in {settings.PROFILER_DIR}.')
+            return self.summarize(profiles[0], options['sort'], options['limit'])
+        if options['profile_id']:
+            profile = next((profile for profile in profiles if profile['id'] == options['profile_id']), None)
+            if profile is None:
+                raise CommandError(f"No profile {options['profile_id']} in {settings.PROFILER_DIR}.")
+            return self.summarize(profile, options['sort'], options['limit'])
+
+        for profile in profiles:
+            sql_ms = sum(query['duration_ms'] for query in profile['queries'])
+            self.stdout.write(
+                f"{profile['id']}  {profile['method']:6} {profile['status']}  {profile['duration_ms']:8.1f}ms  "
+                f"{len(profile['queries']):3} queries {sql_ms:7.1f}ms  {profile['path']}"
+            )
+
+    def summarize(self, profile, sort, limit):
+        queries = profile['queries']
+        sql_ms = sum(query['duration_ms'] for query in queries)
+        self.stdout.write(
+            f"{profile['method']} {profile['path']} ({profile['view']}) -> {profile['status']} "
+            f"in {profile['duration_ms']:.1f}ms, {len(queries)} queries in {sql_ms:.1f}ms"
+        )
+
+        output = io.StringIO()
+        stats = pstats.Stats(os.path.join(settings.PROFILER_DIR, f"{profile['id']}.prof"), stream=output)
+        stats.strip_dirs().sort_stats(sort).print_stats(limit)
+        # Skip the header of pstats, the file name and the date.
+        self.stdout.write(output.getvalue().split('\n', 3)[-1].rstrip())
+
+        if not queries:
+            return
+        self.stdout.write('\nSlowest queries:')
+        for query in sorted(queries, key=lambda query: query['duration_ms'], reverse=True)[:limit]:
+            self.stdout.write(f"  {query['duration_ms']:8.2f}ms  {query['sql'][:SQL_WIDTH]}")
+
+        statements = defaultdict(list)
+        for query in queries:
+            statements[query['sql']].append(query['duration_ms'])
+        repeated = sorted(
+            ((sql, durations) for sql, durations in statements.items() if len(durations) > 1),
+            key=lambda item: sum(item[1]), reverse=True,
+        )
+        if repeated:
+            self.stdout.write('\nRepeated statements:')
+            for sql, durations in repeated[:limit]:
+                self.stdout.write(f'  {len(durations):4}x {sum(durations):8.2f}ms  {sql[:SQL_WIDTH]}')
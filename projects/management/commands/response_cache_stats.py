@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from projects import cache as response_cache
+
+
+class Command(BaseCommand):
+    '''
+    Print the hit and miss counters of the project and task list response cache.
+        python manage.py response_cache_stats --reset
+    '''
+    help = 'Show the hit/miss counters of the list response cache.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--reset', action='store_true', help='Reset the counters after printing them.')
+
+    def handle(self, *args, **options):
+        stats = response_cache.get_stats()
+        total = stats['hits'] + stats['misses']
+        ratio = stats['hits'] / total if total else 0
+        self.stdout.write(f"Hits: {stats['hits']}, misses: {stats['misses']}, hit ratio: {ratio:.1%}")
+        if options['reset']:
+            response_cache.reset_stats()
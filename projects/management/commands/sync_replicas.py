@@ -0,0 +1,49 @@
+import sqlite3
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+
+
+def copy_database(source_path, target_path, pages=1024):
+    '''
+    Copy an SQLite database into another file with the online backup API, a few `pages` at a time so writers of
+    the source are not blocked for the whole copy. The target is written in place: readers that keep a connection
+    open see the new data.
+    '''
+    source = sqlite3.connect(source_path)
+    target = sqlite3.connect(target_path)
+    try:
+        source.backup(target, pages=pages)
+    finally:
+        target.close()
+        source.close()
+
+
+class Command(BaseCommand):
+    '''
+    Stand-in for replication when the replicas of `DATABASE_REPLICAS` are local SQLite files: copy the primary
+    database into every replica, once or every `--interval` seconds.
+        python manage.py sync_replicas --loop --interval 2
+    '''
+    help = 'Copy the primary SQLite database into the replica files.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--loop', action='store_true', help='Keep copying until interrupted.')
+        parser.add_argument('--interval', type=float, default=1, help='Seconds between copies with --loop.')
+
+    def handle(self, *args, **options):
+        if not settings.DATABASE_REPLICAS:
+            raise CommandError('No replicas configured, set DB_REPLICAS.')
+        source = connections[DEFAULT_DB_ALIAS].settings_dict['NAME']
+        while True:
+            started_at = time.monotonic()
+            for alias in settings.DATABASE_REPLICAS:
+                copy_database(source, connections[alias].settings_dict['NAME'])
+            self.stdout.write(
+                f'Copied to {len(settings.DATABASE_REPLICAS)} replica(s) in {(time.monotonic() - started_at) * 1000:.0f}ms.'
+            )
+            if not options['loop']:
+                return
+            time.sleep(options['interval'])
@@ -0,0 +1,45 @@
+# Generated by Django 5.0.7 on 2026-10-18 00:13
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def count_existing_tasks(apps, schema_editor):
+    Task = apps.get_model('projects', 'Task')
+    ProjectTaskStat = apps.get_model('projects', 'ProjectTaskStat')
+    stats = [
+        ProjectTaskStat(project_id=row['project_id'], dimension='total', value='', count=row['count'])
+        for row in Task.objects.order_by().values('project_id').annotate(count=Count('id'))
+    ]
+    for dimension, field in [('status', 'status'), ('priority', 'priority'), ('assigned_to', 'assigned_to_id')]:
+        stats += [
+            ProjectTaskStat(project_id=row['project_id'], dimension=dimension, value=row[field] or '', count=row['count'])
+            for row in Task.objects.order_by().values('project_id', field).annotate(count=Count('id'))
+        ]
+    ProjectTaskStat.objects.bulk_create(stats, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('projects', '0003_updated_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProjectTaskStat',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('dimension', models.CharField(max_length=20)),
+                ('value', models.CharField(blank=True, max_length=50)),
+                ('count', models.IntegerField(default=0)),
+                ('project', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='task_stats', to='projects.project')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='projecttaskstat',
+            constraint=models.UniqueConstraint(fields=('project', 'dimension', 'value'), name='unique_project_task_stat'),
+        ),
+        migrations.RunPython(count_existing_tasks, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 5.0.7 on 2026-10-18 10:40
+
+from django.db import migrations
+
+
+def create_search_index(apps, schema_editor):
+    '''
+    Create the FTS5 full-text index of task titles, descriptions and comments, and fill it.
+    Only SQLite has FTS5, on other databases search is disabled.
+    '''
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute('''
+        CREATE VIRTUAL TABLE IF NOT EXISTS projects_search USING fts5(
+            kind UNINDEXED, object_id UNINDEXED, task_id UNINDEXED, project, title, body,
+            tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3'
+        )
+    ''')
+    schema_editor.execute('''
+        INSERT INTO projects_search (rowid, kind, object_id, task_id, project, title, body)
+        SELECT id * 2, 'task', id, id, 'p' || project_id, title, description FROM projects_task
+    ''')
+    schema_editor.execute('''
+        INSERT INTO projects_search (rowid, kind, object_id, task_id, project, title, body)
+        SELECT c.id * 2 + 1, 'comment', c.id, c.task_id, 'p' || t.project_id, '', c.content
+        FROM projects_comment c INNER JOIN projects_task t ON t.id = c.task_id
+    ''')
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute('DROP TABLE IF EXISTS projects_search')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('projects', '0004_project_task_stats'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
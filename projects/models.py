@@ -13,12 +13,14 @@ class Project(models.Model):
     - description: A brief description of the project.
     - owner: The user who owns the project (a foreign key reference to the `User` model).
     - created_at: The timestamp when the project was created.
+    - updated_at: The timestamp of the last change to the project.
     '''
     id = models.AutoField(primary_key=True)
     name = models.CharField(max_length=255, null=False)
     description = models.TextField()
     owner = models.ForeignKey(User, on_delete=models.CASCADE, related_name='projects')
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return self.name
@@ -54,6 +56,7 @@ class Task(models.Model):
     - assigned_to: The user assigned to the task (foreign key to the `User` model, nullable).
     - project: The project this task belongs to (foreign key to the `Project` model).
     - created_at: The timestamp when the task was created.
+    - updated_at: The timestamp of the last change to the task.
     - due_date: The due date for the task.
     '''
     id = models.AutoField(primary_key=True)
@@ -64,8 +67,21 @@ class Task(models.Model):
     assigned_to = models.ForeignKey(User, null=True, blank=True, on_delete=models.SET_NULL, related_name='tasks')
     project = models.ForeignKey(Project, on_delete=models.CASCADE, related_name='tasks')
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
     due_date = models.DateTimeField()
 
+    class Meta:
+        # Composite indexes backing the task list filters and its default `(created_at, id)` ordering.
+        indexes = [
+            models.Index(fields=['project', 'created_at', 'id'], name='task_project_created_idx'),
+            models.Index(fields=['project', 'status', 'due_date'], name='task_project_status_due_idx'),
+            models.Index(fields=['project', 'priority', 'due_date'], name='task_project_priority_due_idx'),
+            models.Index(fields=['project', 'due_date'], name='task_project_due_idx'),
+            models.Index(fields=['assigned_to', 'status'], name='task_assignee_status_idx'),
+            # Covers the `Max('updated_at')` version query of the conditional task list.
+            models.Index(fields=['project', 'updated_at'], name='task_project_updated_idx'),
+        ]
+
     def __str__(self):
         return self.title
 
@@ -79,15 +95,46 @@ class Comment(models.Model):
     - user: The user who created the comment (a foreign key reference to the `User` model).
     - task: The task this comment is associated with (a foreign key reference to the `Task` model).
     - created_at: The timestamp when the comment was created.
+    - updated_at: The timestamp of the last change to the comment.
     '''
     id = models.AutoField(primary_key=True)
     content = models.TextField()
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='comments')
     task = models.ForeignKey(Task, on_delete=models.CASCADE, related_name='comments')
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['task', 'created_at', 'id'], name='comment_task_created_idx'),
+            models.Index(fields=['task', 'updated_at'], name='comment_task_updated_idx'),
+        ]
 
     def __str__(self):
         '''
         Returns the first 50 characters of the comment content.
         '''
         return self.content[:50]  # Return the first 50 characters of the comment
+
+
+class ProjectTaskStat(models.Model):
+    '''
+    A counter of the tasks of a project, kept up to date with `F()` increments on every task change (see `stats.py`).
+    Attributes:
+    - project: The project whose tasks are counted (a foreign key reference to the `Project` model).
+    - dimension: What is counted: `total`, `status`, `priority` or `assigned_to`.
+    - value: The status, priority or assignee id counted (empty for `total` and for unassigned tasks).
+    - count: The number of tasks.
+    '''
+    project = models.ForeignKey(Project, on_delete=models.CASCADE, related_name='task_stats')
+    dimension = models.CharField(max_length=20)
+    value = models.CharField(max_length=50, blank=True)
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['project', 'dimension', 'value'], name='unique_project_task_stat'),
+        ]
+
+    def __str__(self):
+        return f'{self.project_id} {self.dimension}={self.value}: {self.count}'
@@ -0,0 +1,197 @@
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from collections import OrderedDict, namedtuple
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db.models import Q
+from django.utils.translation import gettext_lazy as _
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import CursorPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+KeysetCursor = namedtuple('KeysetCursor', ['position', 'reverse'])
+
+
+class KeysetCursorPagination(CursorPagination):
+    '''
+    Keyset pagination over a composite, unique ordering such as `(created_at, id)`.
+    DRF's `CursorPagination` only keys on the first ordering field and falls back to an `OFFSET`
+    for ties. This class stores the full key of the boundary row in an opaque cursor and fetches the
+    next page with a `WHERE (created_at, id) < (...)` condition, so page N costs the same as page 1.
+    - **cursor**: the opaque value taken from the `next` or `previous` links, only valid for the ordering it was
+      made with.
+    - **page_size**: number of results per page, up to `max_page_size`.
+    - **count**: pass `?count=true` to include the total number of results. It is skipped by default
+      because a `COUNT(*)` has to visit every matching row.
+    '''
+    ordering = ('-created_at', '-id')
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    count_query_param = 'count'
+    count_query_description = _('Set to `true` to include the total number of results.')
+
+    def paginate_queryset(self, queryset, request, view=None, values=None):
+        page_queryset = self.get_page_queryset(queryset, request, view, values)
+        if page_queryset is None:
+            return None
+        self.count = queryset.count() if self.wants_count(request) else None
+        return self.set_page(list(page_queryset), self.reverse)
+
+    async def apaginate_queryset(self, queryset, request, view=None, values=None):
+        '''
+        `paginate_queryset()` for async views, with the same queries run through the async ORM.
+        '''
+        page_queryset = self.get_page_queryset(queryset, request, view, values)
+        if page_queryset is None:
+            return None
+        self.count = await queryset.acount() if self.wants_count(request) else None
+        return self.set_page([row async for row in page_queryset], self.reverse)
+
+    def get_page_queryset(self, queryset, request, view=None, values=None):
+        '''
+        Decode the cursor and return the query of the page, or `None` if pagination is disabled.
+        With `values`, the page holds dicts of these fields and of the ordering fields instead of model instances.
+        '''
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        self.base_url = self.get_base_url(request)
+        self.ordering = self.get_unique_ordering(self.get_ordering(request, queryset, view))
+        self.model = queryset.model
+
+        self.cursor = self.decode_cursor(request)
+        self.reverse = self.cursor is not None and self.cursor.reverse
+        ordering = [self.invert(field) for field in self.ordering] if self.reverse else self.ordering
+
+        queryset = queryset.order_by(*ordering)
+        if self.cursor is not None:
+            queryset = queryset.filter(self.get_keyset_filter(ordering, self.cursor.position))
+        if values is not None:
+            queryset = queryset.values(*dict.fromkeys([*values, *(field.lstrip('-') for field in self.ordering)]))
+
+        # Fetch one extra row to find out whether there is a following page.
+        return queryset[:self.page_size + 1]
+
+    def get_base_url(self, request):
+        return remove_query_param(request.build_absolute_uri(), self.cursor_query_param)
+
+    def set_page(self, results, reverse):
+        '''
+        Keep the first `page_size` of `results` (fetched with one extra row) as the page, in display order.
+        '''
+        has_more = len(results) > self.page_size
+        self.page = results[:self.page_size]
+
+        if reverse:
+            self.page.reverse()
+            self.has_next, self.has_previous = True, has_more
+        else:
+            self.has_next, self.has_previous = has_more, self.cursor is not None
+        return self.page
+
+    def wants_count(self, request):
+        return request.query_params.get(self.count_query_param, '').lower() in ('1', 'true', 'yes')
+
+    def get_unique_ordering(self, ordering):
+        '''
+        Append the primary key as a tie breaker so the ordering is unique and every row has a distinct key.
+        '''
+        ordering = tuple(ordering)
+        if not any(field.lstrip('-') in ('id', 'pk') for field in ordering):
+            ordering += ('-id' if ordering[-1].startswith('-') else 'id',)
+        return ordering
+
+    @staticmethod
+    def invert(field):
+        return field[1:] if field.startswith('-') else '-' + field
+
+    def get_keyset_filter(self, ordering, position):
+        '''
+        Build the row comparison `(a, b, c) > (x, y, z)` as
+        `a > x OR (a = x AND b > y) OR (a = x AND b = y AND c > z)`, honouring the direction of each field.
+        '''
+        keyset_filter = Q()
+        equal = Q()
+        for field, value in zip(ordering, position):
+            name = field.lstrip('-')
+            lookup = '__lt' if field.startswith('-') else '__gt'
+            keyset_filter |= equal & Q(**{name + lookup: value})
+            equal &= Q(**{name: value})
+        return keyset_filter
+
+    def get_position(self, row):
+        return [
+            row[field.lstrip('-')] if isinstance(row, dict) else getattr(row, field.lstrip('-'))
+            for field in self.ordering
+        ]
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        return self.encode_cursor(KeysetCursor(position=self.get_position(self.page[-1]), reverse=False))
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if not self.page:
+            # Paging backwards past the first row, the previous page is the first page.
+            return self.base_url
+        return self.encode_cursor(KeysetCursor(position=self.get_position(self.page[0]), reverse=True))
+
+    def encode_cursor(self, cursor):
+        position = [value.isoformat() if hasattr(value, 'isoformat') else value for value in cursor.position]
+        # The ordering is recorded so the cursor cannot be replayed under another `ordering` parameter.
+        payload = json.dumps({'p': position, 'r': int(cursor.reverse), 'o': list(self.ordering)}, separators=(',', ':'))
+        encoded = urlsafe_b64encode(payload.encode()).decode('ascii').rstrip('=')
+        return replace_query_param(self.base_url, self.cursor_query_param, encoded)
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded is None:
+            return None
+
+        try:
+            payload = json.loads(urlsafe_b64decode(encoded + '=' * (-len(encoded) % 4)))
+            position = payload['p']
+            if payload['o'] != list(self.ordering) or len(position) != len(self.ordering):
+                raise ValueError('Cursor does not match the ordering.')
+            return KeysetCursor(position=self.parse_position(position), reverse=bool(payload.get('r')))
+        except (TypeError, ValueError, KeyError, FieldDoesNotExist, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def parse_position(self, position):
+        return [
+            self.model._meta.get_field(field.lstrip('-')).to_python(value)
+            for field, value in zip(self.ordering, position)
+        ]
+
+    def get_paginated_response(self, data):
+        response = OrderedDict()
+        if self.count is not None:
+            response['count'] = self.count
+        response['next'] = self.get_next_link()
+        response['previous'] = self.get_previous_link()
+        response['results'] = data
+        return Response(response)
+
+    def get_paginated_response_schema(self, schema):
+        response_schema = super().get_paginated_response_schema(schema)
+        response_schema['properties'] = {
+            'count': {'type': 'integer', 'example': 123},
+            **response_schema['properties'],
+        }
+        return response_schema
+
+    def get_schema_operation_parameters(self, view):
+        parameters = super().get_schema_operation_parameters(view)
+        parameters.append({
+            'name': self.count_query_param,
+            'required': False,
+            'in': 'query',
+            'description': str(self.count_query_description),
+            'schema': {'type': 'boolean'},
+        })
+        return parameters
@@ -0,0 +1,159 @@
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.exceptions import FieldDoesNotExist
+from django.utils import timezone
+from rest_framework import ISO_8601, serializers
+from rest_framework.relations import PrimaryKeyRelatedField
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+
+from config.metrics import timed
+
+from .pagination import KeysetCursorPagination
+from .serializers import ExpandableFieldsMixin, parse_field_tree
+
+# Fields whose representation of a database value is the value itself.
+PLAIN_FIELDS = {serializers.IntegerField, serializers.CharField, serializers.EmailField, PrimaryKeyRelatedField}
+# Fields whose `to_representation()` is still needed, it is called with the value directly.
+CONVERTED_FIELDS = {serializers.ChoiceField, serializers.BooleanField, serializers.DateField}
+
+
+class NotCompilable(Exception):
+    pass
+
+
+class Projection:
+    '''
+    A serializer's field set compiled once into the `values()` paths to fetch, and a function building the
+    representation of a fetched row. Rows skip model instances and the per-field `get_attribute()` and
+    `to_representation()` dispatch of DRF, with the same output as the serializer. ISO 8601 datetimes are formatted
+    directly, with the current timezone looked up once per page instead of once per value.
+    Only plain model fields, foreign keys and nested model serializers are compiled; a serializer with anything
+    else (method fields, custom sources, an overridden `to_representation()`) raises `NotCompilable`.
+    '''
+    def __init__(self, serializer):
+        self.paths = []
+        self.to_representation = self.compile(serializer, '')
+        self.paths = list(dict.fromkeys(self.paths))
+
+    def compile(self, serializer, prefix):
+        if type(serializer).to_representation is not serializers.Serializer.to_representation:
+            raise NotCompilable(type(serializer).__name__)
+        model = serializer.Meta.model
+        getters = []
+        for field in serializer._readable_fields:
+            name = field.field_name
+            try:
+                model_field = model._meta.get_field(field.source)
+            except FieldDoesNotExist:
+                model_field = None
+            if field.source != name or model_field is None or not model_field.concrete or model_field.many_to_many:
+                raise NotCompilable(f'{type(serializer).__name__}.{name}')
+            path = prefix + name
+            self.paths.append(path)
+            if isinstance(field, serializers.ModelSerializer):
+                getters.append((name, self.get_nested_getter(path, self.compile(field, path + '__'))))
+            elif type(field) in PLAIN_FIELDS and getattr(field, 'pk_field', None) is None:
+                getters.append((name, self.get_plain_getter(path)))
+            elif type(field) is serializers.DateTimeField:
+                getters.append((name, self.get_datetime_getter(path, field)))
+            elif type(field) in CONVERTED_FIELDS:
+                getters.append((name, self.get_converted_getter(path, field.to_representation)))
+            else:
+                raise NotCompilable(f'{type(serializer).__name__}.{name}')
+
+        def to_representation(row, tz):
+            return {name: getter(row, tz) for name, getter in getters}
+        return to_representation
+
+    @staticmethod
+    def get_plain_getter(path):
+        def getter(row, tz):
+            return row[path]
+        return getter
+
+    @staticmethod
+    def get_converted_getter(path, convert):
+        def getter(row, tz):
+            value = row[path]
+            return None if value is None else convert(value)
+        return getter
+
+    @staticmethod
+    def get_datetime_getter(path, field):
+        output_format = getattr(field, 'format', api_settings.DATETIME_FORMAT)
+        if output_format is None or output_format.lower() != ISO_8601 or hasattr(field, 'timezone'):
+            return Projection.get_converted_getter(path, field.to_representation)
+
+        def getter(row, tz):
+            value = row[path]
+            if value is None:
+                return None
+            if tz is None or value.tzinfo is None:
+                return field.to_representation(value)
+            # What `DateTimeField.to_representation()` returns for an aware datetime.
+            value = value.astimezone(tz).isoformat()
+            return value[:-6] + 'Z' if value.endswith('+00:00') else value
+        return getter
+
+    @staticmethod
+    def get_nested_getter(path, to_representation):
+        # `path` holds the foreign key, a missing relation is `None` like with the serializer.
+        def getter(row, tz):
+            return None if row[path] is None else to_representation(row, tz)
+        return getter
+
+    def represent(self, rows):
+        with timed('serialize'):
+            tz = timezone.get_current_timezone() if settings.USE_TZ else None
+            to_representation = self.to_representation
+            return [to_representation(row, tz) for row in rows]
+
+
+@lru_cache(maxsize=256)
+def get_projection(serializer_class, fields=None, expand=None):
+    '''
+    :returns: the `Projection` of `serializer_class` for the `fields` and `expand` query parameters,
+        or `None` if the serializer cannot be compiled.
+    '''
+    if issubclass(serializer_class, ExpandableFieldsMixin):
+        serializer = serializer_class(fields=parse_field_tree(fields), expand=parse_field_tree(expand))
+    else:
+        serializer = serializer_class()
+    try:
+        return Projection(serializer)
+    except NotCompilable:
+        return None
+
+
+class CompiledListMixin:
+    '''
+    View mixin serving the pages of a list view through the compiled `Projection` of its serializer: the page is
+    fetched with `values()` and represented without model instances.
+    Only for `KeysetCursorPagination` lists, and only while `PROJECT_COMPILED_LISTS` is on. Serializers that cannot
+    be compiled use `get_list_response()` as before.
+    '''
+    def get_projection(self):
+        if not settings.PROJECT_COMPILED_LISTS or not isinstance(self.paginator, KeysetCursorPagination):
+            return None
+        params = self.request.query_params
+        return get_projection(self.get_serializer_class(), params.get('fields'), params.get('expand'))
+
+    def get_list_response(self, queryset):
+        projection = self.get_projection()
+        if projection is None:
+            return super().get_list_response(queryset)
+        rows = self.paginator.paginate_queryset(queryset, self.request, view=self, values=projection.paths)
+        if rows is None:
+            return Response(projection.represent(queryset.values(*projection.paths)))
+        return self.get_paginated_response(projection.represent(rows))
+
+    async def aget_list_response(self, queryset):
+        projection = self.get_projection()
+        if projection is None:
+            return await super().aget_list_response(queryset)
+        rows = await self.paginator.apaginate_queryset(queryset, self.request, view=self, values=projection.paths)
+        if rows is None:
+            return Response(projection.represent([row async for row in queryset.values(*projection.paths)]))
+        return self.get_paginated_response(projection.represent(rows))
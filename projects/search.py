@@ -0,0 +1,192 @@
+import re
+
+from django.db import connection
+
+from .pagination import KeysetCursorPagination
+
+SEARCH_TABLE = 'projects_search'
+KIND_TASK = 'task'
+KIND_COMMENT = 'comment'
+
+# bm25() column weights: kind, object_id, task_id and project do not count, a title match counts 10 times a body match.
+BM25_WEIGHTS = '0.0, 0.0, 0.0, 0.0, 10.0, 1.0'
+SCORE = f'bm25({SEARCH_TABLE}, {BM25_WEIGHTS})'
+
+# Tasks and comments share the table, their rowids are `2 * id` and `2 * id + 1`.
+TASK_ROWID = '{id} * 2'
+COMMENT_ROWID = '{id} * 2 + 1'
+
+REINDEX_SQL = [
+    f'DELETE FROM {SEARCH_TABLE}',
+    f'''
+    INSERT INTO {SEARCH_TABLE} (rowid, kind, object_id, task_id, project, title, body)
+    SELECT {TASK_ROWID.format(id='id')}, '{KIND_TASK}', id, id, 'p' || project_id, title, description
+    FROM projects_task
+    ''',
+    f'''
+    INSERT INTO {SEARCH_TABLE} (rowid, kind, object_id, task_id, project, title, body)
+    SELECT {COMMENT_ROWID.format(id='c.id')}, '{KIND_COMMENT}', c.id, c.task_id, 'p' || t.project_id, '', c.content
+    FROM projects_comment c INNER JOIN projects_task t ON t.id = c.task_id
+    ''',
+    f"INSERT INTO {SEARCH_TABLE} ({SEARCH_TABLE}) VALUES ('optimize')",
+]
+
+TERM_RE = re.compile(r'\w+\*?')
+
+
+def is_enabled():
+    '''
+    The search index is an SQLite FTS5 table, other databases have no index and no search.
+    '''
+    return connection.vendor == 'sqlite'
+
+
+def _write(sql, params):
+    if is_enabled():
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+
+
+def index_task(task):
+    _write(
+        f'INSERT OR REPLACE INTO {SEARCH_TABLE} (rowid, kind, object_id, task_id, project, title, body) '
+        f"VALUES ({TASK_ROWID.format(id='%s')}, %s, %s, %s, %s, %s, %s)",
+        [task.pk, KIND_TASK, task.pk, task.pk, f'p{task.project_id}', task.title, task.description],
+    )
+
+
+def index_tasks(tasks):
+    '''
+    Index many new tasks with one `executemany()`.
+    '''
+    if is_enabled() and tasks:
+        with connection.cursor() as cursor:
+            cursor.executemany(
+                f'INSERT OR REPLACE INTO {SEARCH_TABLE} (rowid, kind, object_id, task_id, project, title, body) '
+                f"VALUES ({TASK_ROWID.format(id='%s')}, %s, %s, %s, %s, %s, %s)",
+                [[task.pk, KIND_TASK, task.pk, task.pk, f'p{task.project_id}', task.title, task.description] for task in tasks],
+            )
+
+
+def index_comment(comment, project_id):
+    _write(
+        f'INSERT OR REPLACE INTO {SEARCH_TABLE} (rowid, kind, object_id, task_id, project, title, body) '
+        f"VALUES ({COMMENT_ROWID.format(id='%s')}, %s, %s, %s, %s, '', %s)",
+        [comment.pk, KIND_COMMENT, comment.pk, comment.task_id, f'p{project_id}', comment.content],
+    )
+
+
+def remove_comment(comment_id):
+    _write(f"DELETE FROM {SEARCH_TABLE} WHERE rowid = {COMMENT_ROWID.format(id='%s')}", [comment_id])
+
+
+def remove_project(project_id):
+    '''
+    Remove every task and comment of a project with one statement, through the indexed `project` column.
+    '''
+    _write(f'DELETE FROM {SEARCH_TABLE} WHERE {SEARCH_TABLE} MATCH %s', [f'project : p{int(project_id)}'])
+
+
+def remove_tasks(tasks):
+    '''
+    Remove the tasks of the queryset `tasks` and their comments with one statement. Call it before they are deleted,
+    the comments are found through their table.
+    '''
+    if not is_enabled():
+        return
+    sql, params = tasks.values('pk').query.sql_with_params()
+    _write(
+        f'DELETE FROM {SEARCH_TABLE} WHERE rowid IN ('
+        f"SELECT {TASK_ROWID.format(id='id')} FROM projects_task WHERE id IN ({sql}) UNION ALL "
+        f"SELECT {COMMENT_ROWID.format(id='id')} FROM projects_comment WHERE task_id IN ({sql}))",
+        [*params, *params],
+    )
+
+
+def reindex():
+    '''
+    Rebuild the whole index from the task and comment tables with set-based `INSERT ... SELECT` statements.
+    :returns: number of indexed rows.
+    '''
+    with connection.cursor() as cursor:
+        for sql in REINDEX_SQL:
+            cursor.execute(sql)
+        cursor.execute(f'SELECT COUNT(*) FROM {SEARCH_TABLE}')
+        return cursor.fetchone()[0]
+
+
+def build_match_expression(query, project_ids):
+    '''
+    Turn free text into an FTS5 expression: every word must match the title or the body (a trailing `*` makes
+    it a prefix), and the row must belong to one of `project_ids`. Words are quoted, so FTS5 operators and
+    punctuation in the user's query are searched for literally instead of being interpreted.
+    :returns: the expression, or `None` if the query has no words.
+    '''
+    terms = []
+    for term in TERM_RE.findall(query):
+        word, prefix = term.rstrip('*'), term.endswith('*')
+        terms.append(f'"{word}"' + ('*' if prefix else ''))
+    if not terms or not project_ids:
+        return None
+    projects = ' OR '.join(f'p{int(project_id)}' for project_id in project_ids)
+    return f'project : ({projects}) AND {{title body}} : ({" ".join(terms)})'
+
+
+def search(query, project_ids, limit, after=None, reverse=False):
+    '''
+    Return up to `limit` matches of `query` in `project_ids`, best first (lowest bm25 score), following the
+    `(score, rowid)` keyset position `after` (backwards with `reverse`).
+    :returns: list of dicts with `score`, `rowid`, `type`, `id`, `task`, `project`, `title` and `snippet`.
+    '''
+    match = build_match_expression(query, project_ids)
+    if match is None or not is_enabled():
+        return []
+
+    comparison, direction = ('<', 'DESC') if reverse else ('>', 'ASC')
+    sql = [
+        f"SELECT {SCORE}, rowid, kind, object_id, task_id, substr(project, 2),",
+        # Comments are indexed without a title, so they do not rank on it; their task's title is read here.
+        f"CASE kind WHEN '{KIND_COMMENT}' THEN (SELECT t.title FROM projects_task t WHERE t.id = task_id) ELSE title END,",
+        f"snippet({SEARCH_TABLE}, 5, '[', ']', '...', 16)",
+        f'FROM {SEARCH_TABLE} WHERE {SEARCH_TABLE} MATCH %s',
+    ]
+    params = [match]
+    if after is not None:
+        sql.append(f'AND ({SCORE} {comparison} %s OR ({SCORE} = %s AND rowid {comparison} %s))')
+        params += [after[0], after[0], after[1]]
+    sql.append(f'ORDER BY 1 {direction}, 2 {direction} LIMIT %s')
+    params.append(limit)
+
+    with connection.cursor() as cursor:
+        cursor.execute(' '.join(sql), params)
+        rows = cursor.fetchall()
+    return [
+        {
+            'score': score, 'rowid': rowid, 'type': kind, 'id': object_id, 'task': task_id,
+            'project': int(project), 'title': title, 'snippet': snippet,
+        }
+        for score, rowid, kind, object_id, task_id, project, title, snippet in rows
+    ]
+
+
+class SearchCursorPagination(KeysetCursorPagination):
+    '''
+    Keyset pagination over the `(score, rowid)` order of search results, with the same cursors and
+    `next`/`previous` links as the list endpoints.
+    '''
+    ordering = ('score', 'rowid')
+
+    def paginate_search(self, query, project_ids, request):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.base_url = self.get_base_url(request)
+        self.count = None
+
+        self.cursor = self.decode_cursor(request)
+        reverse = self.cursor is not None and self.cursor.reverse
+        position = self.cursor.position if self.cursor is not None else None
+        results = search(query, project_ids, self.page_size + 1, position, reverse)
+        return self.set_page(results, reverse)
+
+    def parse_position(self, position):
+        return [float(position[0]), int(position[1])]
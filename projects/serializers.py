@@ -1,62 +1,283 @@
+from functools import lru_cache
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
 from django.utils import timezone
 from rest_framework import serializers
+from . import search, stats
+from .cache import bump_project_generations
+from .filters import TaskFilterBackend
 from .models import *
 from users.serializers import UserSerializer
 
-class ProjectSerializer(serializers.ModelSerializer):
+
+def parse_field_tree(value):
+    '''
+    Parse a comma separated list of dotted field paths into a nested dict.
+    For example `id,title,project.owner` becomes `{'id': {}, 'title': {}, 'project': {'owner': {}}}`.
+    '''
+    tree = {}
+    for path in (value or '').split(','):
+        node = tree
+        for part in path.strip().split('.'):
+            if part:
+                node = node.setdefault(part, {})
+    return tree
+
+
+class ExpandableFieldsMixin:
+    '''
+    Lets clients shape a response with the `fields` and `expand` query parameters.
+    - **fields**: only return the listed fields, e.g. `?fields=id,title`. Dotted paths such as
+      `project.name` restrict the fields of an expanded relation. Request bodies are validated in full.
+    - **expand**: embed the listed relations as nested objects, e.g. `?expand=project.owner,assigned_to`.
+    Relations declared in `Meta.expandable_fields` are returned as primary keys unless expanded.
+    Nested serializers receive their part of the trees through the `fields` and `expand` keyword arguments.
+    '''
+    def __init__(self, *args, **kwargs):
+        self._fields_tree = kwargs.pop('fields', None)
+        self._expand_tree = kwargs.pop('expand', None)
+        super().__init__(*args, **kwargs)
+
+    @classmethod
+    def get_request_trees(cls, request):
+        '''
+        Return the `(fields, expand)` trees requested in the query string of `request`.
+        '''
+        params = getattr(request, 'query_params', None) or {}
+        return parse_field_tree(params.get('fields')), parse_field_tree(params.get('expand'))
+
+    @classmethod
+    def get_select_related(cls, expand_tree, prefix=''):
+        '''
+        Return the `select_related()` lookups needed to serialize the relations in `expand_tree`
+        without issuing a query per row.
+        '''
+        lookups = []
+        for name, sub_tree in expand_tree.items():
+            serializer_class = cls.Meta.expandable_fields.get(name)
+            if serializer_class is None:
+                continue
+            lookup = prefix + name
+            nested = []
+            if issubclass(serializer_class, ExpandableFieldsMixin):
+                nested = serializer_class.get_select_related(sub_tree, lookup + '__')
+            lookups.extend(nested or [lookup])
+        return lookups
+
+    @classmethod
+    def get_expanded_relations(cls, expand_tree, prefix=''):
+        '''
+        Return the `(lookup, model)` of every relation embedded for `expand_tree`, nested ones included,
+        e.g. `[('task', Task), ('task__project', Project)]` for `task.project`.
+        '''
+        relations = []
+        for name, sub_tree in expand_tree.items():
+            serializer_class = cls.Meta.expandable_fields.get(name)
+            if serializer_class is None:
+                continue
+            lookup = prefix + name
+            relations.append((lookup, serializer_class.Meta.model))
+            if issubclass(serializer_class, ExpandableFieldsMixin):
+                relations.extend(serializer_class.get_expanded_relations(sub_tree, lookup + '__'))
+        return relations
+
+    @classmethod
+    def expand_queryset(cls, queryset, request):
+        '''
+        Shortcut for views: join the relations required by the request's `expand` parameter.
+        Note that an empty `select_related()` would follow every foreign key, so it is skipped.
+        '''
+        fields_tree, expand_tree = cls.get_request_trees(request)
+        validate_fields_tree(cls, fields_tree, expand_tree)
+        lookups = cls.get_select_related(expand_tree)
+        return queryset.select_related(*lookups) if lookups else queryset
+
+    def get_field_trees(self):
+        fields_tree, expand_tree = self._fields_tree, self._expand_tree
+        if fields_tree is None or expand_tree is None:
+            request_fields, request_expand = self.get_request_trees(self.context.get('request'))
+            fields_tree = request_fields if fields_tree is None else fields_tree
+            expand_tree = request_expand if expand_tree is None else expand_tree
+        return fields_tree, expand_tree
+
+    def get_fields(self):
+        fields = super().get_fields()
+        fields_tree, expand_tree = self.get_field_trees()
+
+        for name, serializer_class in self.Meta.expandable_fields.items():
+            if name in fields and name in expand_tree:
+                fields[name] = self.build_expanded_field(
+                    serializer_class, fields_tree.get(name, {}), expand_tree[name]
+                )
+
+        return fields
+
+    @property
+    def _readable_fields(self):
+        # `fields` only shapes the output: writes still validate and save every writable field.
+        fields_tree = self.get_field_trees()[0]
+        for field in super()._readable_fields:
+            if not fields_tree or field.field_name in fields_tree:
+                yield field
+
+    @staticmethod
+    def build_expanded_field(serializer_class, fields_tree, expand_tree):
+        if issubclass(serializer_class, ExpandableFieldsMixin):
+            return serializer_class(read_only=True, fields=fields_tree, expand=expand_tree)
+        serializer = serializer_class(read_only=True)
+        if fields_tree:
+            for name in set(serializer.fields) - set(fields_tree):
+                serializer.fields.pop(name)
+        return serializer
+
+
+@lru_cache(maxsize=None)
+def get_readable_field_names(serializer_class):
+    if issubclass(serializer_class, ExpandableFieldsMixin):
+        serializer = serializer_class(fields={}, expand={})
+    else:
+        serializer = serializer_class()
+    return tuple(name for name, field in serializer.fields.items() if not field.write_only)
+
+
+def validate_fields_tree(serializer_class, fields_tree, expand_tree, prefix=''):
+    '''
+    Reject the names of the `fields` parameter that `serializer_class` does not return, including the nested names
+    of expanded relations, instead of answering with empty objects.
+    :raises ValidationError: listing the unknown names and the valid ones.
+    '''
+    names = get_readable_field_names(serializer_class)
+    unknown = [prefix + name for name in fields_tree if name not in names]
+    if unknown:
+        raise serializers.ValidationError({'fields': [
+            f"Unknown fields: {', '.join(unknown)}. Choose from: {', '.join(prefix + name for name in names)}."
+        ]})
+    expandable_fields = getattr(serializer_class.Meta, 'expandable_fields', {})
+    for name, sub_tree in fields_tree.items():
+        if sub_tree and name in expand_tree and name in expandable_fields:
+            validate_fields_tree(expandable_fields[name], sub_tree, expand_tree[name], f'{prefix}{name}.')
+
+
+class ProjectSerializer(ExpandableFieldsMixin, serializers.ModelSerializer):
     '''
     This serializer converts `Project` model instances into JSON format and validates incoming data
     to ensure it meets the requirements of the `Project` model.
     '''
-    owner = UserSerializer(read_only=True)
-
     def create(self, validated_data):
         request = self.context.get('request')
         if not request or not hasattr(request, 'user'):
             raise serializers.ValidationError("Request context with a valid user is required.")
         validated_data['owner'] = request.user
         return super().create(validated_data)
-    
+
     class Meta:
         model = Project
-        fields = ['id', 'name', 'description', 'owner', 'created_at']
+        fields = ['id', 'name', 'description', 'owner', 'created_at', 'updated_at']
+        read_only_fields = ['owner']
+        expandable_fields = {'owner': UserSerializer}
 
 
-class ProjectMemberSerializer(serializers.ModelSerializer):
-    project = ProjectSerializer(read_only=True)
-    user = UserSerializer(read_only=True)
+class ProjectMemberSerializer(ExpandableFieldsMixin, serializers.ModelSerializer):
 
     class Meta:
         model = ProjectMember
         fields = ['id', 'project', 'user', 'role']
+        read_only_fields = ['project', 'user']
+        expandable_fields = {'project': ProjectSerializer, 'user': UserSerializer}
 
 
-class TaskSerializer(serializers.ModelSerializer):
-    assigned_to = UserSerializer(read_only=True)
-    project = ProjectSerializer(read_only=True)
+class TaskListSerializer(serializers.ListSerializer):
+    '''
+    Creates a list of tasks with batched `INSERT` statements inside a single transaction,
+    instead of one query and one transaction per task.
+    '''
+    batch_size = 100
+
+    def create(self, validated_data):
+        tasks = [Task(**attrs) for attrs in validated_data]
+        with transaction.atomic():
+            tasks = Task.objects.bulk_create(tasks, batch_size=self.batch_size)
+            # `bulk_create()` sends no signals, update the stats, the search index and the cached task lists explicitly.
+            stats.task_created(*tasks)
+            search.index_tasks(tasks)
+            bump_project_generations(*{task.project_id for task in tasks})
+        return tasks
+
+
+class TaskSerializer(ExpandableFieldsMixin, serializers.ModelSerializer):
 
     def create(self, validated_data):
         request = self.context.get('request')
         if not request or not hasattr(request, 'user'):
             raise serializers.ValidationError("Request context with a valid user is required.")
         return super().create(validated_data)
-    
+
     class Meta:
         model = Task
         fields = [
-            'id', 'title', 'description', 'status', 'priority', 
-            'assigned_to', 'project', 'created_at', 'due_date'
+            'id', 'title', 'description', 'status', 'priority',
+            'assigned_to', 'project', 'created_at', 'updated_at', 'due_date'
         ]
+        read_only_fields = ['assigned_to', 'project']
+        expandable_fields = {'assigned_to': UserSerializer, 'project': ProjectSerializer}
+        list_serializer_class = TaskListSerializer
 
 
-class CommentSerializer(serializers.ModelSerializer):
+class CommentSerializer(ExpandableFieldsMixin, serializers.ModelSerializer):
     """
     Serializer for the Comment model.
     This serializer handles the conversion of Comment objects to and from JSON format.
     """
-    user = UserSerializer(read_only=True)
-    task = TaskSerializer(read_only=True)
-
     class Meta:
         model = Comment
-        fields = ['id', 'content', 'user', 'task', 'created_at']
+        fields = ['id', 'content', 'user', 'task', 'created_at', 'updated_at']
+        read_only_fields = ['user', 'task']
+        expandable_fields = {'user': UserSerializer, 'task': TaskSerializer}
+
+
+class TaskChangesSerializer(serializers.ModelSerializer):
+    '''
+    The set of field changes applied by a bulk task update. Every field is optional,
+    but at least one has to be given.
+    '''
+    assigned_to = serializers.PrimaryKeyRelatedField(queryset=get_user_model().objects.all(), allow_null=True, required=False)
+
+    class Meta:
+        model = Task
+        fields = ['status', 'priority', 'assigned_to', 'due_date']
+        extra_kwargs = {field: {'required': False} for field in fields}
+
+    def validate(self, attrs):
+        if not attrs:
+            raise serializers.ValidationError("At least one field to change is required.")
+        return attrs
+
+
+class TaskBulkUpdateSerializer(serializers.Serializer):
+    '''
+    Validates a bulk task update: the tasks to change, selected by `ids` and/or a `filter`
+    (`project` plus any task list filter), and the `changes` to apply to all of them.
+    '''
+    ids = serializers.ListField(child=serializers.IntegerField(min_value=1), required=False, allow_empty=False, max_length=10000)
+    filter = serializers.DictField(required=False, allow_empty=False)
+    changes = TaskChangesSerializer()
+
+    def validate_filter(self, value):
+        filter_names = ['project', *TaskFilterBackend.get_filter_names()]
+        unknown = set(value) - set(filter_names)
+        if unknown:
+            raise serializers.ValidationError(f"Unknown filters: {', '.join(sorted(unknown))}.")
+        if 'project' in value and not str(value['project']).isdigit():
+            raise serializers.ValidationError({'project': "A valid project id is required."})
+        lookups, errors = TaskFilterBackend().get_lookups(value)
+        if errors:
+            raise serializers.ValidationError(errors)
+        if 'project' in value:
+            lookups['project'] = int(value['project'])
+        return lookups
+
+    def validate(self, attrs):
+        if 'ids' not in attrs and 'filter' not in attrs:
+            raise serializers.ValidationError("Either `ids` or `filter` is required to select the tasks.")
+        return attrs
@@ -0,0 +1,238 @@
+from django.contrib.auth import get_user_model
+from django.db.models import QuerySet
+from django.db.models.signals import post_delete, post_init, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from .access import ProjectAccessResolver
+from . import search, stats
+from .cache import bump_project_generations, bump_users_generation
+from .models import Comment, Project, ProjectMember, Task
+from users.serializers import UserSerializer
+
+# The user fields embedded by `expand`. `last_login` is left out: every login would drop the cached expanded lists,
+# and the buffered `last_login` writes (see `users/last_login.py`) reach the database without signals anyway.
+EMBEDDED_USER_FIELDS = [field for field in UserSerializer.Meta.fields if field != 'last_login']
+
+
+@receiver(pre_save, sender=Project)
+@receiver(pre_save, sender=ProjectMember)
+def remember_previous_user(sender, instance, **kwargs):
+    '''
+    Remember who owned the project (or held the membership) before the save, so a transfer
+    invalidates the access map of the previous user as well.
+    '''
+    field = 'owner_id' if sender is Project else 'user_id'
+    if instance.pk is not None and not instance._state.adding:
+        instance._previous_user_id = sender.objects.filter(pk=instance.pk).values_list(field, flat=True).first()
+
+
+@receiver(post_save, sender=Project)
+@receiver(post_delete, sender=Project)
+def invalidate_owner_access(sender, instance, **kwargs):
+    ProjectAccessResolver.invalidate(instance.owner_id, getattr(instance, '_previous_user_id', None))
+
+
+@receiver(post_save, sender=ProjectMember)
+@receiver(post_delete, sender=ProjectMember)
+def invalidate_member_access(sender, instance, **kwargs):
+    ProjectAccessResolver.invalidate(instance.user_id, getattr(instance, '_previous_user_id', None))
+
+
+def get_delete_cascade(origin):
+    '''
+    Return what the delete started by `origin` (the instance or queryset `delete()` was called on) removes, as
+    `{'projects': set of ids, 'tasks': set of ids, 'counted': bool, 'unindexed': bool}`, filled by the `pre_delete`
+    receivers. Django sends every `pre_delete` of a cascade before the first row is deleted, so the `post_delete`
+    receivers of comments and tasks see whether their task or project goes too, and skip the per-row work the parent
+    already does once.
+    '''
+    cascade = getattr(origin, '_delete_cascade', None)
+    if cascade is None:
+        cascade = {'projects': set(), 'tasks': set(), 'counted': False, 'unindexed': False}
+        if origin is not None:
+            origin._delete_cascade = cascade
+    return cascade
+
+
+@receiver(pre_delete, sender=Project)
+def remember_deleted_project(sender, instance, origin=None, **kwargs):
+    get_delete_cascade(origin)['projects'].add(instance.pk)
+
+
+@receiver(pre_delete, sender=Task)
+def remember_deleted_task(sender, instance, origin=None, **kwargs):
+    get_delete_cascade(origin)['tasks'].add(instance.pk)
+
+
+@receiver(post_save, sender=Project)
+@receiver(post_delete, sender=Project)
+def bump_project_generation(sender, instance, **kwargs):
+    bump_project_generations(instance.pk)
+
+
+@receiver(post_save, sender=Task)
+@receiver(post_save, sender=ProjectMember)
+@receiver(post_delete, sender=ProjectMember)
+def bump_related_project_generation(sender, instance, **kwargs):
+    bump_project_generations(instance.project_id)
+
+
+@receiver(post_delete, sender=Task)
+def bump_deleted_task_project_generation(sender, instance, origin=None, **kwargs):
+    if instance.project_id not in get_delete_cascade(origin)['projects']:
+        bump_project_generations(instance.project_id)
+
+
+@receiver(post_save, sender=Comment)
+def bump_comment_project_generation(sender, instance, **kwargs):
+    bump_project_generations(get_comment_project_id(instance))
+
+
+@receiver(post_delete, sender=Comment)
+def bump_deleted_comment_project_generation(sender, instance, origin=None, **kwargs):
+    # Deleted with its task: the task bumps the project (or the project itself does), without a query per comment.
+    if instance.task_id not in get_delete_cascade(origin)['tasks']:
+        bump_project_generations(get_comment_project_id(instance))
+
+
+def get_comment_project_id(comment):
+    '''
+    Return the project of a comment without a query when the view already loaded it, and remember it.
+    '''
+    project_id = getattr(comment, 'task_project_id', None)
+    if project_id is None and Comment.task.is_cached(comment):
+        project_id = comment.task.project_id
+    if project_id is None:
+        project_id = Task.objects.filter(pk=comment.task_id).values_list('project_id', flat=True).first()
+    comment.task_project_id = project_id
+    return project_id
+
+
+@receiver(post_init, sender=get_user_model())
+def remember_embedded_user_values(sender, instance, **kwargs):
+    '''
+    Remember the fields `expand` embeds of a user as loaded, to only drop the cached lists when they change.
+    Users loaded with deferred fields are not compared.
+    '''
+    if all(field in instance.__dict__ for field in EMBEDDED_USER_FIELDS):
+        instance._embedded_values = get_embedded_user_values(instance)
+
+
+def get_embedded_user_values(user):
+    return [user.__dict__[field] for field in EMBEDDED_USER_FIELDS]
+
+
+@receiver(post_save, sender=get_user_model())
+def bump_user_generation(sender, instance, created, update_fields=None, **kwargs):
+    '''
+    Bump the users generation when a save changes what `expand` embeds of an existing user. Signups are not
+    embedded anywhere yet, and saves of other fields (e.g. `last_login`, the password) change nothing.
+    '''
+    previous = getattr(instance, '_embedded_values', None)
+    if not created and (update_fields is None or set(update_fields) & set(EMBEDDED_USER_FIELDS)):
+        if previous is None or previous != get_embedded_user_values(instance):
+            bump_users_generation()
+    if previous is not None or created:
+        instance._embedded_values = get_embedded_user_values(instance)
+
+
+@receiver(post_delete, sender=get_user_model())
+def bump_deleted_user_generation(sender, instance, **kwargs):
+    bump_users_generation()
+
+
+@receiver(pre_delete, sender=get_user_model())
+def bump_assigned_project_generations(sender, instance, **kwargs):
+    '''
+    Deleting a user unassigns their tasks with an `UPDATE` that sends no signals.
+    '''
+    bump_project_generations(*Task.objects.filter(assigned_to=instance).values_list('project_id', flat=True).distinct())
+
+
+@receiver(post_init, sender=Task)
+def remember_task_stat_values(sender, instance, **kwargs):
+    '''
+    Remember the counted values of a task as loaded, to move it between the stats counters when it is saved.
+    Deferred fields are skipped here and read in `pre_save` instead.
+    '''
+    if all(field in instance.__dict__ for field in stats.TRACKED_FIELDS):
+        instance._stat_values = {field: instance.__dict__[field] for field in stats.TRACKED_FIELDS}
+
+
+@receiver(pre_save, sender=Task)
+def load_task_stat_values(sender, instance, **kwargs):
+    if not instance._state.adding and not hasattr(instance, '_stat_values'):
+        instance._stat_values = Task.objects.filter(pk=instance.pk).values(*stats.TRACKED_FIELDS).first()
+
+
+@receiver(post_save, sender=Task)
+def update_task_stats(sender, instance, created, **kwargs):
+    previous = getattr(instance, '_stat_values', None)
+    if created or previous is None:
+        stats.task_created(instance)
+    else:
+        stats.task_changed(previous, instance)
+    instance._stat_values = stats.get_task_values(instance)
+
+
+@receiver(pre_delete, sender=Task)
+def remove_deleted_tasks_stats(sender, instance, origin=None, **kwargs):
+    '''
+    A `delete()` on a queryset of tasks takes them all off the counters at its first task, with grouped queries.
+    '''
+    cascade = get_delete_cascade(origin)
+    if isinstance(origin, QuerySet) and origin.model is Task and not cascade['counted']:
+        stats.tasks_deleted(origin)
+        cascade['counted'] = True
+
+
+@receiver(post_delete, sender=Task)
+def remove_task_stats(sender, instance, origin=None, **kwargs):
+    cascade = get_delete_cascade(origin)
+    # Tasks are only cascaded from their project, whose counters are deleted with it.
+    if not cascade['counted'] and instance.project_id not in cascade['projects']:
+        stats.task_deleted(getattr(instance, '_stat_values', None) or stats.get_task_values(instance))
+
+
+@receiver(pre_delete, sender=get_user_model())
+def unassign_task_stats(sender, instance, **kwargs):
+    '''
+    Deleting a user unassigns their tasks with an `UPDATE` that sends no signals.
+    '''
+    stats.tasks_updated(Task.objects.filter(assigned_to=instance), {'assigned_to': None})
+
+
+@receiver(post_save, sender=Task)
+def index_task(sender, instance, **kwargs):
+    search.index_task(instance)
+
+
+@receiver(pre_delete, sender=Project)
+def remove_project_from_index(sender, instance, **kwargs):
+    search.remove_project(instance.pk)
+
+
+@receiver(pre_delete, sender=Task)
+def remove_tasks_from_index(sender, instance, origin=None, **kwargs):
+    '''
+    Tasks deleted themselves leave the index with their comments, once per `delete()` call. Tasks cascaded
+    from their project already left it with the project.
+    '''
+    cascade = get_delete_cascade(origin)
+    if isinstance(origin, QuerySet) and origin.model is Task and not cascade['unindexed']:
+        search.remove_tasks(origin)
+        cascade['unindexed'] = True
+    elif origin is instance:
+        search.remove_tasks(Task.objects.filter(pk=instance.pk))
+
+
+@receiver(post_save, sender=Comment)
+def index_comment(sender, instance, **kwargs):
+    search.index_comment(instance, get_comment_project_id(instance))
+
+
+@receiver(post_delete, sender=Comment)
+def remove_comment_from_index(sender, instance, origin=None, **kwargs):
+    # Deleted with its task: already removed with the task or its project.
+    if instance.task_id not in get_delete_cascade(origin)['tasks']:
+        search.remove_comment(instance.pk)
@@ -0,0 +1,165 @@
+from collections import Counter
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F
+from django.utils import timezone
+
+from .models import ProjectTaskStat, Task
+
+DIMENSION_TOTAL = 'total'
+DIMENSION_STATUS = 'status'
+DIMENSION_PRIORITY = 'priority'
+DIMENSION_ASSIGNEE = 'assigned_to'
+
+# Task fields counted by each dimension, `total` counts every task.
+DIMENSION_FIELDS = {DIMENSION_STATUS: 'status', DIMENSION_PRIORITY: 'priority', DIMENSION_ASSIGNEE: 'assigned_to_id'}
+TRACKED_FIELDS = ['project_id', *DIMENSION_FIELDS.values()]
+
+OPEN_STATUSES = ['To Do', 'In Progress']
+
+
+def get_stat_value(value):
+    return '' if value is None else str(value)
+
+
+def get_task_keys(values):
+    '''
+    Return the `(project_id, dimension, value)` counters a task with the given `TRACKED_FIELDS` values counts towards.
+    '''
+    keys = [(values['project_id'], DIMENSION_TOTAL, '')]
+    keys += [(values['project_id'], dimension, get_stat_value(values[field])) for dimension, field in DIMENSION_FIELDS.items()]
+    return keys
+
+
+def get_task_values(task):
+    return {field: getattr(task, field) for field in TRACKED_FIELDS}
+
+
+def apply_deltas(deltas):
+    '''
+    Add `deltas` (`{(project_id, dimension, value): delta}`) to the stored counters with `F()` increments,
+    creating the missing counters.
+    '''
+    for (project_id, dimension, value), delta in deltas.items():
+        if not delta:
+            continue
+        counters = ProjectTaskStat.objects.filter(project_id=project_id, dimension=dimension, value=value)
+        if counters.update(count=F('count') + delta) or delta < 0:
+            continue
+        try:
+            with transaction.atomic():
+                ProjectTaskStat.objects.create(project_id=project_id, dimension=dimension, value=value, count=delta)
+        except IntegrityError:
+            # Created concurrently in the meantime.
+            counters.update(count=F('count') + delta)
+
+
+def task_created(*tasks):
+    apply_deltas(Counter(key for task in tasks for key in get_task_keys(get_task_values(task))))
+
+
+def task_changed(previous, task):
+    '''
+    Move a saved task from the counters of its `previous` values to the counters of its current values.
+    '''
+    deltas = Counter(get_task_keys(get_task_values(task)))
+    deltas.subtract(get_task_keys(previous))
+    apply_deltas(deltas)
+
+
+def task_deleted(values):
+    deltas = Counter()
+    deltas.subtract(get_task_keys(values))
+    apply_deltas(deltas)
+
+
+def tasks_deleted(queryset):
+    '''
+    Take the tasks of `queryset` off the counters before they are deleted together, with one grouped query per
+    dimension instead of one set of updates per task. Call it in the same transaction as the delete.
+    '''
+    deltas = Counter()
+    deltas.subtract(count_tasks(queryset))
+    apply_deltas(deltas)
+
+
+def tasks_updated(queryset, changes):
+    '''
+    Move the tasks of `queryset` to the counters of `changes` before a set-based `queryset.update(**changes)`,
+    which sends no signals. Costs one grouped query per changed dimension.
+    Call it in the same transaction as the update.
+    '''
+    deltas = Counter()
+    for dimension, field in DIMENSION_FIELDS.items():
+        # Dimensions are named after the task fields they count.
+        if dimension not in changes:
+            continue
+        new_value = get_stat_value(getattr(changes[dimension], 'pk', changes[dimension]))
+        for row in queryset.order_by().values('project_id', field).annotate(count=Count('id')):
+            deltas[(row['project_id'], dimension, get_stat_value(row[field]))] -= row['count']
+            deltas[(row['project_id'], dimension, new_value)] += row['count']
+    apply_deltas(deltas)
+
+
+def count_tasks(queryset):
+    '''
+    Count the tasks of `queryset` from scratch.
+    :returns: `{(project_id, dimension, value): count}`
+    '''
+    counts = Counter()
+    for row in queryset.order_by().values('project_id').annotate(count=Count('id')):
+        counts[(row['project_id'], DIMENSION_TOTAL, '')] = row['count']
+    for dimension, field in DIMENSION_FIELDS.items():
+        for row in queryset.order_by().values('project_id', field).annotate(count=Count('id')):
+            counts[(row['project_id'], dimension, get_stat_value(row[field]))] = row['count']
+    return counts
+
+
+def get_stored_counts(project_ids=None):
+    queryset = ProjectTaskStat.objects.exclude(count=0)
+    if project_ids is not None:
+        queryset = queryset.filter(project_id__in=project_ids)
+    return {(row.project_id, row.dimension, row.value): row.count for row in queryset}
+
+
+def rebuild(project_ids=None):
+    '''
+    Replace the stored counters of `project_ids` (every project by default) with counts computed from the tasks.
+    :returns: number of counters written.
+    '''
+    tasks = Task.objects.all()
+    counters = ProjectTaskStat.objects.all()
+    if project_ids is not None:
+        tasks = tasks.filter(project_id__in=project_ids)
+        counters = counters.filter(project_id__in=project_ids)
+    with transaction.atomic():
+        counts = count_tasks(tasks)
+        counters.delete()
+        ProjectTaskStat.objects.bulk_create([
+            ProjectTaskStat(project_id=project_id, dimension=dimension, value=value, count=count)
+            for (project_id, dimension, value), count in counts.items()
+        ])
+    return len(counts)
+
+
+def get_project_stats(project_id):
+    '''
+    Return the dashboard counters of a project: one query on the summary table, whose size depends on the
+    number of distinct statuses, priorities and assignees, not on the number of tasks, and one indexed count
+    of the open tasks past their due date (overdue is time dependent, so it cannot be kept as a counter).
+    '''
+    stats = {
+        DIMENSION_TOTAL: 0,
+        DIMENSION_STATUS: {value: 0 for value, _ in Task._meta.get_field('status').choices},
+        DIMENSION_PRIORITY: {value: 0 for value, _ in Task._meta.get_field('priority').choices},
+        DIMENSION_ASSIGNEE: {},
+    }
+    for dimension, value, count in ProjectTaskStat.objects.filter(project_id=project_id).values_list('dimension', 'value', 'count'):
+        if dimension == DIMENSION_TOTAL:
+            stats[DIMENSION_TOTAL] = count
+        elif count:
+            stats[dimension][value or 'none'] = count
+    stats['overdue'] = Task.objects.filter(
+        project_id=project_id, status__in=OPEN_STATUSES, due_date__lt=timezone.now()
+    ).count()
+    return stats
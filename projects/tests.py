@@ -1,3 +1,1671 @@
-from django.test import TestCase
+import csv
+import gzip
+import io
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import uuid
+from contextlib import closing
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+from django.contrib.auth import get_user_model
+from django.contrib.sessions.models import Session
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db import IntegrityError, connection
+from django.http import HttpResponse
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.translation import gettext_lazy
+from rest_framework import serializers
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient, APIRequestFactory
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from config import metrics
+from config.parsers import FastJSONParser
+from config.profiling import RequestProfilerMiddleware, get_profile_token, is_valid_token, list_profiles
+from config.renderers import FastJSONRenderer
+from config.routers import ReplicaRouter, get_pin_cache_key, pin, request_state
+from config.writer import WriteTimeout, run_write, write_queue
+
+from .models import Project, ProjectMember, ProjectTaskStat, Task, Comment
+from .access import ProjectAccessResolver
+from . import cache as response_cache
+from .async_views import (
+    AsyncCommentsListCreateView,
+    AsyncProjectsListCreateView,
+    AsyncRetrieveCommentView,
+    AsyncRetrieveProjectView,
+    AsyncRetrieveTaskView,
+    AsyncTaskListCreateView,
+)
+from .management.commands.sync_replicas import copy_database
+from .pagination import KeysetCursorPagination
+from .projections import get_projection
+from .serializers import TaskSerializer
+from .views import (
+    CommentsListCreateView,
+    ProjectsListCreateView,
+    RetrieveCommentView,
+    RetrieveProjectView,
+    RetrieveTaskView,
+    TaskListCreateView,
+)
+
+User = get_user_model()
+
+
+class ProjectsAPITestCase(TestCase):
+    '''
+    Base test case providing an authenticated API client and small factories
+    for the `Project`, `Task` and `Comment` models.
+    '''
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(email='owner@example.com', password='pass1234', username='owner')
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def make_project(self, owner=None, **kwargs):
+        kwargs.setdefault('name', 'Project')
+        kwargs.setdefault('description', 'Description')
+        return Project.objects.create(owner=owner or self.user, **kwargs)
+
+    def make_task(self, project, **kwargs):
+        kwargs.setdefault('title', 'Task')
+        kwargs.setdefault('description', 'Description')
+        kwargs.setdefault('due_date', timezone.now() + timedelta(days=7))
+        return Task.objects.create(project=project, **kwargs)
+
+    def make_comment(self, task, user=None, **kwargs):
+        kwargs.setdefault('content', 'Comment')
+        return Comment.objects.create(task=task, user=user or self.user, **kwargs)
+
+
+@override_settings(PROJECT_RESPONSE_CACHE_TIMEOUT=0)
+class QueryBudgetTests(ProjectsAPITestCase):
+    '''
+    Every list and detail endpoint must run within a fixed number of queries,
+    and that number must not grow with the number of rows on the page.
+    List budgets include the aggregate version query of the conditional GET.
+    '''
+    def get_query_count(self, url):
+        # Warm up the cached project access map first, it is covered by `ProjectAccessTests`.
+        self.client.get(url)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200, response.content)
+        return len(queries)
+
+    def assertQueryBudget(self, url, budget, add_row):
+        add_row()
+        single = self.get_query_count(url)
+        for _ in range(9):
+            add_row()
+        full_page = self.get_query_count(url)
+        self.assertLessEqual(full_page, budget)
+        self.assertEqual(single, full_page, 'Query count grows with the page size.')
+
+    def test_project_list(self):
+        self.assertQueryBudget(reverse('project-list') + '?expand=owner', 2, lambda: self.make_project())
+
+    def test_project_detail(self):
+        project = self.make_project()
+        self.assertLessEqual(self.get_query_count(reverse('project-detail', args=[project.id]) + '?expand=owner'), 1)
+
+    def test_task_list(self):
+        project = self.make_project()
+        assignee = User.objects.create_user(email='dev@example.com', password='pass1234', username='dev')
+        self.assertQueryBudget(
+            reverse('project-tasks', args=[project.id]) + '?expand=assigned_to,project.owner', 2,
+            lambda: self.make_task(project, assigned_to=assignee),
+        )
+
+    def test_task_detail(self):
+        task = self.make_task(self.make_project(), assigned_to=self.user)
+        self.assertLessEqual(self.get_query_count(reverse('task-detail', args=[task.id]) + '?expand=assigned_to,project.owner'), 1)
+
+    def test_comment_list(self):
+        task = self.make_task(self.make_project(), assigned_to=self.user)
+        url = reverse('comments-list', args=[task.id]) + '?expand=user,task.assigned_to,task.project.owner'
+        self.assertQueryBudget(url, 3, lambda: self.make_comment(task))
+
+    def test_comment_detail(self):
+        comment = self.make_comment(self.make_task(self.make_project(), assigned_to=self.user))
+        self.assertLessEqual(self.get_query_count(reverse('comment-details', args=[comment.id]) + '?expand=user,task.project.owner'), 1)
+
+
+class SparseFieldsetTests(ProjectsAPITestCase):
+    '''
+    Nested relations are primary keys by default and only embedded through `?expand=`.
+    '''
+    def setUp(self):
+        super().setUp()
+        self.project = self.make_project()
+        self.task = self.make_task(self.project, assigned_to=self.user)
+        self.comment = self.make_comment(self.task)
+
+    def test_relations_default_to_primary_keys(self):
+        response = self.client.get(reverse('comment-details', args=[self.comment.id]))
+        self.assertEqual(response.data['task'], self.task.id)
+        self.assertEqual(response.data['user'], self.user.id)
+
+    def test_expand_nested_relations(self):
+        url = reverse('comment-details', args=[self.comment.id]) + '?expand=task.project.owner'
+        response = self.client.get(url)
+        self.assertEqual(response.data['user'], self.user.id)
+        self.assertEqual(response.data['task']['assigned_to'], self.user.id)
+        self.assertEqual(response.data['task']['project']['owner']['email'], self.user.email)
+
+    def test_fields_restricts_top_level_and_nested_fields(self):
+        url = reverse('task-detail', args=[self.task.id]) + '?fields=id,title,project.name&expand=project'
+        response = self.client.get(url)
+        self.assertEqual(response.data, {'id': self.task.id, 'title': self.task.title, 'project': {'name': 'Project'}})
+
+    def test_unknown_fields_are_rejected(self):
+        response = self.client.get(reverse('project-tasks', args=[self.project.id]) + '?fields=id,bogus')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('Unknown fields: bogus.', response.data['fields'][0])
+        self.assertIn('title', response.data['fields'][0])
+
+        response = self.client.get(reverse('task-detail', args=[self.task.id]) + '?fields=id,project.bogus&expand=project')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('Unknown fields: project.bogus.', response.data['fields'][0])
+
+    def test_fields_do_not_drop_written_fields(self):
+        url = reverse('project-tasks', args=[self.project.id]) + '?fields=id'
+        payload = {'title': 'Written', 'description': 'D', 'due_date': '2030-01-01T00:00:00Z', 'priority': 'High'}
+        response = self.client.post(url, payload, format='json')
+        self.assertEqual(response.status_code, 201, response.content)
+        self.assertEqual(list(response.data), ['id'])
+        task = Task.objects.get(id=response.data['id'])
+        self.assertEqual((task.title, task.priority, task.due_date.year), ('Written', 'High', 2030))
+
+        response = self.client.post(url, {'title': 'No due date', 'description': 'D'}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('due_date', response.data)
+
+    def test_unexpanded_list_does_not_join(self):
+        url = reverse('comments-list', args=[self.task.id])
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(url)
+        self.assertNotIn('JOIN', queries[-1]['sql'])
+
+
+class KeysetPaginationTests(ProjectsAPITestCase):
+    '''
+    Task and comment lists are paginated on `(created_at, id)` without `COUNT(*)` or `OFFSET`.
+    '''
+    def setUp(self):
+        super().setUp()
+        self.project = self.make_project()
+        self.tasks = [self.make_task(self.project, title=f'Task {i}') for i in range(25)]
+        # Several rows sharing a timestamp must still be paginated without duplicates or gaps.
+        Task.objects.filter(id__in=[task.id for task in self.tasks[5:15]]).update(created_at=self.tasks[5].created_at)
+        self.url = reverse('project-tasks', args=[self.project.id])
+
+    def collect(self, url, link='next'):
+        ids = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200, response.content)
+            ids.extend(row['id'] for row in response.data['results'])
+            url = response.data[link]
+        return ids
+
+    def test_pages_cover_every_row_once_in_order(self):
+        expected = list(Task.objects.order_by('-created_at', '-id').values_list('id', flat=True))
+        self.assertEqual(self.collect(self.url), expected)
+
+    def test_previous_links_walk_back(self):
+        response = self.client.get(self.url)
+        last_page = self.client.get(self.client.get(response.data['next']).data['next'])
+        self.assertIsNone(last_page.data['next'])
+        previous = self.client.get(last_page.data['previous'])
+        self.assertEqual(
+            [row['id'] for row in previous.data['results']],
+            list(Task.objects.order_by('-created_at', '-id').values_list('id', flat=True)[10:20]),
+        )
+
+    def test_count_is_opt_in(self):
+        self.assertNotIn('count', self.client.get(self.url).data)
+        self.assertEqual(self.client.get(self.url + '?count=true').data['count'], 25)
+
+    def test_deep_page_does_not_use_offset(self):
+        url = self.client.get(self.client.get(self.url).data['next']).data['next']
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(url)
+        self.assertNotIn('OFFSET', queries[-1]['sql'])
+        # The only aggregate is the conditional GET version query, not a page count.
+        self.assertNotIn('COUNT', ' '.join(query['sql'] for query in queries if 'last_modified' not in query['sql']))
+
+    def test_invalid_cursor(self):
+        response = self.client.get(self.url + '?cursor=garbage')
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(response.data['detail'], KeysetCursorPagination.invalid_cursor_message)
+
+    def test_cursor_is_bound_to_its_ordering(self):
+        next_url = self.client.get(self.url).data['next']
+        self.assertEqual(self.client.get(next_url + '&ordering=status').status_code, 404)
+        next_url = self.client.get(self.url + '?ordering=status').data['next']
+        self.assertEqual(self.client.get(next_url.replace('ordering=status', 'ordering=-status')).status_code, 404)
+        self.assertEqual(self.client.get(next_url).status_code, 200)
+
+
+class TaskFilterTests(ProjectsAPITestCase):
+    '''
+    Task lists are filtered and ordered in the database, and the common filters are served by an index.
+    '''
+    def setUp(self):
+        super().setUp()
+        self.project = self.make_project()
+        self.other_project = self.make_project(name='Other')
+        self.assignee = User.objects.create_user(email='dev@example.com', password='pass1234', username='dev')
+        now = timezone.now()
+        self.todo = self.make_task(self.project, status='To Do', priority='High', due_date=now + timedelta(days=1))
+        self.doing = self.make_task(
+            self.project, status='In Progress', priority='Low', assigned_to=self.assignee, due_date=now + timedelta(days=3)
+        )
+        self.done = self.make_task(self.project, status='Done', priority='High', due_date=now - timedelta(days=1))
+        self.make_task(self.other_project, status='To Do')
+        self.url = reverse('project-tasks', args=[self.project.id])
+
+    def get_ids(self, query):
+        response = self.client.get(self.url + query)
+        self.assertEqual(response.status_code, 200, response.content)
+        return [row['id'] for row in response.data['results']]
+
+    def test_filter_by_status_and_priority(self):
+        self.assertEqual(self.get_ids('?status=To Do'), [self.todo.id])
+        self.assertCountEqual(self.get_ids('?status=To Do,Done'), [self.todo.id, self.done.id])
+        self.assertEqual(self.get_ids('?priority=High&status=Done'), [self.done.id])
+
+    def test_filter_by_assignee(self):
+        self.assertEqual(self.get_ids(f'?assigned_to={self.assignee.id}'), [self.doing.id])
+        self.assertCountEqual(self.get_ids('?assigned_to=none'), [self.todo.id, self.done.id])
+
+    def test_filter_by_due_date_range(self):
+        due_after = (timezone.now()).isoformat().replace('+00:00', 'Z')
+        self.assertCountEqual(self.get_ids(f'?due_after={due_after}'), [self.todo.id, self.doing.id])
+
+    def test_ordering(self):
+        self.assertEqual(self.get_ids('?ordering=due_date'), [self.done.id, self.todo.id, self.doing.id])
+        self.assertEqual(self.get_ids('?ordering=-due_date'), [self.doing.id, self.todo.id, self.done.id])
+
+    def test_invalid_filters(self):
+        response = self.client.get(self.url + '?status=Blocked&assigned_to=me&due_before=tomorrow')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(set(response.data), {'status', 'assigned_to', 'due_before'})
+
+    def get_query_plan(self, query):
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(self.url + query)
+        with connection.cursor() as cursor:
+            cursor.execute('EXPLAIN QUERY PLAN ' + queries[-1]['sql'])
+            return [row[-1] for row in cursor.fetchall()]
+
+    def test_common_filters_use_an_index(self):
+        due_before = (timezone.now() + timedelta(days=2)).isoformat().replace('+00:00', 'Z')
+        for query in [
+            '', '?status=To Do', '?priority=High', f'?assigned_to={self.assignee.id}', '?status=To Do,In Progress',
+            f'?due_before={due_before}', f'?status=Done&due_before={due_before}', '?ordering=due_date',
+        ]:
+            plan = self.get_query_plan(query)
+            table_access = [step for step in plan if 'projects_task' in step]
+            self.assertTrue(table_access, plan)
+            for step in table_access:
+                self.assertTrue(step.startswith('SEARCH'), f'{query!r} scans the task table: {plan}')
+
+
+class BulkTaskCreateTests(ProjectsAPITestCase):
+    '''
+    Posting a list of tasks validates the whole list, checks ownership once and inserts in batches.
+    '''
+    def setUp(self):
+        super().setUp()
+        self.project = self.make_project()
+        self.url = reverse('project-tasks', args=[self.project.id])
+        self.due_date = (timezone.now() + timedelta(days=7)).isoformat()
+
+    def test_bulk_create_uses_batched_inserts(self):
+        payload = [{'title': f'Task {i}', 'description': 'Imported', 'due_date': self.due_date} for i in range(250)]
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(self.url, payload, format='json')
+        self.assertEqual(response.status_code, 201, response.content)
+        self.assertEqual([row['title'] for row in response.data], [row['title'] for row in payload])
+        self.assertTrue(all(row['id'] and row['project'] == self.project.id for row in response.data))
+        self.assertEqual(Task.objects.filter(project=self.project).count(), 250)
+
+        inserts = [query for query in queries if query['sql'].startswith('INSERT INTO "projects_task"')]
+        projects = [query for query in queries if 'FROM "projects_project"' in query['sql']]
+        self.assertEqual(len(inserts), 3)
+        self.assertEqual(len(projects), 1)
+
+    def test_bulk_create_is_all_or_nothing(self):
+        payload = [
+            {'title': 'Valid', 'description': 'Imported', 'due_date': self.due_date},
+            {'title': 'Invalid', 'description': 'Imported', 'due_date': self.due_date, 'status': 'Blocked'},
+        ]
+        response = self.client.post(self.url, payload, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data[0], {})
+        self.assertIn('status', response.data[1])
+        self.assertFalse(Task.objects.exists())
+
+    def test_bulk_create_limits(self):
+        self.assertEqual(self.client.post(self.url, [], format='json').status_code, 400)
+
+    def test_bulk_create_requires_ownership(self):
+        project = self.make_project(owner=User.objects.create_user(email='x@example.com', password='pass1234', username='x'))
+        payload = [{'title': 'Task', 'description': 'Imported', 'due_date': self.due_date}]
+        response = self.client.post(reverse('project-tasks', args=[project.id]), payload, format='json')
+        self.assertEqual(response.status_code, 404)
+
+
+class BulkTaskUpdateTests(ProjectsAPITestCase):
+    '''
+    Bulk updates apply one set-based `UPDATE`, scoped to the caller's projects.
+    '''
+    def setUp(self):
+        super().setUp()
+        self.project = self.make_project()
+        self.tasks = [self.make_task(self.project, status='In Progress') for _ in range(5)]
+        self.todo = self.make_task(self.project, status='To Do')
+        stranger = User.objects.create_user(email='x@example.com', password='pass1234', username='x')
+        self.foreign_task = self.make_task(self.make_project(owner=stranger), status='In Progress')
+        self.url = reverse('task-bulk-update')
+
+    def test_update_by_filter(self):
+        payload = {'filter': {'project': self.project.id, 'status': 'In Progress'}, 'changes': {'status': 'Done'}}
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.patch(self.url, payload, format='json')
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(response.data, {'updated': 5})
+        self.assertEqual(len([query for query in queries if query['sql'].startswith('UPDATE "projects_task"')]), 1)
+        self.assertEqual(Task.objects.filter(project=self.project, status='Done').count(), 5)
+        self.assertEqual(Task.objects.get(id=self.todo.id).status, 'To Do')
+
+    def test_update_by_ids_is_scoped_to_own_projects(self):
+        assignee = User.objects.create_user(email='dev@example.com', password='pass1234', username='dev')
+        ProjectMember.objects.create(project=self.project, user=assignee, role='Member')
+        ids = [self.tasks[0].id, self.todo.id, self.foreign_task.id]
+        response = self.client.patch(self.url, {'ids': ids, 'changes': {'assigned_to': assignee.id}}, format='json')
+        self.assertEqual(response.data, {'updated': 2})
+        self.assertIsNone(Task.objects.get(id=self.foreign_task.id).assigned_to)
+        self.assertEqual(Task.objects.filter(assigned_to=assignee).count(), 2)
+
+    def test_assignee_must_belong_to_every_project(self):
+        outsider = User.objects.create_user(email='out@example.com', password='pass1234', username='out')
+        for user_id in [outsider.id, outsider.id + 1000]:
+            response = self.client.patch(self.url, {'ids': [self.todo.id], 'changes': {'assigned_to': user_id}}, format='json')
+            self.assertEqual(response.status_code, 400)
+            self.assertEqual(response.data, {'changes': {'assigned_to': [f'Invalid pk "{user_id}" - object does not exist.']}})
+        self.assertIsNone(Task.objects.get(id=self.todo.id).assigned_to)
+
+        # A member of one project cannot be given the tasks of another.
+        other_project = self.make_project()
+        other_task = self.make_task(other_project)
+        ProjectMember.objects.create(project=self.project, user=outsider, role='Member')
+        response = self.client.patch(self.url, {'ids': [self.todo.id, other_task.id], 'changes': {'assigned_to': outsider.id}}, format='json')
+        self.assertEqual(response.status_code, 400)
+        response = self.client.patch(self.url, {'ids': [self.todo.id], 'changes': {'assigned_to': outsider.id}}, format='json')
+        self.assertEqual(response.data, {'updated': 1})
+        # The owner can always be assigned.
+        response = self.client.patch(self.url, {'ids': [other_task.id], 'changes': {'assigned_to': self.user.id}}, format='json')
+        self.assertEqual(response.data, {'updated': 1})
+
+    def test_invalid_requests(self):
+        self.assertEqual(self.client.patch(self.url, {'changes': {'status': 'Done'}}, format='json').status_code, 400)
+        self.assertEqual(self.client.patch(self.url, {'ids': [1], 'changes': {}}, format='json').status_code, 400)
+        response = self.client.patch(self.url, {'filter': {'colour': 'red'}, 'changes': {'status': 'Done'}}, format='json')
+        self.assertEqual(response.status_code, 400)
+        response = self.client.patch(self.url, {'ids': [1], 'changes': {'status': 'Blocked'}}, format='json')
+        self.assertIn('status', response.data['changes'])
+
+
+class ProjectAccessTests(ProjectsAPITestCase):
+    '''
+    Access is resolved from the cached `{project: role}` map of the user, which honours `ProjectMember` roles
+    and is invalidated when projects or memberships change.
+    '''
+    def setUp(self):
+        super().setUp()
+        self.project = self.make_project()
+        self.task = self.make_task(self.project)
+        self.member = User.objects.create_user(email='member@example.com', password='pass1234', username='member')
+        self.member_client = APIClient()
+        self.member_client.force_authenticate(user=self.member)
+
+    def test_non_members_cannot_see_the_project(self):
+        self.assertEqual(self.member_client.get(reverse('project-tasks', args=[self.project.id])).status_code, 404)
+        self.assertEqual(self.member_client.get(reverse('task-detail', args=[self.task.id])).status_code, 404)
+        self.assertEqual(self.member_client.get(reverse('project-list')).data['results'], [])
+
+    def test_membership_grants_access_immediately(self):
+        self.member_client.get(reverse('project-list'))
+        ProjectMember.objects.create(project=self.project, user=self.member, role='Member')
+        self.assertEqual(self.member_client.get(reverse('project-tasks', args=[self.project.id])).status_code, 200)
+        self.assertEqual(len(self.member_client.get(reverse('project-list')).data['results']), 1)
+
+    def test_roles_limit_what_members_can_do(self):
+        membership = ProjectMember.objects.create(project=self.project, user=self.member, role='Member')
+        url = reverse('project-detail', args=[self.project.id])
+        self.assertEqual(self.member_client.patch(url, {'name': 'Renamed'}, format='json').status_code, 404)
+        self.assertEqual(self.member_client.delete(reverse('task-detail', args=[self.task.id])).status_code, 404)
+
+        membership.role = 'Admin'
+        membership.save()
+        self.assertEqual(self.member_client.patch(url, {'name': 'Renamed'}, format='json').status_code, 200)
+        self.assertEqual(self.member_client.delete(url).status_code, 404)
+        self.assertEqual(self.client.delete(url).status_code, 200)
+
+    def test_removing_a_member_revokes_access(self):
+        membership = ProjectMember.objects.create(project=self.project, user=self.member, role='Admin')
+        url = reverse('project-tasks', args=[self.project.id])
+        self.assertEqual(self.member_client.get(url).status_code, 200)
+        membership.delete()
+        self.assertEqual(self.member_client.get(url).status_code, 404)
+
+    def test_comment_authors_manage_their_own_comments(self):
+        ProjectMember.objects.create(project=self.project, user=self.member, role='Member')
+        own = self.make_comment(self.task, user=self.member)
+        other = self.make_comment(self.task)
+        self.assertEqual(self.member_client.patch(reverse('comment-details', args=[own.id]), {'content': 'Edited'}).status_code, 200)
+        self.assertEqual(self.member_client.patch(reverse('comment-details', args=[other.id]), {'content': 'Edited'}).status_code, 404)
+
+    def test_access_map_is_cached_across_requests(self):
+        url = reverse('project-tasks', args=[self.project.id])
+        self.client.get(url)
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(url)
+        self.assertFalse([query for query in queries if 'projects_projectmember' in query['sql']])
+        self.assertEqual(cache.get(ProjectAccessResolver.get_cache_key(self.user.pk)), {self.project.id: 'Owner'})
+
+
+@override_settings(PROJECT_RESPONSE_CACHE_TIMEOUT=0)
+class ConditionalGetTests(ProjectsAPITestCase):
+    '''
+    Detail and list endpoints send an ETag and answer a matching `If-None-Match` with 304,
+    without serializing anything.
+    '''
+    def setUp(self):
+        super().setUp()
+        self.project = self.make_project()
+        self.task = self.make_task(self.project)
+        self.list_url = reverse('project-tasks', args=[self.project.id])
+        self.detail_url = reverse('task-detail', args=[self.task.id])
+
+    def revalidate(self, url):
+        etag = self.client.get(url)['ETag']
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        return response, len(queries)
+
+    def test_unchanged_list_and_detail_are_not_modified(self):
+        for url in [self.list_url, self.detail_url]:
+            response, query_count = self.revalidate(url)
+            self.assertEqual(response.status_code, 304)
+            self.assertEqual(query_count, 1)
+            self.assertEqual(response.content, b'')
+            self.assertTrue(response['ETag'].startswith('W/"'))
+        self.assertIn('Last-Modified', self.client.get(self.detail_url))
+
+    def test_changes_invalidate_the_etag(self):
+        list_etag = self.client.get(self.list_url)['ETag']
+        detail_etag = self.client.get(self.detail_url)['ETag']
+        self.client.patch(self.detail_url, {'status': 'Done'}, format='json')
+        self.assertEqual(self.client.get(self.list_url, HTTP_IF_NONE_MATCH=list_etag).status_code, 200)
+        self.assertEqual(self.client.get(self.detail_url, HTTP_IF_NONE_MATCH=detail_etag).status_code, 200)
+
+        list_etag = self.client.get(self.list_url)['ETag']
+        self.client.patch(reverse('task-bulk-update'), {'ids': [self.task.id], 'changes': {'priority': 'High'}}, format='json')
+        self.assertEqual(self.client.get(self.list_url, HTTP_IF_NONE_MATCH=list_etag).status_code, 200)
+
+        list_etag = self.client.get(self.list_url)['ETag']
+        self.make_task(self.project).delete()
+        self.assertEqual(self.client.get(self.list_url, HTTP_IF_NONE_MATCH=list_etag).status_code, 304)
+        self.task.delete()
+        self.assertEqual(self.client.get(self.list_url, HTTP_IF_NONE_MATCH=list_etag).status_code, 200)
+
+    def test_changes_to_expanded_relations_invalidate_the_etag(self):
+        comment = self.make_comment(self.task)
+        urls = [
+            self.detail_url + '?expand=project',
+            reverse('comments-list', args=[self.task.id]) + '?expand=user,task.project.owner',
+            reverse('comment-details', args=[comment.id]) + '?expand=task.project',
+        ]
+        etags = [self.client.get(url)['ETag'] for url in urls]
+        self.project.name = 'Renamed'
+        self.project.save()
+        for url, etag in zip(urls, etags):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, 200, url)
+            self.assertIn('Renamed', response.content.decode())
+
+        # Users have no `updated_at`, their generation counter is part of the version.
+        url = urls[1]
+        etag = self.client.get(url)['ETag']
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        self.user.first_name = 'Renamed'
+        self.user.save()
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_etag_depends_on_query_and_user(self):
+        etag = self.client.get(self.list_url)['ETag']
+        self.assertEqual(self.client.get(self.list_url + '?status=Done', HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+        member = User.objects.create_user(email='member@example.com', password='pass1234', username='member')
+        ProjectMember.objects.create(project=self.project, user=member, role='Member')
+        self.client.force_authenticate(user=member)
+        self.assertEqual(self.client.get(self.list_url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+
+class ResponseCacheTests(ProjectsAPITestCase):
+    '''
+    Project and task lists are served from the cache until a write bumps the generation of a project they show.
+    '''
+    def setUp(self):
+        super().setUp()
+        self.project = self.make_project()
+        self.task = self.make_task(self.project)
+        self.url = reverse('project-tasks', args=[self.project.id])
+
+    def get(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200, response.content)
+        return response, len(queries)
+
+    def assertServedFresh(self, url, expected_titles, field='title'):
+        response, _ = self.get(url)
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual([item[field] for item in response.data['results']], expected_titles)
+        response, query_count = self.get(url)
+        self.assertEqual((response['X-Cache'], query_count), ('HIT', 0))
+        self.assertEqual([item[field] for item in response.data['results']], expected_titles)
+
+    def test_writes_invalidate_cached_task_list(self):
+        self.assertServedFresh(self.url, ['Task'])
+        self.client.patch(reverse('task-detail', args=[self.task.id]), {'title': 'Renamed'}, format='json')
+        self.assertServedFresh(self.url, ['Renamed'])
+        self.client.post(self.url, [{'title': 'Bulk', 'description': 'D', 'due_date': '2030-01-01T00:00:00Z'}], format='json')
+        self.assertServedFresh(self.url, ['Bulk', 'Renamed'])
+        self.client.patch(reverse('task-bulk-update'), {'ids': [self.task.id], 'changes': {'status': 'Done'}}, format='json')
+        self.assertEqual(self.get(self.url)[0]['X-Cache'], 'MISS')
+        self.make_comment(self.task)
+        self.assertEqual(self.get(self.url)[0]['X-Cache'], 'MISS')
+
+    def test_cache_is_per_user_and_checks_access(self):
+        self.assertServedFresh(self.url, ['Task'])
+        member = User.objects.create_user(email='member@example.com', password='pass1234', username='member')
+        self.client.force_authenticate(user=member)
+        self.assertEqual(self.client.get(self.url).status_code, 404)
+
+        membership = ProjectMember.objects.create(project=self.project, user=member, role='Member')
+        self.assertEqual(self.get(self.url)[0]['X-Cache'], 'MISS')
+        self.assertServedFresh(reverse('project-list'), ['Project'], field='name')
+        membership.delete()
+        self.assertEqual(self.client.get(self.url).status_code, 404)
+        self.assertEqual(self.get(reverse('project-list'))[0].data['results'], [])
+
+    def test_expanded_users_are_refreshed(self):
+        url = self.url + '?expand=project.owner'
+        self.get(url)
+        self.user.first_name = 'Changed'
+        self.user.save()
+        response, _ = self.get(url)
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(response.data['results'][0]['project']['owner']['first_name'], 'Changed')
+
+    def test_cascades_bump_generations_once(self):
+        for i in range(3):
+            self.make_comment(self.task, content=f'Comment {i}')
+        self.get(self.url)
+        with CaptureQueriesContext(connection) as queries:
+            self.task.delete()
+        # The comments' project comes from their deleted task, not from a query per comment.
+        self.assertFalse([query for query in queries if query['sql'].startswith('SELECT "projects_task"."project_id"')])
+        self.assertEqual(self.get(self.url)[0]['X-Cache'], 'MISS')
+
+        comment = self.make_comment(self.make_task(self.project))
+        self.get(self.url)
+        comment.delete()
+        self.assertEqual(self.get(self.url)[0]['X-Cache'], 'MISS')
+
+    def test_only_embedded_user_changes_refresh_expanded_lists(self):
+        url = self.url + '?expand=project.owner'
+        self.get(url)
+        User.objects.create_user(email='new@example.com', password='pass1234', username='new')
+        self.user.last_login = timezone.now()
+        self.user.save(update_fields=['last_login'])
+        self.user.set_password('changed1234')
+        self.user.save()
+        self.assertEqual(self.get(url)[0]['X-Cache'], 'HIT')
+
+        self.user.last_name = 'Changed'
+        self.user.save()
+        self.assertEqual(self.get(url)[0]['X-Cache'], 'MISS')
+
+    def test_hit_and_miss_counters(self):
+        response_cache.reset_stats()
+        self.get(self.url)
+        self.get(self.url)
+        self.get(self.url)
+        self.assertEqual(response_cache.get_stats(), {'hits': 2, 'misses': 1})
+        out = StringIO()
+        call_command('response_cache_stats', '--reset', stdout=out)
+        self.assertIn('Hits: 2, misses: 1', out.getvalue())
+        self.assertEqual(response_cache.get_stats(), {'hits': 0, 'misses': 0})
+
+    def test_file_based_cache(self):
+        with tempfile.TemporaryDirectory() as location:
+            backend = {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': location}
+            with self.settings(CACHES={'default': backend}):
+                self.assertServedFresh(self.url, ['Task'])
+                self.make_task(self.project, title='New')
+                self.assertServedFresh(self.url, ['New', 'Task'])
+
+
+class ProjectStatsTests(ProjectsAPITestCase):
+    '''
+    The project dashboard is read from counters kept up to date on every task write.
+    '''
+    def setUp(self):
+        super().setUp()
+        self.project = self.make_project()
+        self.assignee = User.objects.create_user(email='dev@example.com', password='pass1234', username='dev')
+        self.url = reverse('project-stats', args=[self.project.id])
+
+    def get_stats(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.data
+
+    def assertCountersUpToDate(self):
+        call_command('rebuild_task_stats', '--check', stdout=StringIO())
+
+    def test_counters_follow_task_writes(self):
+        task = self.make_task(self.project, assigned_to=self.assignee, status='In Progress')
+        self.make_task(self.project, priority='High', due_date=timezone.now() - timedelta(days=1))
+        self.make_task(self.project, status='Done', due_date=timezone.now() - timedelta(days=1))
+        data = self.get_stats()
+        self.assertEqual(data['total'], 3)
+        self.assertEqual(data['status'], {'To Do': 1, 'In Progress': 1, 'Done': 1})
+        self.assertEqual(data['priority'], {'Low': 0, 'Medium': 2, 'High': 1})
+        self.assertEqual(data['assigned_to'], {str(self.assignee.id): 1, 'none': 2})
+        self.assertEqual(data['overdue'], 1)
+
+        self.client.patch(reverse('task-detail', args=[task.id]), {'status': 'Done'}, format='json')
+        task = Task.objects.get(id=task.id)
+        task.priority = 'Low'
+        task.save()
+        self.assertEqual(self.get_stats()['status'], {'To Do': 1, 'In Progress': 0, 'Done': 2})
+        self.assertEqual(self.get_stats()['priority'], {'Low': 1, 'Medium': 1, 'High': 1})
+
+        task.delete()
+        self.assertEqual(self.get_stats()['total'], 2)
+        self.assertEqual(self.get_stats()['assigned_to'], {'none': 2})
+        self.assertCountersUpToDate()
+
+    def test_counters_follow_bulk_writes(self):
+        ProjectMember.objects.create(project=self.project, user=self.assignee, role='Member')
+        payload = [{'title': f'Task {i}', 'description': 'D', 'due_date': '2030-01-01T00:00:00Z'} for i in range(5)]
+        self.client.post(reverse('project-tasks', args=[self.project.id]), payload, format='json')
+        self.client.patch(reverse('task-bulk-update'), {
+            'filter': {'project': self.project.id}, 'changes': {'assigned_to': self.assignee.id, 'status': 'Done'},
+        }, format='json')
+        data = self.get_stats()
+        self.assertEqual(data['total'], 5)
+        self.assertEqual(data['status']['Done'], 5)
+        self.assertEqual(data['assigned_to'], {str(self.assignee.id): 5})
+
+        self.assignee.delete()
+        self.assertEqual(self.get_stats()['assigned_to'], {'none': 5})
+        self.assertCountersUpToDate()
+
+    def test_deletes_do_not_update_counters_per_task(self):
+        for i in range(6):
+            self.make_task(self.project, status='Done' if i % 2 else 'To Do', assigned_to=self.assignee if i % 3 else None)
+        with CaptureQueriesContext(connection) as queries:
+            Task.objects.filter(project=self.project, status='Done').delete()
+        updates = [query for query in queries if query['sql'].startswith('UPDATE "projects_projecttaskstat"')]
+        # One update per changed counter: total, status, priority and two assignees, not one set per task.
+        self.assertEqual(len(updates), 5)
+        self.assertEqual(self.get_stats()['status'], {'To Do': 3, 'In Progress': 0, 'Done': 0})
+        self.assertCountersUpToDate()
+
+        with CaptureQueriesContext(connection) as queries:
+            self.project.delete()
+        self.assertFalse([query for query in queries if query['sql'].startswith('UPDATE "projects_projecttaskstat"')])
+        self.assertFalse(ProjectTaskStat.objects.exists())
+
+    def test_read_cost_does_not_grow_with_tasks(self):
+        for _ in range(20):
+            self.make_task(self.project)
+        self.get_stats()
+        with CaptureQueriesContext(connection) as queries:
+            self.get_stats()
+        # One read of the counters, and the indexed overdue count.
+        self.assertEqual(len(queries), 2)
+        self.assertIn('projects_projecttaskstat', queries[0]['sql'])
+        plan = connection.cursor().execute('EXPLAIN QUERY PLAN ' + queries[1]['sql']).fetchall()
+        self.assertTrue(all(row[-1].startswith('SEARCH') for row in plan), plan)
+
+    def test_rebuild_command(self):
+        self.make_task(self.project)
+        stats_rows = self.project.task_stats.all()
+        stats_rows.update(count=7)
+        with self.assertRaises(CommandError):
+            self.assertCountersUpToDate()
+        call_command('rebuild_task_stats', stdout=StringIO())
+        self.assertCountersUpToDate()
+        self.assertEqual(self.get_stats()['total'], 1)
+
+    def test_requires_membership(self):
+        self.client.force_authenticate(user=self.assignee)
+        self.assertEqual(self.client.get(self.url).status_code, 404)
+
+
+class SearchTests(ProjectsAPITestCase):
+    '''
+    Tasks and comments are searched through the FTS5 index, ranked by bm25 and scoped to the user's projects.
+    '''
+    def setUp(self):
+        super().setUp()
+        self.project = self.make_project()
+        self.url = reverse('search')
+        self.login_task = self.make_task(self.project, title='Login page crashes', description='Stack trace attached')
+        self.other_task = self.make_task(self.project, title='Dashboard', description='The login button is misaligned')
+        self.comment = self.make_comment(self.other_task, content='Reproduced the crash on Safari')
+
+    def search(self, query, **params):
+        response = self.client.get(self.url, {'q': query, **params})
+        self.assertEqual(response.status_code, 200, response.content)
+        return response
+
+    def get_hits(self, query, **params):
+        return [(row['type'], row['id']) for row in self.search(query, **params).data['results']]
+
+    def test_ranked_results(self):
+        # A title match ranks before a description match.
+        self.assertEqual(self.get_hits('login'), [('task', self.login_task.id), ('task', self.other_task.id)])
+        self.assertEqual(self.get_hits('crash*'), [('task', self.login_task.id), ('comment', self.comment.id)])
+        row = self.search('safari').data['results'][0]
+        self.assertEqual(row['task'], self.other_task.id)
+        self.assertEqual(row['project'], self.project.id)
+        self.assertIn('[Safari]', row['snippet'])
+        self.assertEqual(row['title'], 'Dashboard')
+
+    def test_index_follows_writes(self):
+        self.client.patch(reverse('task-detail', args=[self.login_task.id]), {'title': 'Signin page'}, format='json')
+        self.assertEqual(self.get_hits('signin'), [('task', self.login_task.id)])
+        self.assertEqual(self.get_hits('login'), [('task', self.other_task.id)])
+
+        self.client.post(reverse('project-tasks', args=[self.project.id]), [
+            {'title': 'Bulk imported', 'description': 'D', 'due_date': '2030-01-01T00:00:00Z'},
+        ], format='json')
+        self.assertEqual(len(self.get_hits('imported')), 1)
+
+        self.comment.delete()
+        self.assertEqual(self.get_hits('safari'), [])
+        self.project.delete()
+        self.assertEqual(self.get_hits('dashboard'), [])
+
+    def test_cascades_leave_the_index_once(self):
+        def count_index_deletes(delete):
+            with CaptureQueriesContext(connection) as queries:
+                delete()
+            return len([query for query in queries if query['sql'].startswith('DELETE FROM projects_search')])
+
+        for i in range(3):
+            self.make_comment(self.login_task, content=f'Crash report {i}')
+        self.assertEqual(count_index_deletes(self.login_task.delete), 1)
+        self.assertEqual(self.get_hits('crash*'), [('comment', self.comment.id)])
+
+        tasks = [self.make_task(self.project, title=f'Queued {i}') for i in range(3)]
+        self.make_comment(tasks[0], content='Queued comment')
+        self.assertEqual(count_index_deletes(Task.objects.filter(title__startswith='Queued').delete), 1)
+        self.assertEqual(self.get_hits('queued'), [])
+
+        self.assertEqual(count_index_deletes(self.project.delete), 1)
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT COUNT(*) FROM projects_search')
+            self.assertEqual(cursor.fetchone()[0], 0)
+
+    def test_scoped_to_accessible_projects(self):
+        other = User.objects.create_user(email='other@example.com', password='pass1234', username='other')
+        foreign_task = self.make_task(self.make_project(owner=other), title='Login secrets')
+        self.assertNotIn(('task', foreign_task.id), self.get_hits('login'))
+        self.assertEqual(self.client.get(self.url, {'q': 'login', 'project': foreign_task.project_id}).status_code, 404)
+
+        self.client.force_authenticate(user=other)
+        self.assertEqual(self.get_hits('login'), [('task', foreign_task.id)])
+
+    def test_cursor_pagination(self):
+        for i in range(5):
+            self.make_task(self.project, title=f'Paging {i}')
+        first = self.search('paging', page_size=2).data
+        second = self.client.get(first['next']).data
+        third = self.client.get(second['next']).data
+        ids = [row['id'] for page in (first, second, third) for row in page['results']]
+        self.assertEqual(len(set(ids)), 5)
+        self.assertIsNone(third['next'])
+        previous = self.client.get(third['previous']).data
+        self.assertEqual(previous['results'], second['results'])
+
+    def test_query_syntax_is_not_interpreted(self):
+        self.assertEqual(self.get_hits('"login" ) ( -'), [('task', self.login_task.id), ('task', self.other_task.id)])
+        # `OR` is a word to look for, not an operator.
+        self.assertEqual(self.get_hits('dashboard OR login'), [])
+        self.assertEqual(self.client.get(self.url).status_code, 400)
+        self.assertEqual(self.client.get(self.url, {'q': 'x', 'cursor': 'garbage'}).status_code, 404)
+
+    def test_reindex_command(self):
+        with connection.cursor() as cursor:
+            cursor.execute('DELETE FROM projects_search')
+        self.assertEqual(self.get_hits('login'), [])
+        out = StringIO()
+        call_command('reindex_search', stdout=out)
+        self.assertIn('Indexed 3', out.getvalue())
+        self.assertEqual(len(self.get_hits('login')), 2)
+
+
+class ExportTests(ProjectsAPITestCase):
+    '''
+    A project is exported as one streamed response, every task followed by its comments.
+    '''
+    def setUp(self):
+        super().setUp()
+        self.project = self.make_project()
+        self.tasks = [self.make_task(self.project, title=f'Task {i}') for i in range(3)]
+        self.comments = [self.make_comment(self.tasks[i]) for i in (2, 0, 2)]
+        self.make_comment(self.make_task(self.make_project(), title='Other project'))
+        self.url = reverse('project-export', args=[self.project.id])
+
+    def export(self, **params):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url, params)
+            content = b''.join(response.streaming_content)
+        self.assertEqual(response.status_code, 200)
+        # One streamed query for the tasks and one for the comments.
+        data_queries = [query for query in queries if query['sql'].startswith(('SELECT "projects_task"', 'SELECT "projects_comment"'))]
+        self.assertEqual(len(data_queries), 2)
+        return response, content
+
+    def test_ndjson_export(self):
+        response, content = self.export()
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        records = [json.loads(line) for line in content.decode().splitlines()]
+        self.assertEqual([(record['type'], record['id']) for record in records], [
+            ('task', self.tasks[0].id), ('comment', self.comments[1].id), ('task', self.tasks[1].id),
+            ('task', self.tasks[2].id), ('comment', self.comments[0].id), ('comment', self.comments[2].id),
+        ])
+        self.assertEqual(records[0]['title'], 'Task 0')
+        self.assertEqual(records[1]['task'], self.tasks[0].id)
+        self.assertEqual(records[1]['user'], self.user.id)
+
+    def test_csv_gzip_export(self):
+        response, content = self.export(fmt='csv', gzip='1')
+        self.assertEqual(response['Content-Type'], 'application/gzip')
+        self.assertIn(f'project-{self.project.id}.csv.gz', response['Content-Disposition'])
+        rows = list(csv.DictReader(io.StringIO(gzip.decompress(content).decode())))
+        self.assertEqual([row['type'] for row in rows], ['task', 'comment', 'task', 'task', 'comment', 'comment'])
+        self.assertEqual(rows[1]['content'], 'Comment')
+
+    def test_requires_membership_and_valid_format(self):
+        self.assertEqual(self.client.get(self.url, {'fmt': 'xml'}).status_code, 400)
+        other = User.objects.create_user(email='other@example.com', password='pass1234', username='other')
+        self.client.force_authenticate(user=other)
+        self.assertEqual(self.client.get(self.url).status_code, 404)
+
+    def test_small_chunks_and_command(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'export.ndjson.gz')
+            call_command('export_project', self.project.id, '--gzip', '--chunk-size', '1', '--output', path)
+            with gzip.open(path, 'rt') as dump:
+                self.assertEqual(len(dump.read().splitlines()), 6)
+        with self.assertRaises(CommandError):
+            call_command('export_project', 999)
+
+
+class ImportDataTests(ProjectsAPITestCase):
+    '''
+    `import_data` loads JSONL and CSV files with batched inserts, resolving the source ids of foreign keys.
+    '''
+    def setUp(self):
+        super().setUp()
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+
+    def write(self, name, content):
+        path = os.path.join(self.directory.name, name)
+        with (gzip.open if name.endswith('.gz') else open)(path, 'wt') as output:
+            output.write(content)
+        return path
+
+    def write_jsonl(self, name, records):
+        return self.write(name, ''.join(json.dumps(record) + '\n' for record in records))
+
+    def test_import(self):
+        users = self.write('users.csv', 'type,id,email,username\nuser,u1,owner@example.com,\nuser,u2,new@example.com,new\n')
+        data = self.write_jsonl('data.jsonl.gz', [
+            {'type': 'project', 'id': 'p1', 'name': 'Imported', 'owner': 'u2', 'created_at': '2020-01-01T10:00:00Z'},
+            {'type': 'member', 'project': 'p1', 'user': 'u1', 'role': 'Admin'},
+            *[{'type': 'task', 'id': f't{i}', 'project': 'p1', 'title': f'Legacy {i}', 'status': 'Done',
+               'assigned_to': 'u1' if i % 2 else None, 'due_date': '2020-02-01T00:00:00'} for i in range(25)],
+        ])
+        comments = self.write('comments.csv', 'task,user,content\n' + ''.join(f't{i % 25},u2,Old comment {i}\n' for i in range(60)))
+
+        out = StringIO()
+        id_map = os.path.join(self.directory.name, 'ids.json')
+        with CaptureQueriesContext(connection) as queries:
+            call_command('import_data', users, data, '--batch-size', '10', '--transaction-size', '20', '--id-map', id_map, stdout=out)
+            call_command(
+                'import_data', comments, '--type', 'comment', '--batch-size', '50', '--defer-indexes', '--id-map', id_map,
+                stdout=out,
+            )
+        self.assertIn('rows/s', out.getvalue())
+        # Comments go out as one `executemany()` per batch, logged as "<n> times: INSERT ...".
+        inserts = [query['sql'] for query in queries if 'INSERT INTO "projects_comment"' in query['sql']]
+        self.assertTrue(inserts[0].startswith('50 times: '))
+        self.assertEqual(len(inserts), 2)
+
+        # The existing user is reused, and the second run resolves ids through the saved id map.
+        self.assertEqual(User.objects.count(), 2)
+        project = Project.objects.get(name='Imported')
+        self.assertEqual(project.owner.email, 'new@example.com')
+        self.assertEqual(project.created_at.year, 2020)
+        self.assertEqual(ProjectMember.objects.get(project=project).user, self.user)
+        self.assertEqual(Task.objects.filter(project=project, assigned_to=self.user).count(), 12)
+        self.assertEqual(Comment.objects.filter(task__project=project).count(), 60)
+
+        # Derived data is rebuilt and the imported project is visible to its member.
+        call_command('rebuild_task_stats', '--check', stdout=StringIO())
+        self.assertEqual(self.client.get(reverse('project-stats', args=[project.id])).data['status']['Done'], 25)
+        response = self.client.get(reverse('search'), {'q': 'legacy'})
+        self.assertEqual(len(response.data['results']), 10)
+        self.assertEqual({index.name for index in Task._meta.indexes} - self.get_index_names('projects_task'), set())
+        self.assertEqual({index.name for index in Comment._meta.indexes} - self.get_index_names('projects_comment'), set())
+
+    def test_split_import_rebuilds_existing_projects(self):
+        id_map = os.path.join(self.directory.name, 'ids.json')
+        projects = self.write_jsonl('projects.jsonl', [
+            {'type': 'user', 'id': 'u1', 'email': 'owner@example.com'},
+            {'type': 'project', 'id': 'p1', 'name': 'Imported', 'owner': 'u1'},
+        ])
+        call_command('import_data', projects, '--id-map', id_map, stdout=StringIO())
+        project = Project.objects.get(name='Imported')
+        tasks_url = reverse('project-tasks', args=[project.id])
+        self.assertEqual(self.client.get(tasks_url).data['results'], [])
+
+        # Later runs only write tasks and comments of the project imported before.
+        tasks = self.write_jsonl('tasks.jsonl', [{'type': 'task', 'id': 't1', 'project': 'p1', 'title': 'Legacy'}])
+        call_command('import_data', tasks, '--id-map', id_map, stdout=StringIO())
+        self.assertEqual(self.client.get(reverse('project-stats', args=[project.id])).data['total'], 1)
+        response = self.client.get(tasks_url)
+        self.assertEqual((response['X-Cache'], len(response.data['results'])), ('MISS', 1))
+
+        self.client.get(tasks_url)
+        comments = self.write_jsonl('comments.jsonl', [{'type': 'comment', 'task': 't1', 'user': 'u1', 'content': 'Old'}])
+        call_command('import_data', comments, '--id-map', id_map, stdout=StringIO())
+        self.assertEqual(self.client.get(tasks_url)['X-Cache'], 'MISS')
+
+    def get_index_names(self, table):
+        with connection.cursor() as cursor:
+            return set(connection.introspection.get_constraints(cursor, table))
+
+    def test_unknown_reference_stops_the_import(self):
+        path = self.write_jsonl('tasks.jsonl', [{'type': 'task', 'title': 'Orphan', 'project': 'missing'}])
+        with self.assertRaisesMessage(CommandError, "tasks.jsonl:1: unknown project 'missing'"):
+            call_command('import_data', path, stdout=StringIO())
+        self.assertFalse(Task.objects.exists())
+
+
+class SQLiteProfileTests(TestCase):
+    '''
+    The `config.sqlite3` backend applies the pragma profile on connect, checks persistent connections and starts
+    transactions in the configured mode.
+    '''
+    def make_connection(self, directory):
+        from config.sqlite3.base import DatabaseWrapper
+        settings_dict = {**connection.settings_dict, 'NAME': os.path.join(directory, 'profile.sqlite3')}
+        wrapper = DatabaseWrapper(settings_dict, alias='profile')
+        self.addCleanup(wrapper.close)
+        return wrapper
+
+    def test_pragmas_and_transaction_mode(self):
+        with tempfile.TemporaryDirectory() as directory:
+            wrapper = self.make_connection(directory)
+            with wrapper.cursor() as cursor:
+                pragmas = {}
+                for name in ['journal_mode', 'synchronous', 'busy_timeout', 'temp_store', 'foreign_keys']:
+                    cursor.execute(f'PRAGMA {name}')
+                    pragmas[name] = cursor.fetchone()[0]
+            self.assertEqual(pragmas, {'journal_mode': 'wal', 'synchronous': 1, 'busy_timeout': 5000, 'temp_store': 2, 'foreign_keys': 1})
+
+            # What `atomic()` runs when it opens a transaction.
+            with CaptureQueriesContext(wrapper) as queries:
+                wrapper._start_transaction_under_autocommit()
+            self.assertEqual(queries[0]['sql'], 'BEGIN IMMEDIATE')
+            self.assertTrue(wrapper.connection.in_transaction)
+            wrapper.connection.rollback()
+
+    def test_health_check(self):
+        with tempfile.TemporaryDirectory() as directory:
+            wrapper = self.make_connection(directory)
+            wrapper.ensure_connection()
+            self.assertTrue(wrapper.is_usable())
+            wrapper.connection.close()
+            self.assertFalse(wrapper.is_usable())
+            wrapper.connection = None
+
+    def test_invalid_pragma_value(self):
+        from config.sqlite3.base import apply_pragmas
+        with self.assertRaises(ValueError):
+            apply_pragmas(connection.connection, {'journal_mode': 'WAL; DROP TABLE projects_task'})
+
+    def test_benchmark_command(self):
+        out = StringIO()
+        call_command('benchmark_sqlite', '--readers', '1', '--writers', '1', '--duration', '0.2', stdout=out)
+        self.assertIn('baseline', out.getvalue())
+        self.assertIn('configured', out.getvalue())
+
+
+@override_settings(DB_WRITE_MODE='queue', DB_WRITE_GROUP_WINDOW=0.05, PROJECT_RESPONSE_CACHE_TIMEOUT=0)
+class WriteQueueTests(TransactionTestCase):
+    '''
+    In `queue` mode the writes of concurrent threads go through one writer thread and commit in groups.
+    A transaction test case: the writer thread cannot see the data of another thread's open transaction.
+    '''
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(email='owner@example.com', password='pass1234', username='owner')
+        write_queue.stats.update(jobs=0, batches=0, timeouts=0, rejected=0)
+        self.addCleanup(write_queue.stop)
+
+    def run_threads(self, target, count):
+        results = [None] * count
+
+        def run(index):
+            try:
+                results[index] = target(index)
+            except Exception as exc:
+                results[index] = exc
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=run, args=[index]) for index in range(count)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return results
+
+    def test_group_commit_under_threaded_load(self):
+        def create(index):
+            if index == 5:
+                # Fails in the writer: a project needs an owner.
+                return run_write(Project.objects.create, name='Broken', owner_id=None)
+            return run_write(Project.objects.create, name=f'Project {index}', owner=self.user).pk
+
+        results = self.run_threads(create, 20)
+        self.assertIsInstance(results[5], IntegrityError)
+        self.assertEqual(Project.objects.count(), 19)
+        self.assertEqual(sorted(pk for pk in results if isinstance(pk, int)), sorted(Project.objects.values_list('pk', flat=True)))
+        # The failing job only rolled back its own savepoint, and writes were grouped.
+        self.assertEqual(write_queue.stats['jobs'], 20)
+        self.assertLess(write_queue.stats['batches'], 20)
+
+    @override_settings(DB_WRITE_TIMEOUT=0.1, DB_WRITE_GROUP_WINDOW=0)
+    def test_timeout_drops_jobs_that_did_not_start(self):
+        started, release = threading.Event(), threading.Event()
+
+        def block():
+            started.set()
+            release.wait(5)
+
+        blocker = threading.Thread(target=lambda: self.run_threads(lambda index: run_write(block), 1))
+        blocker.start()
+        started.wait(5)
+        with self.assertRaises(WriteTimeout):
+            run_write(Project.objects.create, name='Late', owner=self.user)
+        release.set()
+        blocker.join()
+        write_queue.stop()
+        self.assertFalse(Project.objects.filter(name='Late').exists())
+        self.assertEqual(write_queue.stats['timeouts'], 1)
+
+    def test_concurrent_api_writes(self):
+        project = Project.objects.create(name='Project', owner=self.user)
+        task = Task.objects.create(title='Task', project=project, due_date=timezone.now())
+
+        def post(index):
+            client = APIClient()
+            client.force_authenticate(user=self.user)
+            return client.post(reverse('comments-list', args=[task.id]), {'content': f'Comment {index}'}).status_code
+
+        self.assertEqual(self.run_threads(post, 10), [201] * 10)
+        self.assertEqual(Comment.objects.filter(task=task).count(), 10)
+        self.assertEqual(write_queue.stats['jobs'], 10)
+
+    def test_dead_writer_is_restarted(self):
+        with mock.patch.object(write_queue, '_next_batch', side_effect=RuntimeError('boom')):
+            with self.assertLogs('config.writer', 'ERROR') as logs:
+                write_queue._ensure_started()
+                write_queue._thread.join(5)
+        self.assertIn('RuntimeError: boom', logs.output[0])
+        self.assertFalse(write_queue._thread.is_alive())
+
+        with self.assertLogs('config.writer', 'WARNING'):
+            self.assertEqual(run_write(Project.objects.create, name='Restarted', owner=self.user).name, 'Restarted')
+        self.assertTrue(write_queue._thread.is_alive())
+
+    @override_settings(DB_WRITE_MODE='direct')
+    def test_direct_mode(self):
+        self.assertEqual(run_write(Project.objects.create, name='Direct', owner=self.user).name, 'Direct')
+        self.assertEqual(write_queue.stats['jobs'], 0)
+
+
+class ReplicaRouterTests(ProjectsAPITestCase):
+    '''
+    Reads go to a replica unless the request wrote or its user is pinned to the primary after a recent write.
+    '''
+    def setUp(self):
+        super().setUp()
+        self.router = ReplicaRouter()
+
+    @override_settings(DATABASE_REPLICAS=['replica'])
+    def test_routing(self):
+        self.assertEqual(self.router.db_for_read(Task), 'default')
+        with request_state() as state:
+            self.assertEqual(self.router.db_for_read(Task), 'replica')
+            self.assertTrue(state.used_replica)
+            self.assertIsNone(self.router.db_for_read(Session))
+            self.assertEqual(self.router.db_for_write(Task), 'default')
+            self.assertEqual(self.router.db_for_read(Task), 'default')
+        with request_state(self.user.pk):
+            self.assertEqual(self.router.db_for_read(Task), 'replica')
+        pin(self.user.pk)
+        with request_state(self.user.pk):
+            self.assertEqual(self.router.db_for_read(Task), 'default')
+        self.assertFalse(self.router.allow_migrate('replica', 'projects'))
+        self.assertIsNone(self.router.allow_migrate('default', 'projects'))
+
+    def test_write_pins_the_user(self):
+        key = get_pin_cache_key(self.user.pk)
+        self.client.get(reverse('project-list'))
+        self.assertIsNone(cache.get(key))
+        response = self.client.post(reverse('project-list'), {'name': 'New project', 'description': 'Pinned'})
+        self.assertEqual(response.status_code, 201)
+        self.assertTrue(cache.get(key))
+
+    def test_sync_replicas(self):
+        with tempfile.TemporaryDirectory() as directory:
+            primary, replica = os.path.join(directory, 'primary.sqlite3'), os.path.join(directory, 'replica.sqlite3')
+            with closing(sqlite3.connect(primary)) as conn, conn:
+                conn.execute('CREATE TABLE item (name TEXT)')
+                conn.execute("INSERT INTO item VALUES ('copied')")
+            copy_database(primary, replica)
+            with closing(sqlite3.connect(replica)) as conn:
+                self.assertEqual(conn.execute('SELECT name FROM item').fetchall(), [('copied',)])
+        with self.assertRaises(CommandError):
+            call_command('sync_replicas')
+
+
+@override_settings(PROJECT_RESPONSE_CACHE_TIMEOUT=0)
+class AsyncViewTests(ProjectsAPITestCase):
+    '''
+    The async views answer exactly like the sync views they replace under `PROJECT_ASYNC_VIEWS`.
+    '''
+    def setUp(self):
+        super().setUp()
+        self.factory = APIRequestFactory()
+        self.token = str(RefreshToken.for_user(self.user).access_token)
+        self.assignee = User.objects.create_user(email='dev@example.com', password='pass1234', username='dev')
+        self.project = self.make_project(name='Alpha')
+        self.make_project(name='Beta')
+        self.tasks = [
+            self.make_task(self.project, title=f'Task {i}', status='Done' if i % 2 else 'To Do', assigned_to=self.assignee)
+            for i in range(5)
+        ]
+        self.comments = [self.make_comment(self.tasks[0], content=f'Comment {i}') for i in range(3)]
+
+    def call(self, view_class, path, method='get', token=None, data=None, **kwargs):
+        headers = {'HTTP_AUTHORIZATION': f'Bearer {token or self.token}'} if token != '' else {}
+        request = getattr(self.factory, method)(path, data, format='json', **kwargs.pop('headers', {}), **headers)
+        view = view_class.as_view()
+        if view_class.view_is_async:
+            response = async_to_sync(view)(request, **kwargs)
+        else:
+            response = view(request, **kwargs)
+        if hasattr(response, 'render'):
+            response.render()
+        return response
+
+    def assertSameResponse(self, sync_view, async_view, path, **kwargs):
+        expected = self.call(sync_view, path, **dict(kwargs))
+        response = self.call(async_view, path, **dict(kwargs))
+        self.assertEqual(response.status_code, expected.status_code)
+        self.assertEqual(response.content, expected.content)
+        for header in ['ETag', 'Last-Modified', 'Content-Type', 'X-Total-Count']:
+            self.assertEqual(response.get(header), expected.get(header), header)
+        return response
+
+    def test_lists_match(self):
+        tasks_path = reverse('project-tasks', args=[self.project.id])
+        comments_path = reverse('comments-list', args=[self.tasks[0].id])
+        cases = [
+            (ProjectsListCreateView, AsyncProjectsListCreateView, reverse('project-list'), {}),
+            (ProjectsListCreateView, AsyncProjectsListCreateView, reverse('project-list') + '?expand=owner&fields=id,name,owner', {}),
+            (TaskListCreateView, AsyncTaskListCreateView, tasks_path + '?status=Done&expand=assigned_to', {'project_id': self.project.id}),
+            (TaskListCreateView, AsyncTaskListCreateView, tasks_path + '?count=true&ordering=title', {'project_id': self.project.id}),
+            (CommentsListCreateView, AsyncCommentsListCreateView, comments_path + '?expand=user,task.project.owner', {'task_id': self.tasks[0].id}),
+        ]
+        for sync_view, async_view, path, kwargs in cases:
+            with self.subTest(path=path):
+                response = self.assertSameResponse(sync_view, async_view, path, **kwargs)
+                self.assertEqual(response.status_code, 200)
+
+    def test_cursor_pages_match(self):
+        path = reverse('project-tasks', args=[self.project.id]) + '?page_size=2'
+        kwargs = {'project_id': self.project.id}
+        while path:
+            data = json.loads(self.assertSameResponse(TaskListCreateView, AsyncTaskListCreateView, path, **kwargs).content)
+            path = data['next']
+
+    def test_details_match(self):
+        cases = [
+            (RetrieveProjectView, AsyncRetrieveProjectView, reverse('project-detail', args=[self.project.id]) + '?expand=owner', {'pk': self.project.id}),
+            (RetrieveTaskView, AsyncRetrieveTaskView, reverse('task-detail', args=[self.tasks[0].id]) + '?expand=assigned_to,project.owner', {'pk': self.tasks[0].id}),
+            (RetrieveCommentView, AsyncRetrieveCommentView, reverse('comment-details', args=[self.comments[0].id]) + '?expand=user', {'id': self.comments[0].id}),
+        ]
+        for sync_view, async_view, path, kwargs in cases:
+            with self.subTest(path=path):
+                self.assertEqual(self.assertSameResponse(sync_view, async_view, path, **kwargs).status_code, 200)
+
+    def test_not_modified_missing_and_unauthenticated(self):
+        path = reverse('task-detail', args=[self.tasks[0].id])
+        kwargs = {'pk': self.tasks[0].id}
+        etag = self.call(RetrieveTaskView, path, **kwargs)['ETag']
+        response = self.assertSameResponse(RetrieveTaskView, AsyncRetrieveTaskView, path, headers={'HTTP_IF_NONE_MATCH': etag}, **kwargs)
+        self.assertEqual(response.status_code, 304)
+
+        missing = reverse('task-detail', args=[0])
+        self.assertEqual(self.assertSameResponse(RetrieveTaskView, AsyncRetrieveTaskView, missing, pk=0).status_code, 404)
+
+        outsider = User.objects.create_user(email='outsider@example.com', password='pass1234', username='outsider')
+        token = str(RefreshToken.for_user(outsider).access_token)
+        self.assertEqual(self.assertSameResponse(RetrieveTaskView, AsyncRetrieveTaskView, path, token=token, **kwargs).status_code, 404)
+        self.assertEqual(self.assertSameResponse(RetrieveTaskView, AsyncRetrieveTaskView, path, token='', **kwargs).status_code, 401)
+
+    def test_writes_run_the_sync_handlers(self):
+        path = reverse('comments-list', args=[self.tasks[1].id])
+        response = self.call(AsyncCommentsListCreateView, path, method='post', data={'content': 'Async'}, task_id=self.tasks[1].id)
+        self.assertEqual(response.status_code, 201, response.content)
+        self.assertTrue(Comment.objects.filter(task=self.tasks[1], content='Async').exists())
+
+        path = reverse('task-detail', args=[self.tasks[1].id])
+        response = self.call(AsyncRetrieveTaskView, path, method='patch', data={'title': 'Renamed'}, pk=self.tasks[1].id)
+        self.assertEqual(response.status_code, 200, response.content)
+        self.tasks[1].refresh_from_db()
+        self.assertEqual(self.tasks[1].title, 'Renamed')
+
+    @override_settings(PROJECT_RESPONSE_CACHE_TIMEOUT=60)
+    def test_response_cache_is_shared(self):
+        path = reverse('project-tasks', args=[self.project.id])
+        kwargs = {'project_id': self.project.id}
+        self.assertEqual(self.call(TaskListCreateView, path, **kwargs)['X-Cache'], 'MISS')
+        with CaptureQueriesContext(connection) as queries:
+            response = self.call(AsyncTaskListCreateView, path, **kwargs)
+        self.assertEqual(response['X-Cache'], 'HIT')
+        self.assertEqual(response.content, self.call(TaskListCreateView, path, **kwargs).content)
+        self.assertEqual(len(queries), 0)
+
+
+class FastJSONTests(ProjectsAPITestCase):
+    '''
+    `FastJSONRenderer` and `FastJSONParser` give byte for byte the output, and the parsed data, of DRF's JSON classes.
+    '''
+    def assertSameJSON(self, data, accepted_media_type=None, renderer_context=None):
+        expected = JSONRenderer().render(data, accepted_media_type, renderer_context)
+        self.assertEqual(FastJSONRenderer().render(data, accepted_media_type, renderer_context), expected)
+
+    def test_api_responses_match(self):
+        project = self.make_project(name='Ünïcode ✓', description='Line\nbreak "quoted"   separator')
+        assignee = User.objects.create_user(email='dev@example.com', password='pass1234', username='dev')
+        for i in range(5):
+            self.make_task(project, title=f'Task {i} 😀', assigned_to=assignee)
+        self.make_comment(Task.objects.first(), content='Tab\tand control \x01 characters')
+        urls = [
+            reverse('project-list') + '?expand=owner',
+            reverse('project-tasks', args=[project.id]) + '?expand=assigned_to,project.owner&count=true',
+            reverse('comments-list', args=[Task.objects.first().id]) + '?expand=user,task',
+            reverse('project-stats', args=[project.id]),
+            reverse('task-detail', args=[0]),
+        ]
+        for url in urls:
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertEqual(response.content, JSONRenderer().render(response.data))
+
+    def test_encoder_types_match(self):
+        now = timezone.now()
+        data = {
+            'utc': now,
+            'naive': now.replace(tzinfo=None),
+            'offset': now.astimezone(timezone.get_fixed_timezone(330)),
+            'no_microseconds': now.replace(microsecond=0),
+            'date': now.date(),
+            'time': now.time(),
+            'duration': timedelta(days=1, seconds=5, microseconds=10),
+            'decimal': Decimal('12.50'),
+            'uuid': uuid.uuid4(),
+            'lazy': gettext_lazy('Not found.'),
+            'bytes': b'raw',
+            'queryset': Project.objects.values_list('name', flat=True),
+            'tuple': (1, 'two', None, True, False),
+            'numbers': [0, -1, 2 ** 63 - 1, 0.1, 2.0, -0.0, 123456789.123, 0.0001],
+            'keys': {1: 'int', 'nested': {'list': [{}, []]}},
+            'text': 'quotes " backslash \\ controls \x00\x1f\n\t\r\b\f    é 😀',
+        }
+        self.assertSameJSON(data)
+        self.assertSameJSON([data, data])
+
+    def test_fallbacks_match(self):
+        data = {'big': 2 ** 70, 'items': [1, 2]}
+        self.assertSameJSON(data)
+        self.assertSameJSON({'items': [1, 2]}, 'application/json; indent=4')
+        self.assertSameJSON({'items': [1, 2]}, renderer_context={'indent': 2})
+        self.assertEqual(FastJSONRenderer().render(None), b'')
+        with self.assertRaises(TypeError):
+            FastJSONRenderer().render({'unknown': object()})
+
+    def test_parser_matches(self):
+        bodies = [
+            b'{"title": "Task \xc3\xa9", "ids": [1, 2, 3], "nested": {"a": null, "b": true, "c": 1.5}}',
+            b'[{"x": "\\u2028"}, {"x": "\\ud83d\\ude00"}]',
+            b'{"big": 123456789012345678901234567890}',
+        ]
+        for body in bodies:
+            with self.subTest(body=body):
+                self.assertEqual(FastJSONParser().parse(io.BytesIO(body)), JSONParser().parse(io.BytesIO(body)))
+
+        for body in [b'{"title": ', b'{"value": NaN}', b'\xff']:
+            with self.subTest(body=body):
+                with self.assertRaises(ParseError) as expected:
+                    JSONParser().parse(io.BytesIO(body))
+                with self.assertRaises(ParseError) as error:
+                    FastJSONParser().parse(io.BytesIO(body))
+                self.assertEqual(str(error.exception.detail), str(expected.exception.detail))
+
+    def test_api_parses_json_bodies(self):
+        project = self.make_project()
+        response = self.client.post(
+            reverse('project-tasks', args=[project.id]),
+            data=b'{"title": "T\xc3\xa2che", "description": "D", "due_date": "2030-01-01T00:00:00Z"}',
+            content_type='application/json',
+        )
+        self.assertEqual(response.status_code, 201, response.content)
+        self.assertEqual(Task.objects.get().title, 'Tâche')
+        response = self.client.post(reverse('project-tasks', args=[project.id]), data=b'{"title"', content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        self.assertTrue(response.data['detail'].startswith('JSON parse error - '))
+
+
+@override_settings(PROJECT_RESPONSE_CACHE_TIMEOUT=0)
+class CompiledListTests(ProjectsAPITestCase):
+    '''
+    List pages served through compiled projections are identical to the serializers' output.
+    '''
+    def setUp(self):
+        super().setUp()
+        self.assignee = User.objects.create_user(
+            email='dev@example.com', password='pass1234', username='dev', first_name='Zoë', last_login=timezone.now(),
+        )
+        self.project = self.make_project(name='Alpha')
+        self.make_project(name='Beta', description='')
+        self.tasks = [
+            self.make_task(
+                self.project, title=f'Task {i}', status=['To Do', 'In Progress', 'Done'][i % 3],
+                assigned_to=self.assignee if i % 2 else None,
+            )
+            for i in range(7)
+        ]
+        self.make_comment(self.tasks[1], content='First')
+        self.make_comment(self.tasks[1], user=self.assignee, content='Second')
+
+    def assertSameOutput(self, url):
+        with self.settings(PROJECT_COMPILED_LISTS=False):
+            expected = self.client.get(url)
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, expected.status_code)
+        self.assertEqual(response.content, expected.content)
+        self.assertEqual(response.data, expected.data)
+        return response
+
+    def test_lists_match_the_serializers(self):
+        tasks_url = reverse('project-tasks', args=[self.project.id])
+        comments_url = reverse('comments-list', args=[self.tasks[1].id])
+        urls = [
+            reverse('project-list'),
+            reverse('project-list') + '?expand=owner&fields=id,name,owner.email',
+            tasks_url,
+            tasks_url + '?expand=assigned_to,project.owner&count=true',
+            tasks_url + '?fields=title,project.name,assigned_to&expand=project',
+            tasks_url + '?ordering=status&status=Done',
+            comments_url + '?expand=user,task.assigned_to,task.project.owner',
+            comments_url + '?fields=content,task.title&expand=task',
+        ]
+        for url in urls:
+            with self.subTest(url=url):
+                self.assertSameOutput(url)
+
+    def test_datetimes_use_the_current_timezone(self):
+        url = reverse('project-tasks', args=[self.project.id]) + '?expand=assigned_to'
+        with timezone.override('Asia/Kolkata'):
+            response = self.assertSameOutput(url)
+        self.assertTrue(response.data['results'][0]['created_at'].endswith('+05:30'))
+
+    def test_cursor_pages_match(self):
+        for ordering in ['', '&ordering=priority', '&ordering=-due_date']:
+            url = reverse('project-tasks', args=[self.project.id]) + '?page_size=2&expand=assigned_to' + ordering
+            while url:
+                url = json.loads(self.assertSameOutput(url).content)['next']
+
+    def test_projection_fetches_values(self):
+        projection = get_projection(TaskSerializer, 'id,title,assigned_to.email', 'assigned_to')
+        self.assertEqual(projection.paths, ['id', 'title', 'assigned_to', 'assigned_to__email'])
+        self.assertIs(get_projection(TaskSerializer, 'id,title,assigned_to.email', 'assigned_to'), projection)
+
+        url = reverse('project-tasks', args=[self.project.id]) + '?fields=id,title'
+        self.client.get(url)
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(url)
+        page_query = queries[-1]['sql']
+        self.assertNotIn('"description"', page_query)
+
+    def test_unsupported_serializers_are_not_compiled(self):
+        class TaskWithCommentCount(TaskSerializer):
+            comment_count = serializers.SerializerMethodField()
+
+            class Meta(TaskSerializer.Meta):
+                fields = TaskSerializer.Meta.fields + ['comment_count']
+
+            def get_comment_count(self, task):
+                return 0
+
+        class UpperTitleTask(TaskSerializer):
+            def to_representation(self, instance):
+                return {**super().to_representation(instance), 'title': instance.title.upper()}
+
+        self.assertIsNone(get_projection(TaskWithCommentCount))
+        self.assertIsNone(get_projection(UpperTitleTask))
+        self.assertIsNotNone(get_projection(TaskSerializer))
+
+
+@override_settings(PROJECT_RESPONSE_CACHE_TIMEOUT=0, METRICS_DIR='', METRICS_TOKEN='scrape-token', METRICS_SERVER_TIMING=True)
+class MetricsTests(ProjectsAPITestCase):
+    '''
+    Requests get a `Server-Timing` header and are aggregated per URL name for the Prometheus endpoint.
+    '''
+    def setUp(self):
+        super().setUp()
+        metrics.registry._reset()
+        self.project = self.make_project()
+        self.make_task(self.project)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(self.user).access_token}')
+
+    def get_server_timing(self, response):
+        entries = {}
+        for entry in response['Server-Timing'].split(', '):
+            name, *params = entry.split(';')
+            entries[name] = dict(param.split('=', 1) for param in params)
+        return entries
+
+    def scrape(self, **headers):
+        response = APIClient().get(reverse('metrics'), HTTP_AUTHORIZATION='Bearer scrape-token', **headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain; version=0.0.4'))
+        return response.content.decode()
+
+    def test_server_timing_header(self):
+        url = reverse('project-tasks', args=[self.project.id])
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        timing = self.get_server_timing(response)
+        self.assertEqual(set(timing), {'auth', 'db', 'serialize', 'render', 'view', 'total'})
+        self.assertEqual(timing['db']['desc'], f'"{len(queries)} queries"')
+        self.assertLessEqual(float(timing['view']['dur']), float(timing['total']['dur']))
+
+        with self.settings(METRICS_SERVER_TIMING=False):
+            self.assertNotIn('Server-Timing', self.client.get(url))
+
+    def test_prometheus_histograms_per_url_name(self):
+        for _ in range(3):
+            self.client.get(reverse('project-list'))
+        self.client.get(reverse('project-tasks', args=[self.project.id]))
+        self.client.get(reverse('task-detail', args=[0]))
+        text = self.scrape()
+        self.assertIn('# TYPE api_request_duration_seconds histogram', text)
+        self.assertIn('api_requests_total{view="project-list",method="GET",status="200"} 3', text)
+        self.assertIn('api_requests_total{view="task-detail",method="GET",status="404"} 1', text)
+        self.assertIn('api_request_duration_seconds_bucket{view="project-list",le="+Inf"} 3', text)
+        self.assertIn('api_request_duration_seconds_count{view="project-tasks"} 1', text)
+        self.assertIn('api_request_phase_seconds_count{view="project-tasks",phase="db"} 1', text)
+        self.assertRegex(text, r'api_db_queries_total\{view="project-list"\} [1-9]')
+
+    def test_endpoint_needs_the_token_or_staff(self):
+        url = reverse('metrics')
+        self.assertEqual(APIClient().get(url).status_code, 403)
+        self.assertEqual(APIClient().get(url, HTTP_AUTHORIZATION='Bearer wrong').status_code, 403)
+        staff = User.objects.create_user(email='staff@example.com', password='pass1234', username='staff', is_staff=True)
+        client = APIClient()
+        client.force_login(staff)
+        self.assertEqual(client.get(url).status_code, 200)
+
+    def test_workers_are_added_up(self):
+        with tempfile.TemporaryDirectory() as directory, self.settings(METRICS_DIR=directory):
+            self.client.get(reverse('project-list'))
+            # Another worker process, which wrote its file earlier.
+            other = metrics.MetricsRegistry()
+            other._token = 'other'
+            timings = metrics.RequestTimings()
+            other.record('project-list', 'GET', 200, timings, timings.finish())
+            other.flush(force=True)
+            self.assertEqual(len(os.listdir(directory)), 2)
+            text = self.scrape()
+        self.assertIn('api_requests_total{view="project-list",method="GET",status="200"} 2', text)
+        self.assertIn('api_request_duration_seconds_count{view="project-list"} 2', text)
+
+
+class ProfilerTests(ProjectsAPITestCase):
+    '''
+    Requests with a signed `X-Profile` header, or `?profile=1` from staff, are profiled and their call graph and SQL
+    saved to `PROFILER_DIR`.
+    '''
+    def setUp(self):
+        super().setUp()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+        override = self.settings(PROFILER_DIR=self.directory, PROFILER_KEEP=3)
+        override.enable()
+        self.addCleanup(override.disable)
+        self.project = self.make_project()
+        self.make_task(self.project)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(self.user).access_token}')
+        self.url = reverse('project-tasks', args=[self.project.id])
+
+    def test_signed_header_profiles_the_request(self):
+        response = self.client.get(self.url, HTTP_X_PROFILE=get_profile_token())
+        self.assertEqual(response.status_code, 200)
+        profile_id = response['X-Profile-Id']
+        self.assertEqual(sorted(os.listdir(self.directory)), [f'{profile_id}.json', f'{profile_id}.prof'])
+        profile = list_profiles()[0]
+        self.assertEqual((profile['method'], profile['view'], profile['status']), ('GET', 'project-tasks', 200))
+        self.assertTrue(any('projects_task' in query['sql'] for query in profile['queries']))
+
+    def test_requests_without_a_valid_trigger_are_not_profiled(self):
+        self.assertNotIn('X-Profile-Id', self.client.get(self.url))
+        self.assertNotIn('X-Profile-Id', self.client.get(self.url, HTTP_X_PROFILE='profile:forged:token'))
+        # The query flag is only for staff.
+        self.assertNotIn('X-Profile-Id', self.client.get(self.url, {'profile': 1}))
+        self.assertEqual(os.listdir(self.directory), [])
+
+    def test_staff_query_flag(self):
+        staff = User.objects.create_user(email='staff@example.com', password='pass1234', username='staff', is_staff=True)
+        client = APIClient()
+        client.force_login(staff)
+        response = client.get(reverse('project-list'), {'profile': 1})
+        self.assertIn('X-Profile-Id', response)
+        self.assertEqual(list_profiles()[0]['path'], reverse('project-list') + '?profile=1')
+
+    def test_async_requests(self):
+        async def get_response(request):
+            await Project.objects.acount()
+            return HttpResponse('ok')
+
+        middleware = RequestProfilerMiddleware(get_response)
+        request = APIRequestFactory().get('/', HTTP_X_PROFILE=get_profile_token())
+        response = async_to_sync(middleware)(request)
+        self.assertEqual(list_profiles()[0]['id'], response['X-Profile-Id'])
+        self.assertEqual(len(list_profiles()[0]['queries']), 1)
+
+    def test_oldest_profiles_are_dropped(self):
+        token = get_profile_token()
+        profile_ids = [self.client.get(self.url, HTTP_X_PROFILE=token)['X-Profile-Id'] for _ in range(5)]
+        self.assertEqual(len(os.listdir(self.directory)), 6)
+        self.assertEqual({profile['id'] for profile in list_profiles()}, set(sorted(profile_ids)[-3:]))
+
+    def test_command_summarizes_a_profile(self):
+        profile_id = self.client.get(self.url, HTTP_X_PROFILE=get_profile_token())['X-Profile-Id']
+        out = StringIO()
+        call_command('request_profiles', stdout=out)
+        self.assertIn(profile_id, out.getvalue())
+
+        out = StringIO()
+        call_command('request_profiles', '--last', '--sort', 'tottime', '--limit', '5', stdout=out)
+        output = out.getvalue()
+        self.assertIn(f'GET {self.url} (project-tasks) -> 200', output)
+        self.assertIn('ncalls', output)
+        self.assertIn('Slowest queries:', output)
+
+        with self.assertRaises(CommandError):
+            call_command('request_profiles', 'missing', stdout=StringIO())
+
+        out = StringIO()
+        call_command('request_profiles', '--header', stdout=out)
+        self.assertTrue(is_valid_token(out.getvalue().split(': ')[1].strip()))
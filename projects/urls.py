@@ -1,18 +1,38 @@
+from django.conf import settings
 from django.urls import path
 from .views import (
     ProjectsListCreateView,
     RetrieveProjectView,
+    ProjectStatsView,
+    ExportProjectView,
     TaskListCreateView,
     RetrieveTaskView,
+    BulkUpdateTaskView,
     CommentsListCreateView,
-    RetrieveCommentView
+    RetrieveCommentView,
+    SearchView,
 )
 
+# Under an ASGI server, serve the project, task and comment endpoints with native async views.
+if settings.PROJECT_ASYNC_VIEWS:
+    from .async_views import (
+        AsyncProjectsListCreateView as ProjectsListCreateView,
+        AsyncRetrieveProjectView as RetrieveProjectView,
+        AsyncTaskListCreateView as TaskListCreateView,
+        AsyncRetrieveTaskView as RetrieveTaskView,
+        AsyncCommentsListCreateView as CommentsListCreateView,
+        AsyncRetrieveCommentView as RetrieveCommentView,
+    )
+
 urlpatterns = [
     path('projects/', ProjectsListCreateView.as_view(), name='project-list'),
     path('projects/<int:pk>/', RetrieveProjectView.as_view(), name='project-detail'),
+    path('projects/<int:pk>/stats/', ProjectStatsView.as_view(), name='project-stats'),
+    path('projects/<int:pk>/export/', ExportProjectView.as_view(), name='project-export'),
     path('projects/<int:project_id>/tasks/', TaskListCreateView.as_view(), name='project-tasks'),
     path('tasks/<int:pk>/', RetrieveTaskView.as_view(), name='task-detail'),
+    path('tasks/bulk/', BulkUpdateTaskView.as_view(), name='task-bulk-update'),
     path('tasks/<int:task_id>/comments/', CommentsListCreateView.as_view(), name='comments-list'),
     path('comments/<int:id>/', RetrieveCommentView.as_view(), name='comment-details'),
+    path('search/', SearchView.as_view(), name='search'),
 ]
@@ -1,39 +1,63 @@
 from rest_framework import status
 from rest_framework import generics, permissions
-from rest_framework.exceptions import NotFound
+from rest_framework.filters import OrderingFilter
+from rest_framework.exceptions import NotFound, ValidationError
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
+from django.db import transaction
+from django.db.models import F
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+from config.writer import SerializedWriteMixin, run_write
 from .models import *
-from .serializers import ProjectSerializer, TaskSerializer, CommentSerializer
+from . import export, stats
+from .cache import CachedListMixin, bump_project_generations
+from .conditional import ConditionalGetMixin
+from .access import ProjectAccessMixin, ROLE_ADMIN, ROLE_MEMBER, ROLE_OWNER
+from .filters import TaskFilterBackend
+from .pagination import KeysetCursorPagination
+from .projections import CompiledListMixin
+from .search import SearchCursorPagination
+from .serializers import ProjectSerializer, TaskSerializer, CommentSerializer, TaskBulkUpdateSerializer
 
 
-class ProjectsListCreateView(generics.ListCreateAPIView):
+class ProjectsListCreateView(SerializedWriteMixin, CachedListMixin, CompiledListMixin, ConditionalGetMixin, ProjectAccessMixin, generics.ListCreateAPIView):
     """
     View to list all projects or create a new project. This view handles two main functionalities:
-    - **List all projects**: accessed with a GET request
+    - **List all projects**: accessed with a GET request, lists the projects the user owns or is a member of
     - **Create a new project**: accessed with a POST request
     """
     serializer_class = ProjectSerializer
     permission_classes = [IsAuthenticated]
-    queryset = Project.objects.all()
+    pagination_class = KeysetCursorPagination
+
+    def get_queryset(self):
+        """
+        Return the projects the user can access, loading only the relations requested through `expand`.
+        """
+        queryset = Project.objects.filter(id__in=self.get_access().get_project_ids())
+        return self.get_serializer_class().expand_queryset(queryset, self.request)
 
 
-class RetrieveProjectView(generics.RetrieveUpdateDestroyAPIView):
+class RetrieveProjectView(SerializedWriteMixin, ConditionalGetMixin, ProjectAccessMixin, generics.RetrieveUpdateDestroyAPIView):
     """
     View to retrieve, update, or delete a specific project. This view provides functionalities to:
-    - **Retrieve a project**: accessed with a GET request and a project ID (`pk`)
-    - **Update a project**: accessed with a PUT or PATCH request
-    - **Delete a project**: accessed with a DELETE request
+    - **Retrieve a project**: accessed with a GET request and a project ID (`pk`), by any project member
+    - **Update a project**: accessed with a PUT or PATCH request, by the owner or an admin
+    - **Delete a project**: accessed with a DELETE request, by the owner only
     """
     serializer_class = ProjectSerializer
     permission_classes = [IsAuthenticated]
+    required_roles = {'PUT': ROLE_ADMIN, 'PATCH': ROLE_ADMIN, 'DELETE': ROLE_OWNER}
 
     def get_object(self):
         """
         Override get_object to ensure the correct project instance is fetched based on the request.
         """
         project_id = self.kwargs['pk']
-        return generics.get_object_or_404(Project, id=project_id)
+        self.check_project_access(project_id)
+        queryset = self.get_serializer_class().expand_queryset(Project.objects.all(), self.request)
+        return generics.get_object_or_404(queryset, id=project_id)
     
     def destroy(self, request, *args, **kwargs):
         instance = self.get_object()
@@ -41,51 +65,106 @@ class RetrieveProjectView(generics.RetrieveUpdateDestroyAPIView):
         return Response({"detail": "Project deleted successfully."}, status=status.HTTP_200_OK)
 
 
-class TaskListCreateView(generics.ListCreateAPIView):
+class ProjectStatsView(ProjectAccessMixin, generics.GenericAPIView):
+    """
+    View to read the task dashboard of a project.
+    - **Project stats**: accessed with a GET request by any project member. Returns the number of tasks in `total`,
+      by `status`, by `priority` and by `assigned_to` (`none` for unassigned tasks), and the `overdue` open tasks.
+    - **Cost**: the counts are read from a summary table kept up to date on every task change, so the response
+      time does not depend on the number of tasks in the project.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, pk):
+        self.check_project_access(pk)
+        return Response({'project': pk, **stats.get_project_stats(pk)}, status=status.HTTP_200_OK)
+
+
+class ExportProjectView(ProjectAccessMixin, generics.GenericAPIView):
+    """
+    View to download all the tasks of a project with their comments in one streamed response.
+    - **Export a project**: accessed with a GET request by any project member. Every task is followed by its
+      comments, one record per line, with a `type` of `task` or `comment`.
+    - **fmt**: `ndjson` (default) or `csv`.
+    - **gzip**: pass `gzip=1` to download a gzip compressed file.
+    The rows are read from the database in chunks while the response is sent, so any project size can be exported.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, pk):
+        self.check_project_access(pk)
+        fmt = request.query_params.get('fmt', export.FORMAT_NDJSON)
+        if fmt not in export.FORMATS:
+            raise ValidationError({'fmt': [f'Choose one of: {", ".join(export.FORMATS)}.']})
+        compress = request.query_params.get('gzip', '').lower() in ('1', 'true', 'yes')
+
+        filename = f'project-{pk}.{fmt}' + ('.gz' if compress else '')
+        response = StreamingHttpResponse(
+            export.export_project(pk, fmt, compress),
+            content_type='application/gzip' if compress else export.FORMATS[fmt],
+        )
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        return response
+
+
+class TaskListCreateView(SerializedWriteMixin, CachedListMixin, CompiledListMixin, ConditionalGetMixin, ProjectAccessMixin, generics.ListCreateAPIView):
     """
     View to list all tasks under a specific project or create a new task.
-    - **List all tasks**: accessed with a GET request under a specific project.
+    - **List all tasks**: accessed with a GET request under a specific project. The list can be filtered
+      by `status`, `priority`, `assigned_to`, `due_after` and `due_before`, and sorted with `ordering`.
     - **Create a new task**: accessed with a POST request under a specific project.
+    - **Create tasks in bulk**: accessed with a POST request whose body is a list of tasks. The whole list is
+      validated first, then written with batched inserts in one transaction. Returns the created tasks in order,
+      or a list of per-item errors.
     """
     serializer_class = TaskSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = KeysetCursorPagination
+    filter_backends = [TaskFilterBackend, OrderingFilter]
+    ordering_fields = ['created_at', 'due_date', 'status', 'priority']
+    ordering = ['-created_at', '-id']
+    cache_project_kwarg = 'project_id'
+    bulk_create_max_items = 1000
+
+    def get_serializer(self, *args, **kwargs):
+        """
+        Switch to the bulk serializer when the request body is a list of tasks.
+        """
+        if isinstance(kwargs.get('data'), list):
+            kwargs.update(many=True, allow_empty=False, max_length=self.bulk_create_max_items)
+        return super().get_serializer(*args, **kwargs)
 
     def get_queryset(self):
         """
         Override get_queryset to filter tasks based on the project they belong to
-        and ensure the tasks belong to projects owned by the authenticated user.
+        and ensure the authenticated user is a member of that project.
         """
         project_id = self.kwargs['project_id']
-        try:
-            project = Project.objects.get(id=project_id, owner=self.request.user)
-        except Project.DoesNotExist:
-            raise NotFound("Project not found or you do not have permission.")
-        return Task.objects.filter(project=project)
+        self.check_project_access(project_id)
+        return self.get_serializer_class().expand_queryset(Task.objects.filter(project_id=project_id), self.request)
 
     def perform_create(self, serializer):
         """
         Override the default create behavior to associate the task with a specific project.
         - **Retrieve project**: Extracts the project ID from the URL parameters.
-        - **Check permissions**: Ensures the project belongs to the authenticated user.
-        - **Save task**: Associates the task with the retrieved project and saves it.
+        - **Check permissions**: Ensures the authenticated user is a member of the project.
+        - **Save task**: Associates the task (or every task of a bulk request) with the project and saves it.
         """
         project_id = self.kwargs['project_id']
-        try:
-            project = Project.objects.get(id=project_id, owner=self.request.user)
-        except Project.DoesNotExist:
-            raise NotFound("Project not found or you do not have permission.")
-        serializer.save(project=project)
+        self.check_project_access(project_id)
+        run_write(serializer.save, project_id=project_id)
 
 
-class RetrieveTaskView(generics.RetrieveUpdateDestroyAPIView):
+class RetrieveTaskView(SerializedWriteMixin, ConditionalGetMixin, ProjectAccessMixin, generics.RetrieveUpdateDestroyAPIView):
     """
     View to retrieve, update, or delete a specific task.
-    - **Retrieve a task**: accessed with a GET request and a task ID (`pk`).
-    - **Update a task**: accessed with a PUT or PATCH request.
-    - **Delete a task**: accessed with a DELETE request.
+    - **Retrieve a task**: accessed with a GET request and a task ID (`pk`), by any project member.
+    - **Update a task**: accessed with a PUT or PATCH request, by any project member.
+    - **Delete a task**: accessed with a DELETE request, by the project owner or an admin.
     """
     serializer_class = TaskSerializer
     permission_classes = [IsAuthenticated]
+    required_roles = {'DELETE': ROLE_ADMIN}
     
     def get_object(self):
         """
@@ -93,9 +172,11 @@ class RetrieveTaskView(generics.RetrieveUpdateDestroyAPIView):
         """
         task_id = self.kwargs['pk']
         try:
-            task = Task.objects.get(id=task_id, project__owner=self.request.user)
+            queryset = self.get_serializer_class().expand_queryset(Task.objects.all(), self.request)
+            task = queryset.get(id=task_id)
         except Task.DoesNotExist:
             raise NotFound("Task not found or you do not have permission.")
+        self.check_project_access(task.project_id, "Task not found or you do not have permission.")
         return task
 
     def destroy(self, request, *args, **kwargs):
@@ -110,7 +191,59 @@ class RetrieveTaskView(generics.RetrieveUpdateDestroyAPIView):
         return Response({"detail": "Task deleted successfully."}, status=status.HTTP_200_OK)
     
 
-class CommentsListCreateView(generics.ListCreateAPIView):
+class BulkUpdateTaskView(ProjectAccessMixin, generics.GenericAPIView):
+    """
+    View to apply the same changes to many tasks at once.
+    - **Bulk update**: accessed with a PATCH request. The tasks are selected with a list of `ids` and/or a `filter`
+      (`project`, `status`, `priority`, `assigned_to`, `due_after`, `due_before`), and `changes` holds the new
+      `status`, `priority`, `assigned_to` or `due_date`.
+    - **Scope**: only tasks of projects the authenticated user is a member of are changed.
+    - **Response**: the number of updated tasks, from a single set-based `UPDATE` statement.
+    """
+    serializer_class = TaskBulkUpdateSerializer
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get_queryset(self):
+        return Task.objects.filter(project_id__in=self.get_access().get_project_ids(ROLE_MEMBER))
+
+    def patch(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        queryset = self.get_queryset()
+        if 'ids' in serializer.validated_data:
+            queryset = queryset.filter(id__in=serializer.validated_data['ids'])
+        if 'filter' in serializer.validated_data:
+            queryset = queryset.filter(**serializer.validated_data['filter'])
+        updated = run_write(self.update_tasks, queryset, serializer.validated_data['changes'])
+        return Response({"updated": updated}, status=status.HTTP_200_OK)
+
+    def update_tasks(self, queryset, changes):
+        """
+        `update()` sends no signals, update the stats and invalidate the cached lists explicitly.
+        """
+        with transaction.atomic():
+            project_ids = set(queryset.values_list('project_id', flat=True).distinct())
+            if changes.get('assigned_to') is not None:
+                self.check_assignee(changes['assigned_to'], project_ids)
+            stats.tasks_updated(queryset, changes)
+            updated = queryset.update(**changes, updated_at=timezone.now())
+            bump_project_generations(*project_ids)
+        return updated
+
+    def check_assignee(self, user, project_ids):
+        """
+        Tasks can only be assigned to the owner or a member of every project they belong to. Anyone else gets the
+        error of an unknown user, so the endpoint does not tell which user ids exist.
+        """
+        allowed = set(Project.objects.filter(id__in=project_ids, owner=user).values_list('id', flat=True))
+        allowed.update(ProjectMember.objects.filter(project_id__in=project_ids, user=user).values_list('project_id', flat=True))
+        if project_ids - allowed:
+            field = TaskBulkUpdateSerializer().fields['changes'].fields['assigned_to']
+            raise ValidationError({'changes': {'assigned_to': [field.error_messages['does_not_exist'].format(pk_value=user.pk)]}})
+
+
+class CommentsListCreateView(SerializedWriteMixin, CompiledListMixin, ConditionalGetMixin, ProjectAccessMixin, generics.ListCreateAPIView):
     """
     View to retrieve a list of all comments on a specific task or create a new comment.
     - **List all comments**: accessed with a GET request under a specific task.
@@ -118,44 +251,88 @@ class CommentsListCreateView(generics.ListCreateAPIView):
     """
     serializer_class = CommentSerializer
     permission_classes = [permissions.IsAuthenticated]
-    
-    def get_queryset(self):
+    pagination_class = KeysetCursorPagination
+
+    def check_task_access(self):
+        """
+        Ensure the task exists and the authenticated user is a member of its project.
+        """
         task_id = self.kwargs['task_id']
-        try:
-            task = Task.objects.get(id=task_id, project__owner=self.request.user)
-        except Task.DoesNotExist:
+        project_id = self.get_task_project_id()
+        if project_id is None:
             raise NotFound("Task not found or you do not have permission.")
-        return Comment.objects.filter(task=task)
+        self.check_project_access(project_id, "Task not found or you do not have permission.")
+        return task_id
+
+    def get_task_project_id(self):
+        return Task.objects.filter(id=self.kwargs['task_id']).values_list('project_id', flat=True).first()
+
+    def get_queryset(self):
+        task_id = self.check_task_access()
+        return self.get_serializer_class().expand_queryset(Comment.objects.filter(task_id=task_id), self.request)
 
     def perform_create(self, serializer):
-        task_id = self.kwargs['task_id']
-        try:
-            task = Task.objects.get(id=task_id, project__owner=self.request.user)
-        except Task.DoesNotExist:
-            raise NotFound("Task not found or you do not have permission.")
-        serializer.save(user=self.request.user, task=task)
+        task_id = self.check_task_access()
+        run_write(serializer.save, user=self.request.user, task_id=task_id)
 
 
-class RetrieveCommentView(generics.RetrieveUpdateDestroyAPIView):
+class RetrieveCommentView(SerializedWriteMixin, ConditionalGetMixin, ProjectAccessMixin, generics.RetrieveUpdateDestroyAPIView):
     """
     View to retrieve, update, or delete a specific comment.
-    - **Retrieve a comment**: accessed with a GET request and a comment ID (`id`).
-    - **Update a comment**: accessed with a PUT or PATCH request.
-    - **Delete a comment**: accessed with a DELETE request.
+    - **Retrieve a comment**: accessed with a GET request and a comment ID (`id`), by any project member.
+    - **Update a comment**: accessed with a PUT or PATCH request, by its author, the project owner or an admin.
+    - **Delete a comment**: accessed with a DELETE request, by its author, the project owner or an admin.
     """
     serializer_class = CommentSerializer
     permission_classes = [permissions.IsAuthenticated]
+    required_roles = {'PUT': ROLE_ADMIN, 'PATCH': ROLE_ADMIN, 'DELETE': ROLE_ADMIN}
 
     def get_object(self):
         comment_id = self.kwargs.get('id')
         try:
-            comment = Comment.objects.get(id=comment_id, task__project__owner=self.request.user)
+            queryset = self.get_serializer_class().expand_queryset(Comment.objects.all(), self.request)
+            comment = queryset.annotate(task_project_id=F('task__project_id')).get(id=comment_id)
         except Comment.DoesNotExist:
             raise NotFound("Comment not found or you do not have permission.")
+        # Authors may edit and delete their own comments with any role.
+        role = ROLE_MEMBER if comment.user_id == self.request.user.pk else self.get_required_role()
+        self.get_access().check(comment.task_project_id, role, "Comment not found or you do not have permission.")
         return comment
 
     def destroy(self, request, *args, **kwargs):
         instance = self.get_object()
         self.perform_destroy(instance)
         return Response({"detail": "Comment deleted successfully."}, status=status.HTTP_200_OK)
-    
\ No newline at end of file
+    
+
+
+class SearchView(ProjectAccessMixin, generics.GenericAPIView):
+    """
+    View to search the tasks and comments of the projects the user is a member of.
+    - **Search**: accessed with a GET request with the words to look for in `q`. Every word must appear in the task
+      title or description, or in the comment; end a word with `*` to match it as a prefix. Use `project` to search
+      a single project.
+    - **Ranking**: results are ordered by relevance (bm25, a title match weighs more than a description match) and
+      paginated with cursors. Each result has its `type` (`task` or `comment`), `id`, `task`, `project`, the task
+      `title` and a `snippet` of the matching text with the matched words in brackets.
+    - **Cost**: served from a full-text index (SQLite FTS5) instead of scanning the tables.
+    """
+    permission_classes = [IsAuthenticated]
+    pagination_class = SearchCursorPagination
+
+    def get(self, request, *args, **kwargs):
+        query = request.query_params.get('q', '').strip()
+        if not query:
+            raise ValidationError({'q': ['This field is required.']})
+
+        project_ids = self.get_access().get_project_ids()
+        if 'project' in request.query_params:
+            project_id = request.query_params['project']
+            if not project_id.isdigit():
+                raise ValidationError({'project': ['A valid integer is required.']})
+            self.check_project_access(project_id)
+            project_ids = [int(project_id)]
+
+        page = self.paginator.paginate_search(query, project_ids, request)
+        results = [{key: value for key, value in row.items() if key not in ('score', 'rowid')} for row in page]
+        return self.get_paginated_response(results)
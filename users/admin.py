@@ -7,4 +7,11 @@ class UserAdmin(admin.ModelAdmin):
     list_filter = ('email', 'username', 'first_name', 'last_name', 'date_joined')
 
 # Register the UserProfile model with the custom admin class
-admin.site.register(User, UserAdmin)
\ No newline at end of file
+admin.site.register(User, UserAdmin)
+
+
+class EmailOutboxAdmin(admin.ModelAdmin):
+    list_display = ('subject', 'to_email', 'status', 'attempts', 'next_attempt_at', 'sent_at')
+    list_filter = ('status',)
+
+admin.site.register(EmailOutbox, EmailOutboxAdmin)
@@ -0,0 +1,132 @@
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import DEFAULT_CACHE_ALIAS, cache, caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+
+from config.metrics import timed
+from config.routers import set_request_user
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """
+    JWT authentication that builds `request.user` from the verified token and a cached snapshot of the user row,
+    instead of loading the row from the database on every request.
+    - The snapshot holds the `snapshot_fields` and is kept in Django's cache for `get_snapshot_timeout()` seconds.
+    - Other fields (e.g. `password`) are deferred, so they are loaded lazily by the endpoints that need them.
+    - Saving or deleting a user drops their snapshot (see `users/signals.py`), so `is_active` changes apply at once
+      with a shared cache. A per-process cache is only cleared in the worker that saved the user.
+    - Snapshots are read from the primary database: a lagging replica would put a stale row back in the cache.
+    """
+    cache_key_prefix = 'users:snapshot'
+    snapshot_fields = (
+        'id', 'username', 'email', 'first_name', 'last_name', 'date_joined',
+        'is_staff', 'is_superuser', 'is_active', 'last_login',
+    )
+
+    @classmethod
+    def get_cache_key(cls, user_id):
+        return f'{cls.cache_key_prefix}:{user_id}'
+
+    @staticmethod
+    def get_snapshot_timeout():
+        """
+        :returns: `USER_SNAPSHOT_CACHE_TIMEOUT`, or at most `USER_SNAPSHOT_LOCAL_CACHE_TIMEOUT` when the cache is local
+            to the process: the other workers do not see the invalidations of a user's snapshot.
+        """
+        if isinstance(caches[DEFAULT_CACHE_ALIAS], (LocMemCache, DummyCache)):
+            return min(settings.USER_SNAPSHOT_CACHE_TIMEOUT, settings.USER_SNAPSHOT_LOCAL_CACHE_TIMEOUT)
+        return settings.USER_SNAPSHOT_CACHE_TIMEOUT
+
+    @classmethod
+    def invalidate(cls, *user_ids):
+        """
+        Drop the cached snapshots of `user_ids`, now and again once the current transaction commits,
+        so a request that read the old row before the commit cannot keep a stale snapshot cached.
+        """
+        keys = [cls.get_cache_key(user_id) for user_id in set(user_ids) if user_id is not None]
+        if keys:
+            cache.delete_many(keys)
+            transaction.on_commit(lambda: cache.delete_many(keys))
+
+    def authenticate(self, request):
+        with timed('auth'):
+            result = super().authenticate(request)
+        if result is not None:
+            # Lets the database router pin this user to the primary after a write.
+            set_request_user(result[0].pk)
+        return result
+
+    async def aauthenticate(self, request):
+        """
+        `authenticate()` for async views: the token is checked in place and the snapshot read with the async ORM.
+        :args: request (Request):
+        :returns: `(user, validated token)`, or `None` without a token.
+        """
+        with timed('auth'):
+            header = self.get_header(request)
+            raw_token = self.get_raw_token(header) if header is not None else None
+            if raw_token is None:
+                return None
+            validated_token = self.get_validated_token(raw_token)
+            if self.needs_full_user():
+                user = await sync_to_async(self.get_user)(validated_token)
+            else:
+                user_id = self.get_user_id(validated_token)
+                key = self.get_cache_key(user_id)
+                snapshot = cache.get(key)
+                if snapshot is None:
+                    snapshot = await self.get_snapshot_queryset(user_id).afirst()
+                    if snapshot is not None:
+                        cache.set(key, snapshot, self.get_snapshot_timeout())
+                user = self.build_user(snapshot)
+        set_request_user(user.pk)
+        return user, validated_token
+
+    def get_snapshot_fields(self):
+        # `Model.from_db()` expects the values of a partial row in model field order.
+        return [field.attname for field in self.user_model._meta.concrete_fields if field.attname in self.snapshot_fields]
+
+    def get_snapshot_queryset(self, user_id):
+        return self.user_model.objects.using(DEFAULT_DB_ALIAS).filter(pk=user_id).values_list(*self.get_snapshot_fields())
+
+    def get_snapshot(self, user_id):
+        """
+        Return the cached field values of the user, loading them with one query on a cache miss.
+        :returns: tuple of `get_snapshot_fields()` values, or `None` if the user does not exist.
+        """
+        key = self.get_cache_key(user_id)
+        snapshot = cache.get(key)
+        if snapshot is None:
+            snapshot = self.get_snapshot_queryset(user_id).first()
+            if snapshot is not None:
+                cache.set(key, snapshot, self.get_snapshot_timeout())
+        return snapshot
+
+    def needs_full_user(self):
+        # Revoked token checks compare the password hash, which the snapshot does not hold.
+        return api_settings.CHECK_REVOKE_TOKEN or api_settings.USER_ID_FIELD != self.user_model._meta.pk.name
+
+    def get_user_id(self, validated_token):
+        try:
+            return validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(_("Token contained no recognizable user identification"))
+
+    def build_user(self, snapshot):
+        if snapshot is None:
+            raise AuthenticationFailed(_("User not found"), code="user_not_found")
+        user = self.user_model.from_db(DEFAULT_DB_ALIAS, self.get_snapshot_fields(), snapshot)
+        if not user.is_active:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+        return user
+
+    def get_user(self, validated_token):
+        if self.needs_full_user():
+            return super().get_user(validated_token)
+        return self.build_user(self.get_snapshot(self.get_user_id(validated_token)))
@@ -0,0 +1,87 @@
+import atexit
+import threading
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import update_last_login
+from django.db import connection
+from django.db.models import Case, DateTimeField, Value, When
+from django.utils import timezone
+
+from users.authentication import CachedJWTAuthentication
+
+WRITE_MODE_SYNC = 'sync'
+WRITE_MODE_BUFFERED = 'buffered'
+
+
+class LastLoginTracker:
+    """
+    Records `last_login` timestamps without an `UPDATE` on every login.
+    In `buffered` mode the timestamps are kept in memory, one per user, and written every
+    `LAST_LOGIN_FLUSH_INTERVAL` seconds (and at interpreter shutdown) with a batched `UPDATE ... CASE` statement.
+    In `sync` mode every login is written right away with Django's `update_last_login`.
+    The mode is read from the `LAST_LOGIN_WRITE_MODE` setting on every call, so tests can override it.
+    """
+    # Every `WHEN` adds two query parameters, keep well below SQLite's variable limit.
+    batch_size = 400
+
+    def __init__(self):
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._timer = None
+
+    def record(self, user):
+        """
+        Record a login of `user` now.
+        :args: user (User):
+        """
+        if settings.LAST_LOGIN_WRITE_MODE != WRITE_MODE_BUFFERED:
+            update_last_login(None, user)
+            return
+
+        user.last_login = timezone.now()
+        with self._lock:
+            self._pending[user.pk] = user.last_login
+            if self._timer is None:
+                self._timer = threading.Timer(settings.LAST_LOGIN_FLUSH_INTERVAL, self._flush_in_background)
+                self._timer.daemon = True
+                self._timer.start()
+
+    @property
+    def pending(self):
+        return len(self._pending)
+
+    def flush(self):
+        """
+        Write every buffered timestamp to the database.
+        :returns: number of users updated.
+        """
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+        if not pending:
+            return 0
+
+        User = get_user_model()
+        items = list(pending.items())
+        for start in range(0, len(items), self.batch_size):
+            batch = items[start:start + self.batch_size]
+            User.objects.filter(pk__in=[pk for pk, _ in batch]).update(
+                last_login=Case(*[When(pk=pk, then=Value(when)) for pk, when in batch], output_field=DateTimeField())
+            )
+        # `update()` sends no signals, drop the cached authentication snapshots explicitly.
+        CachedJWTAuthentication.invalidate(*pending)
+        return len(items)
+
+    def _flush_in_background(self):
+        try:
+            self.flush()
+        finally:
+            # The timer thread opened its own connection, do not leak it.
+            connection.close()
+
+
+last_login_tracker = LastLoginTracker()
+atexit.register(last_login_tracker.flush)
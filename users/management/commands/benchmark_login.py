@@ -0,0 +1,88 @@
+import statistics
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import update_last_login
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.shortcuts import get_object_or_404
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
+
+from users.serializers import LoginSerializer, UserSerializer
+
+User = get_user_model()
+
+
+class LegacyLoginSerializer(TokenObtainPairSerializer):
+    """
+    The login path before it was reduced to a single lookup and a single password hash, kept for comparison:
+    up to two user lookups, `check_password()`, then `super().validate()` authenticating and hashing again.
+    """
+    def validate(self, validated_data):
+        try:
+            active_user = User.objects.get(username=validated_data['email'])
+        except User.DoesNotExist:
+            active_user = get_object_or_404(User, email=validated_data['email'])
+
+        if not active_user.check_password(validated_data['password']):
+            raise AuthenticationFailed("No User matches the given query.")
+        if not active_user.is_active:
+            raise AuthenticationFailed("Please verify your account first.")
+
+        data = super().validate(validated_data)
+        data['token'] = {'refresh': data.pop('refresh'), 'access': data.pop('access')}
+        data['user_data'] = UserSerializer(active_user).data
+        update_last_login(None, active_user)
+        return data
+
+
+class Command(BaseCommand):
+    """
+    Compare login latency of the legacy and the current `LoginSerializer` under concurrent logins.
+    A throwaway active user is created for the run and deleted afterwards:
+        python manage.py benchmark_login --requests 40 --concurrency 8
+    """
+    help = 'Benchmark concurrent logins with the legacy and the current login serializer.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=40, help='Logins per serializer.')
+        parser.add_argument('--concurrency', type=int, default=8, help='Concurrent login threads.')
+
+    def handle(self, *args, **options):
+        email = f'benchmark-{uuid.uuid4().hex[:12]}@example.invalid'
+        password = uuid.uuid4().hex
+        user = User.objects.create_user(email=email, password=password, username=email)
+        try:
+            for name, serializer_class in [('legacy', LegacyLoginSerializer), ('current', LoginSerializer)]:
+                # Log in by email, which makes the legacy path miss on `username` first.
+                latencies, elapsed = self.run(serializer_class, {'email': email, 'password': password}, options)
+                self.report(name, latencies, elapsed)
+        finally:
+            user.delete()
+
+    def run(self, serializer_class, payload, options):
+        def login(_):
+            try:
+                started = time.perf_counter()
+                serializer = serializer_class(data=payload)
+                serializer.is_valid(raise_exception=True)
+                return time.perf_counter() - started
+            finally:
+                connection.close()
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options['concurrency']) as executor:
+            latencies = list(executor.map(login, range(options['requests'])))
+        return latencies, time.perf_counter() - started
+
+    def report(self, name, latencies, elapsed):
+        latencies = sorted(latencies)
+        p95 = latencies[max(int(len(latencies) * 0.95) - 1, 0)]
+        self.stdout.write(
+            f'{name:>8}: {len(latencies) / elapsed:7.1f} logins/s, '
+            f'mean {statistics.mean(latencies) * 1000:7.1f} ms, '
+            f'p50 {statistics.median(latencies) * 1000:7.1f} ms, p95 {p95 * 1000:7.1f} ms'
+        )
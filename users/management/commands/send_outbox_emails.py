@@ -0,0 +1,38 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from users.outbox import send_pending_emails
+
+
+class Command(BaseCommand):
+    """
+    Deliver the emails queued in the `EmailOutbox` table.
+    Run it once (e.g. from cron) or keep it running with `--loop`:
+        python manage.py send_outbox_emails --loop --interval 5
+    """
+    help = 'Deliver queued outbox emails over a single reused SMTP connection.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=None, help='Rows fetched per query.')
+        parser.add_argument('--max-attempts', type=int, default=None, help='Attempts before a row is marked as failed.')
+        parser.add_argument('--loop', action='store_true', help='Keep polling the outbox instead of exiting.')
+        parser.add_argument('--interval', type=float, default=5, help='Seconds between polls with --loop.')
+
+    def handle(self, *args, **options):
+        while True:
+            try:
+                sent, failed = send_pending_emails(
+                    batch_size=options['batch_size'], max_attempts=options['max_attempts']
+                )
+            except Exception as exc:
+                # The mail server itself is unreachable: nothing was attempted, try again on the next poll.
+                if not options['loop']:
+                    raise
+                self.stderr.write(f'Could not deliver emails: {exc}')
+            else:
+                if sent or failed or not options['loop']:
+                    self.stdout.write(f'Sent {sent} email(s), {failed} failed.')
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
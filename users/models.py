@@ -1,5 +1,6 @@
 from django.contrib.auth.models import AbstractUser, BaseUserManager
 from django.db import models
+from django.utils import timezone
 
 
 class CustomUserManager(BaseUserManager):
@@ -59,3 +60,38 @@ class User(AbstractUser):
         """
         return str(self.email)
 
+
+class EmailOutbox(models.Model):
+    """
+    An email waiting to be delivered. Rows are written in the same transaction as the change that triggers
+    the email, and delivered later by the `send_outbox_emails` management command, so no request waits on SMTP.
+    :attributes: field name & structure
+    """
+    STATUS_PENDING = 'pending'
+    STATUS_SENT = 'sent'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = [(STATUS_PENDING, 'Pending'), (STATUS_SENT, 'Sent'), (STATUS_FAILED, 'Failed')]
+
+    subject = models.CharField(max_length=255)
+    from_email = models.CharField(max_length=255, blank=True, null=True)
+    to_email = models.EmailField()
+    template_name = models.CharField(max_length=255)
+    context = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=STATUS_PENDING)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at'], name='outbox_status_next_idx'),
+        ]
+
+    def __str__(self):
+        """
+        String representation of the queued email.
+        :return: str
+        """
+        return f'{self.subject} -> {self.to_email} ({self.status})'
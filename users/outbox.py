@@ -0,0 +1,88 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.template.loader import render_to_string
+from django.utils import timezone
+
+from users.models import EmailOutbox
+
+
+def queue_email(subject, to_email, template_name, context=None, from_email=None):
+    """
+    Queue an HTML email for delivery by the outbox worker. This only inserts a row, so call it inside
+    the transaction of the change that triggers the email: the email is queued if and only if the change commits.
+    :args: subject, to_email, template_name, context (JSON serializable dict), from_email
+    :returns: the `EmailOutbox` instance.
+    """
+    return EmailOutbox.objects.create(
+        subject=subject,
+        to_email=to_email,
+        template_name=template_name,
+        context=context or {},
+        from_email=from_email if from_email is not None else settings.EMAIL_HOST_USER,
+    )
+
+
+def get_retry_delay(attempts):
+    """
+    Exponential backoff between delivery attempts: `EMAIL_OUTBOX_RETRY_DELAY` seconds after the first failure,
+    doubling after every further failure, capped at `EMAIL_OUTBOX_MAX_RETRY_DELAY` seconds.
+    """
+    delay = settings.EMAIL_OUTBOX_RETRY_DELAY * 2 ** max(attempts - 1, 0)
+    return timedelta(seconds=min(delay, settings.EMAIL_OUTBOX_MAX_RETRY_DELAY))
+
+
+def build_message(item, connection=None):
+    """
+    Render the queued template and build the `EmailMessage` for an outbox row.
+    """
+    html_message = render_to_string(item.template_name, item.context)
+    message = EmailMessage(item.subject, html_message, item.from_email, [item.to_email], connection=connection)
+    message.content_subtype = 'html'
+    return message
+
+
+def send_pending_emails(batch_size=None, max_attempts=None, limit=None):
+    """
+    Deliver due outbox rows in batches over a single reused SMTP connection. A failed row is retried later
+    with exponential backoff, and marked as failed after `max_attempts` attempts.
+    Only one worker should drain the outbox at a time.
+    :args: batch_size, max_attempts, limit (stop after this many rows, `None` to drain everything that is due)
+    :returns: tuple of (sent, failed) counts.
+    """
+    batch_size = batch_size or settings.EMAIL_OUTBOX_BATCH_SIZE
+    max_attempts = max_attempts or settings.EMAIL_OUTBOX_MAX_ATTEMPTS
+    sent = failed = 0
+    started_at = timezone.now()
+
+    with get_connection() as connection:
+        while limit is None or sent + failed < limit:
+            size = batch_size if limit is None else min(batch_size, limit - sent - failed)
+            batch = list(
+                EmailOutbox.objects
+                .filter(status=EmailOutbox.STATUS_PENDING, next_attempt_at__lte=started_at)
+                .order_by('next_attempt_at', 'id')[:size]
+            )
+            if not batch:
+                break
+
+            for item in batch:
+                item.attempts += 1
+                try:
+                    build_message(item, connection).send()
+                except Exception as exc:
+                    failed += 1
+                    item.last_error = f'{type(exc).__name__}: {exc}'
+                    if item.attempts >= max_attempts:
+                        item.status = EmailOutbox.STATUS_FAILED
+                    else:
+                        item.next_attempt_at = timezone.now() + get_retry_delay(item.attempts)
+                else:
+                    sent += 1
+                    item.status = EmailOutbox.STATUS_SENT
+                    item.sent_at = timezone.now()
+                    item.last_error = ''
+                item.save(update_fields=['attempts', 'status', 'next_attempt_at', 'last_error', 'sent_at'])
+
+    return sent, failed
@@ -4,11 +4,13 @@ from django.contrib.auth.password_validation import validate_password
 from django.core import exceptions as django_exceptions
 from django.db import IntegrityError, transaction
 from config import exceptions as custom_exception
+from config.writer import run_write
 from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
 from django.utils.translation import gettext_lazy as _
-from django.contrib.auth.models import update_last_login
+from users.last_login import last_login_tracker
 from rest_framework.exceptions import AuthenticationFailed
-from django.shortcuts import get_object_or_404
+from django.db.models import Q
+from django.http import Http404
 from django.contrib.auth import get_user_model
 from rest_framework import serializers
 
@@ -96,6 +98,15 @@ class SignUpSerializer(serializers.ModelSerializer):
 
     @staticmethod
     def perform_create(validated_data):
+        """
+        Create the user through the database writer (see `config.writer.run_write`).
+        :param: attributes
+        :return: instance
+        """
+        return run_write(SignUpSerializer.create_inactive_user, validated_data)
+
+    @staticmethod
+    def create_inactive_user(validated_data):
         """
         Use a database transaction to ensure atomicity of the user creation.
         Create a new user with the validated data.
@@ -118,29 +129,37 @@ class LoginSerializer(TokenObtainPairSerializer):
     def validate(self, validated_data):
         """
         Validate the login credentials and generate tokens. Also includes additional user data in the response.
+        The user is looked up with a single query on the unique `username` and `email` indexes, and the password
+        is hashed exactly once; `super().validate()` is not called because it would authenticate and hash again.
         :returns: dict with `tokens` and `serialized user_data`
         """
-        try:
-            active_user = User.objects.get(username=validated_data['email'])
-        except User.DoesNotExist:
-            active_user = get_object_or_404(User, email=validated_data['email'])
+        identifier = validated_data[self.username_field]
+        password = validated_data['password']
+
+        # A username match takes precedence over an email match, as before.
+        candidates = list(User.objects.filter(Q(username=identifier) | Q(email=identifier))[:2])
+        active_user = next((user for user in candidates if user.username == identifier), None)
+        active_user = active_user or (candidates[0] if candidates else None)
 
-        if not active_user.check_password(validated_data['password']):
+        if active_user is None:
+            raise Http404("No User matches the given query.")
+        if not active_user.check_password(password):
             raise AuthenticationFailed("No User matches the given query.")
         if not active_user.is_active:
             raise AuthenticationFailed("Please verify your account first.")
-        
+
         # Use the current user instance
-        user = active_user
-        
-        data = super().validate(validated_data)
-        data['token'] = {
-            'refresh': data.pop('refresh'),
-            'access': data.pop('access')
+        user = self.user = active_user
+
+        refresh = self.get_token(user)
+        data = {
+            'token': {
+                'refresh': str(refresh),
+                'access': str(refresh.access_token),
+            }
         }
         user_serializer = UserSerializer(user)
         data['user_data'] = user_serializer.data
-        update_last_login(None, user)
+        last_login_tracker.record(user)
 
         return data
-    
@@ -1,3 +1,206 @@
-from django.test import TestCase
+from smtplib import SMTPException
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core import mail
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from users.authentication import CachedJWTAuthentication
+from users.last_login import LastLoginTracker
+from users.models import EmailOutbox
+from users.outbox import send_pending_emails
+
+User = get_user_model()
+
+
+class EmailOutboxTests(TestCase):
+    """
+    Signup only queues the verification email; the outbox worker delivers it.
+    """
+    def setUp(self):
+        self.client = APIClient()
+
+    def signup(self, email='new@example.com'):
+        payload = {'email': email, 'username': email.split('@')[0], 'password': 'S3cure-passw0rd'}
+        return self.client.post(reverse('user_signup'), payload, format='json')
+
+    def test_signup_queues_without_sending(self):
+        response = self.signup()
+        self.assertEqual(response.status_code, 201, response.content)
+        self.assertEqual(len(mail.outbox), 0)
+        item = EmailOutbox.objects.get()
+        self.assertEqual(item.to_email, 'new@example.com')
+        self.assertEqual(item.status, EmailOutbox.STATUS_PENDING)
+        self.assertIn('/verify-email/', item.context['url'])
+
+    def test_worker_sends_in_batches_over_one_connection(self):
+        for i in range(5):
+            self.signup(f'user{i}@example.com')
+        with mock.patch('users.outbox.get_connection', wraps=mail.get_connection) as get_connection:
+            sent, failed = send_pending_emails(batch_size=2)
+        self.assertEqual((sent, failed), (5, 0))
+        self.assertEqual(get_connection.call_count, 1)
+        self.assertEqual(len(mail.outbox), 5)
+        self.assertIn(EmailOutbox.objects.first().context['url'], mail.outbox[0].body)
+        self.assertFalse(EmailOutbox.objects.exclude(status=EmailOutbox.STATUS_SENT).exists())
+
+    @override_settings(EMAIL_OUTBOX_RETRY_DELAY=60, EMAIL_OUTBOX_MAX_ATTEMPTS=2)
+    def test_failed_delivery_is_retried_with_backoff(self):
+        self.signup()
+        with mock.patch('django.core.mail.EmailMessage.send', side_effect=SMTPException('boom')):
+            self.assertEqual(send_pending_emails(), (0, 1))
+            item = EmailOutbox.objects.get()
+            self.assertEqual((item.status, item.attempts), (EmailOutbox.STATUS_PENDING, 1))
+            self.assertGreater(item.next_attempt_at, timezone.now())
+
+            # Not due yet, so a second run does nothing.
+            self.assertEqual(send_pending_emails(), (0, 0))
+
+            EmailOutbox.objects.update(next_attempt_at=timezone.now())
+            self.assertEqual(send_pending_emails(), (0, 1))
+        item.refresh_from_db()
+        self.assertEqual((item.status, item.attempts), (EmailOutbox.STATUS_FAILED, 2))
+        self.assertIn('boom', item.last_error)
+
+    def test_management_command(self):
+        self.signup()
+        call_command('send_outbox_emails', stdout=mock.MagicMock())
+        self.assertEqual(len(mail.outbox), 1)
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'], LAST_LOGIN_WRITE_MODE='sync')
+class LoginTests(TestCase):
+    """
+    Login looks the user up once and verifies the password hash once.
+    """
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(email='user@example.com', password='S3cure-passw0rd', username='someone')
+
+    def login(self, identifier, password='S3cure-passw0rd'):
+        return self.client.post(reverse('login'), {'email': identifier, 'password': password}, format='json')
+
+    def test_login_by_email_or_username(self):
+        for identifier in ['user@example.com', 'someone']:
+            response = self.login(identifier)
+            self.assertEqual(response.status_code, 200, response.content)
+            self.assertEqual(set(response.data), {'token', 'user_data'})
+            self.assertEqual(set(response.data['token']), {'refresh', 'access'})
+            self.assertEqual(response.data['user_data']['email'], 'user@example.com')
+
+    def test_single_lookup_and_single_hash(self):
+        with mock.patch('django.contrib.auth.hashers.MD5PasswordHasher.verify', autospec=True, return_value=True) as verify:
+            with CaptureQueriesContext(connection) as queries:
+                self.assertEqual(self.login('user@example.com').status_code, 200)
+        self.assertEqual(verify.call_count, 1)
+        lookups = [query for query in queries if query['sql'].startswith('SELECT') and 'users_user' in query['sql']]
+        self.assertEqual(len(lookups), 1)
+
+    def test_failed_logins(self):
+        self.assertEqual(self.login('nobody@example.com').status_code, 404)
+        response = self.login('user@example.com', 'wrong-password')
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(response.data['detail'], 'No User matches the given query.')
+        User.objects.filter(pk=self.user.pk).update(is_active=False)
+        self.assertEqual(self.login('user@example.com').data['detail'], 'Please verify your account first.')
+
+
+@override_settings(LAST_LOGIN_WRITE_MODE='buffered', LAST_LOGIN_FLUSH_INTERVAL=3600)
+class LastLoginTrackerTests(TestCase):
+    """
+    Buffered last login timestamps are written with one batched UPDATE per flush.
+    """
+    def setUp(self):
+        self.tracker = LastLoginTracker()
+        self.users = [User.objects.create_user(email=f'user{i}@example.com', password='x', username=f'user{i}') for i in range(3)]
+
+    def tearDown(self):
+        self.tracker.flush()
+
+    def test_logins_are_buffered_until_flush(self):
+        with CaptureQueriesContext(connection) as queries:
+            for user in self.users + self.users[:1]:
+                self.tracker.record(user)
+        self.assertEqual(len(queries), 0)
+        self.assertEqual(self.tracker.pending, 3)
+        self.assertFalse(User.objects.filter(last_login__isnull=False).exists())
+
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.tracker.flush(), 3)
+        self.assertEqual(len(queries), 1)
+        self.assertEqual(self.tracker.pending, 0)
+        for user in self.users:
+            self.assertEqual(User.objects.get(pk=user.pk).last_login, user.last_login)
+
+    def test_flush_without_logins(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.tracker.flush(), 0)
+        self.assertEqual(len(queries), 0)
+
+    @override_settings(LAST_LOGIN_WRITE_MODE='sync')
+    def test_sync_mode_writes_immediately(self):
+        self.tracker.record(self.users[0])
+        self.assertEqual(self.tracker.pending, 0)
+        self.assertIsNotNone(User.objects.get(pk=self.users[0].pk).last_login)
+
+
+class CachedJWTAuthenticationTests(TestCase):
+    """
+    Authenticated requests build the user from the token and a cached snapshot, without loading the row.
+    """
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(email='user@example.com', password='S3cure-passw0rd', username='someone')
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(self.user).access_token}')
+
+    def get_profile(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('profile'))
+        return response, [query for query in queries if 'users_user' in query['sql']]
+
+    def test_profile_without_user_query(self):
+        response, queries = self.get_profile()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(queries), 1)
+
+        response, queries = self.get_profile()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['email'], 'user@example.com')
+        self.assertEqual(len(queries), 0)
+
+    def test_profile_update_refreshes_snapshot(self):
+        self.get_profile()
+        response = self.client.patch(reverse('profile-update'), {'first_name': 'Changed'}, format='json')
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertTrue(User.objects.get(pk=self.user.pk).check_password('S3cure-passw0rd'))
+        self.assertEqual(self.get_profile()[0].data['first_name'], 'Changed')
+
+    def test_deactivated_and_deleted_users_are_rejected(self):
+        self.get_profile()
+        self.user.is_active = False
+        self.user.save(update_fields=['is_active'])
+        self.assertEqual(self.get_profile()[0].status_code, 401)
+
+        self.user.delete()
+        self.assertEqual(self.get_profile()[0].status_code, 401)
+
+    @override_settings(USER_SNAPSHOT_CACHE_TIMEOUT=300, USER_SNAPSHOT_LOCAL_CACHE_TIMEOUT=5)
+    def test_process_local_cache_keeps_snapshots_briefly(self):
+        self.assertEqual(CachedJWTAuthentication.get_snapshot_timeout(), 5)
+        with mock.patch.object(cache, 'set', wraps=cache.set) as cache_set:
+            self.get_profile()
+        key = CachedJWTAuthentication.get_cache_key(self.user.pk)
+        self.assertIn(mock.call(key, mock.ANY, 5), cache_set.call_args_list)
+
+        shared = {'default': {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': '/tmp'}}
+        with override_settings(CACHES=shared):
+            self.assertEqual(CachedJWTAuthentication.get_snapshot_timeout(), 300)
@@ -4,7 +4,6 @@ from rest_framework.permissions import IsAuthenticated
 from rest_framework_simplejwt.views import TokenObtainPairView
 from django.contrib.auth import get_user_model
 from django.views.decorators.csrf import csrf_exempt
-from django.template.loader import render_to_string
 from django.utils.http import urlsafe_base64_encode
 from django.utils.encoding import force_bytes
 from django.contrib.auth.tokens import default_token_generator
@@ -12,8 +11,8 @@ from django.urls import reverse
 from django.utils.encoding import force_str
 from django.utils.http import urlsafe_base64_decode
 from django.db import transaction
-from django.core.mail import EmailMessage
-from config import settings
+from config.writer import SerializedWriteMixin, run_write
+from users.outbox import queue_email
 from users.serializers import (
     SignUpSerializer, 
     LoginSerializer, 
@@ -47,9 +46,7 @@ class SignUpView(generics.CreateAPIView):
         post_data = serializer.data
         user_serializer = SignUpSerializer(data=post_data)
         user_serializer.is_valid(raise_exception=True)
-        with transaction.atomic():
-            user = user_serializer.save()
-            self.send_verification_email(serializer, user)
+        run_write(self.save_user, serializer, user_serializer)
 
         context = {
             'message': 'A mail has been sent to your mail address. Please verify before login.',
@@ -57,18 +54,32 @@ class SignUpView(generics.CreateAPIView):
         }
         return Response(context, status=status.HTTP_201_CREATED)
 
-    def send_verification_email(self, request, user):
+    def save_user(self, request, user_serializer):
+        """
+        Save the new user and queue their verification email in one transaction.
+        :args: request, user_serializer (SignUpSerializer): validated serializer
+        :returns: user's instance.
+        """
+        with transaction.atomic():
+            user = user_serializer.save()
+            self.queue_verification_email(request, user)
+        return user
+
+    def queue_verification_email(self, request, user):
+        """
+        Queue the verification email in the outbox. Rendering and SMTP delivery happen later in the
+        `send_outbox_emails` worker, so signup neither waits on the mail server nor holds the transaction open.
+        """
         token = default_token_generator.make_token(user)
         uid = urlsafe_base64_encode(force_bytes(user.pk))
         url = request.build_absolute_uri(reverse('verify-email', args=[uid, token]))
 
-        subject = 'Verify your account'
-        html_message = render_to_string('email_verification.html', {'url': url, 'user': user})
-        from_email = settings.EMAIL_HOST_USER
-        to_email = [user.email]
-        email = EmailMessage(subject, html_message, from_email, to_email)
-        email.content_subtype = 'html'
-        email.send()
+        queue_email(
+            subject='Verify your account',
+            to_email=user.email,
+            template_name='email_verification.html',
+            context={'url': url, 'user': {'email': user.email}},
+        )
 
 
 class VerifyEmailView(generics.GenericAPIView):
@@ -138,7 +149,7 @@ class ProfileView(generics.RetrieveAPIView):
         return Response(serializer.data, status=status.HTTP_200_OK)
     
 
-class UpdateProfileView(generics.UpdateAPIView):
+class UpdateProfileView(SerializedWriteMixin, generics.UpdateAPIView):
     """
     View to update the authenticated user's profile data.
     """
@@ -181,7 +192,7 @@ class UpdateProfileView(generics.UpdateAPIView):
         :returns: status code.
         """
         instance = self.get_object()
-        instance.delete()
+        run_write(instance.delete)
         return Response({
             "message": "Your Account Has Been Deleted Successfully!"
             }, status=status.HTTP_200_OK)